@@ -10,13 +10,14 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-import json
-import os
-from collections import OrderedDict
 from qtpy import QtCore, QtGui, QtWidgets
 
 # Main Window
-from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+import limits_daemon
+import limits_watch
+import limits_constraints
+from limits_change_set import LimitsChangeSet
+from limits_tracing import traced
 
 
 class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
@@ -31,6 +32,8 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
         config_file_path_name (str): Path to the main configuration file.
         temp_folder (str): Path to the temporary folder.
         backup_folder (str): Path to the backup folder.
+        proposed_values (dict): Values loaded into the spin boxes as changes,
+        e.g. from limits_usage.
 
     Methods:
         setup_ui(): Sets up the user interface components.
@@ -47,9 +50,18 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
         the values changed and continue the process.
         cancel_button_clicked(): Calls upon the main window of the UI if the
         user decides to cancel the process.
+        watcher_creation(): Keeps the window up to date while it is open.
+        limits_changed(table, changes): Shows the values changed by someone else.
+        proposal_creation(): Loads the proposed values into the spin boxes.
     """
 
-    def __init__(self, config_file_path_name, temp_folder, backup_folder):
+    def __init__(
+        self,
+        config_file_path_name,
+        temp_folder,
+        backup_folder,
+        proposed_values=None,
+    ):
         """
         Initializes an instance of the class.
 
@@ -62,14 +74,21 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder.
             backup_folder (str): Path to the backup folder.
+            proposed_values (dict): Proposed value per key, None for none.
 
         Attributes:
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder.
             backup_folder (str): Path to the backup folder.
             applications (list): List to store application names.
-            current_values_full_dict (dict): Dictionary to store current values.
-            spin_boxes_list (list): List to store spin box widgets.
+            change_set (LimitsChangeSet): Only the application limits modified
+            by the user.
+            constraint_engine (LimitsConstraintEngine): Cross-limit constraints
+            checked while the spin boxes change.
+            constraints_rebased (callable): Takes the values loaded as the
+            baseline of the constraints again, after a remote change.
+            spinboxes_by_key (dict): Spin box widget of every application.
+            proposed_values (dict): Proposed value per key.
 
         UI Components:
             centralwidget (QWidget): Central widget for the main window.
@@ -79,7 +98,8 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
 
 
         Config File:
-            contents_dict (dict): Dictionary to store the contents of the configuration file.
+            limits_table (LimitsTable): Limits of the configuration file, shared
+            with the other windows.
 
         Fonts:
             l_font (QFont): Large, bold, italic font with underline for headings.
@@ -99,24 +119,22 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
 
         # Variables
         self.applications = []
-        self.current_values_full_dict = dict()
-        self.spin_boxes_list = []
+        self.change_set = LimitsChangeSet()
+        self.constraint_engine = None
+        self.constraints_rebased = None
+        self.limits_watcher = None
+        self.spinboxes_by_key = {}
+        self.proposed_values = proposed_values or {}
 
         # Sections of the window
         self.centralwidget = ""
         self.app_limits_groupbox = None
 
-        # Opening config file
-        temp_file_name = f"{self.temp_folder}temp.config"
-
-        if os.path.exists(temp_file_name):
-            # Opening temp. config file
-            with open(temp_file_name, "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
-        else:
-            # Opening config file
-            with open(config_file_path_name, "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
+        # Opening the staged config file if there is one, from the daemon when
+        # it is running
+        self.limits_table = limits_daemon.load_session_table(
+            config_file_path_name, temp_folder
+        )
 
         # Fonts
         self.l_font = QtGui.QFont(
@@ -134,6 +152,7 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
 
         self.setup_ui()
 
+    @traced("ui.application_limits_window", profile=True)
     def setup_ui(self):
         """Sets up the user interface for the App Limits application.
 
@@ -155,16 +174,16 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
         self.groupbox_info_creation()
         self.info_label_creation()
         self.button_creation()
+        self.watcher_creation()
+        self.proposal_creation()
 
+    @traced("keys.classify")
     def create_applications_list(self):
         """Creates a list of applications based on the contents of the config file.
 
-        This method generates a list of application names by filtering out unwanted
-        shows and specific keywords from the configuration file. It first gathers
-        all shows from the Linux farm that are considered unwanted and adds them
-        to a list of terms to avoid. It then iterates over the configuration keys,
-        adding only those that do not match any of the unwanted terms to the
-        applications list.
+        The limits table already classified every key when it was loaded: the
+        applications are the keys containing no show of the Linux farm and
+        none of 'linux', 'windows' or 'yeti'.
 
         Attributes:
             self (object): The object instance
@@ -173,21 +192,7 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        # This generates a list of all shows in the linux farm
-        unwanted_shows = []
-        for key in self.contents_dict["Limits"]["linuxfarm"]["Shares"].keys():
-            lower_key = str(key.lower())
-            unwanted_shows.append(lower_key)
-
-        # List for all applications in the config file (avoiding all unwanted
-        # shows and others)
-        avoid = ["linux", "windows", "yeti"]
-        for show in unwanted_shows:
-            avoid.append(show)
-
-        for key in self.contents_dict["Limits"].keys():
-            if all(word not in key for word in avoid):
-                self.applications.append(key)
+        self.applications = self.limits_table.application_keys()
 
     def application_limits_window_setup(self):
         """Sets up the application limits window, including the window's size,
@@ -317,22 +322,22 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
 
             return spinbox
 
-        def current_values_application(application, spinbox, capital_app):
-            """Updates the dictionary with the current values for an application.
+        def current_values_application(application, spinbox):
+            """Applies the current value of an application to its spin box and
+            starts tracking it in the change set.
 
             Parameters:
                 application (str): The name of the application.
                 spinbox (QtWidgets.QSpinBox): The spin box widget associated
                 with the application.
-                capital_app (str): The capitalized name of the application.
 
             Returns:
                 None
             """
 
-            current_value = self.contents_dict["Limits"][application]["SiteMax"]
+            current_value = self.limits_table.value(application)
             spinbox.setValue(current_value)
-            self.current_values_full_dict.update({capital_app: current_value})
+            self.change_set.connect_spinbox(application, spinbox)
 
         for application in self.applications:
 
@@ -344,11 +349,11 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
             )
             labels_list.append(label)
             spin_box = spin_box_creation(application, box_y_axis_value, x_axis_value)
-            self.spin_boxes_list.append(spin_box)
+            self.spinboxes_by_key[application] = spin_box
 
-            # Getting current Percentages per application to be able to pass it
-            # to the Confirmation Window
-            current_values_application(application, spin_box, capital_app)
+            # Getting current Percentages per application so only the ones
+            # changed are passed to the Confirmation Window
+            current_values_application(application, spin_box)
 
             label_y_axis_value += 65
             box_y_axis_value += 65
@@ -403,7 +408,8 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
 
     def button_creation(self):
         """Creates 'submit' and 'cancel' buttons within the application limits
-        group box.
+        group box. 'submit' stays disabled until something has been modified
+        or while a value breaks a constraint.
 
         Parameters:
             self (object): The class object where the buttons will be added.
@@ -417,6 +423,18 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
         submit_push_button.setGeometry(735, 380, 91, 22)
         submit_push_button.setFont(self.s_font)
 
+        # Flags values breaking a constraint and keeps Submit disabled while
+        # there is nothing to submit or something is flagged
+        self.constraint_engine = limits_constraints.load_constraint_engine(
+            self.config_file_path_name, self.limits_table
+        )
+        self.constraints_rebased = limits_constraints.connect_constraints(
+            self.constraint_engine,
+            self.change_set,
+            self.spinboxes_by_key,
+            submit_push_button,
+        )
+
         submit_push_button.clicked.connect(self.submit_button_clicked)
         submit_push_button.clicked.connect(self.close)
 
@@ -431,7 +449,8 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
 
     def submit_button_clicked(self):
         """Calls upon the Confirmation Window to check the values changed in
-        this window and continue the process.
+        this window and continue the process. Only the values modified through
+        the spin boxes are passed along.
 
         Parameters:
             self (object): The class object for managing the confirmation process.
@@ -440,20 +459,12 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        new_values_list = []
-        capital_apps_list = []
-        for app in self.applications:
-            capital_apps_list.append(app.capitalize())
-
-        for box in self.spin_boxes_list:
-            new_value = box.value()
-            new_values_list.append(new_value)
+        from changes_confirmation_window import UiConfirmFarmChangesMainWindow
 
-        new_values_full_dict = dict(zip(capital_apps_list, new_values_list))
         changes_confirmation_window = UiConfirmFarmChangesMainWindow(
-            self.current_values_full_dict,
-            new_values_full_dict,
-            self.contents_dict,
+            self.change_set.old_values(),
+            dict(self.change_set.new_values),
+            self.limits_table,
             self.config_file_path_name,
             self.temp_folder,
             self.backup_folder,
@@ -462,6 +473,62 @@ class UiApplicationLimitsMainWindow(QtWidgets.QMainWindow):
         changes_confirmation_window.show()
         self.close()
 
+    def watcher_creation(self):
+        """Keeps the window up to date while it is open.
+
+        When the configuration file or the staged 'temp.config' change
+        underneath the window (for example a colleague wrote new limits),
+        only the spin boxes of the keys that changed are updated and
+        highlighted, and Submit stages on top of the new values.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.limits_watcher = limits_watch.LimitsFileWatcher(
+            self.config_file_path_name, self.temp_folder, self.limits_table, self
+        )
+        self.limits_watcher.limits_changed.connect(self.limits_changed)
+
+    def limits_changed(self, table, changes):
+        """Shows the values changed by someone else.
+
+        Parameters:
+            self (object): The object instance.
+            table (LimitsTable): Limits as they are now.
+            changes (dict): (old, new) value per key that changed.
+
+        Returns:
+            None
+        """
+
+        self.limits_table = table
+        limits_watch.show_remote_changes(
+            changes, self.change_set, self.spinboxes_by_key
+        )
+        # What someone else wrote doesn't count as introduced by the user
+        if self.constraints_rebased is not None:
+            self.constraints_rebased()
+
+    def proposal_creation(self):
+        """Loads the proposed values into the spin boxes, so they are
+        reviewed and submitted like any other change.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        if self.proposed_values:
+            from limits_usage import show_proposed_values
+
+            show_proposed_values(self.proposed_values, self.spinboxes_by_key)
+
     def cancel_button_clicked(self):
         """Calls upon the main window of the UI if the user decides to cancel
         the process.
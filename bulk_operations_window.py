@@ -0,0 +1,399 @@
+#!/usr/bin/python3
+
+"""
+This window opens up when "Bulk Operations" is selected through the Main Limits
+Selection Window of the Farm UI. Scales, adds to, caps or sets the tags of many
+shows at once, e.g. the 'maya' tag of every show but one, and previews every
+key that changes as a single diff.
+Created using QtPy.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+from qtpy import QtGui, QtWidgets
+
+import limits_bulk
+import limits_constraints
+import limits_table
+from limits_diff_view import LimitsDiffView
+from limits_tracing import traced
+
+
+class UiBulkOperationsMainWindow(QtWidgets.QMainWindow):
+    """
+    The main window class for the bulk operations over the tags of the shows.
+
+    Every time the selection, the operation or its value changes, the new
+    values are computed again in one pass over the limits table and the diff is
+    refreshed. The changes go through the usual Confirmation, Stage and Write
+    windows as one change set.
+
+    Args:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+        backup_folder (str): Path to the backup folder.
+
+    Methods:
+        setup_ui(): Sets up the user interface components.
+        bulk_operations_window_setup(): Sets up the bulk operations window.
+        groupbox_creation(): Creates the group box of the window.
+        list_creation(): Creates the lists of shows and tags.
+        operation_creation(): Creates the operation and value widgets.
+        diff_view_creation(): Creates the diff of the keys that change.
+        button_creation(): Creates the 'submit' and 'cancel' buttons.
+        refresh_preview(): Computes the changes again and refreshes the diff.
+        submit_button_clicked(): Opens the Confirmation Window with the changes.
+        cancel_button_clicked(): Opens the main window of the UI again.
+    """
+
+    def __init__(self, config_file_path_name, temp_folder, backup_folder):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            config_file_path_name (str): Path to the main configuration file.
+            temp_folder (str): Path to the temporary folder.
+            backup_folder (str): Path to the backup folder.
+
+        Attributes:
+            limits_table (LimitsTable): Limits of the configuration file being
+            edited, shared with the other windows.
+            changes (OrderedDict): New value per key changed by the operation.
+            constraint_engine (LimitsConstraintEngine): Cross-limit constraints
+            checked against the changes.
+
+        UI Components:
+            centralwidget (QWidget): Central widget for the main window.
+            bulk_groupbox (QGroupBox): Group box for the bulk operations.
+            shows_list (QListWidget): Shows the operation applies to.
+            tags_list (QListWidget): Tags the operation applies to.
+            operation_combo_box (QComboBox): Operation to apply.
+            operand_spinbox (QDoubleSpinBox): Factor, amount or value applied.
+            summary_label (QLabel): Amount of keys selected and changed.
+            diff_view (LimitsDiffView): Diff of the keys that change.
+            submit_push_button (QPushButton): Button opening the confirmation.
+
+        Calls:
+            setup_ui(): Sets up the user interface components.
+        """
+
+        super().__init__()
+
+        # All Folders
+        self.config_file_path_name = config_file_path_name
+        self.temp_folder = temp_folder
+        self.backup_folder = backup_folder
+
+        self.limits_table = limits_table.load_session_table(
+            config_file_path_name, temp_folder
+        )
+
+        # Variables
+        self.changes = {}
+        self.constraint_engine = limits_constraints.load_constraint_engine(
+            config_file_path_name, self.limits_table
+        )
+
+        # Sections of the window
+        self.centralwidget = ""
+        self.bulk_groupbox = None
+        self.shows_list = None
+        self.tags_list = None
+        self.operation_combo_box = None
+        self.operand_spinbox = None
+        self.summary_label = None
+        self.diff_view = None
+        self.submit_push_button = None
+
+        # Fonts
+        self.l_font = QtGui.QFont(
+            "Cantarell", 14, QtGui.QFont.Bold, QtGui.QFont.StyleItalic
+        )
+        self.l_font.setUnderline(True)
+        self.s_font = QtGui.QFont("Cantarell", 12)
+
+        self.setup_ui()
+
+    @traced("ui.bulk_operations_window", profile=True)
+    def setup_ui(self):
+        """Sets up the user interface for the Bulk Operations.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.bulk_operations_window_setup()
+        self.groupbox_creation()
+        self.list_creation()
+        self.operation_creation()
+        self.diff_view_creation()
+        self.button_creation()
+        self.refresh_preview()
+
+        self.shows_list.itemSelectionChanged.connect(self.refresh_preview)
+        self.tags_list.itemSelectionChanged.connect(self.refresh_preview)
+        self.operation_combo_box.currentIndexChanged.connect(self.refresh_preview)
+        self.operand_spinbox.valueChanged.connect(self.refresh_preview)
+
+    def bulk_operations_window_setup(self):
+        """Sets up the bulk operations window, including the window's size,
+        style, and title, and centers it on the screen.
+
+        Parameters:
+            self (object): The object instance
+
+        Returns:
+            None
+        """
+
+        # Title of the Main Window can be changed here.
+        self.setWindowTitle("Bulk Operations Window")
+        # Window Size can be adjusted here
+        self.setFixedSize(600, 560)
+        # Using this style sheet the theme can be changed
+        self.setStyleSheet(
+            """background-color: rgb(46, 52, 54);color: rgb(238, 238, 236);"""
+        )
+
+        self.centralwidget = QtWidgets.QWidget(self)
+        self.setCentralWidget(self.centralwidget)
+
+        def center_window(window):
+
+            frame = window.frameGeometry()
+            screen = QtGui.QGuiApplication.screenAt(QtGui.QCursor().pos())
+
+            if screen is None:
+                screen = QtGui.QGuiApplication.primaryScreen()
+
+            frame.moveCenter(screen.geometry().center())
+            window.move(frame.topLeft())
+
+        center_window(self)
+
+    def groupbox_creation(self):
+        """Creates the group box of the window.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        # Title of the Group Box
+        self.bulk_groupbox = QtWidgets.QGroupBox("Bulk Operations", self.centralwidget)
+        self.bulk_groupbox.setFont(self.l_font)
+        self.bulk_groupbox.setGeometry(10, 10, 580, 540)
+
+        def_label = QtWidgets.QLabel(
+            "Select the shows and the tags to change, then the operation to "
+            "apply to all of them:",
+            self.bulk_groupbox,
+        )
+        def_label.setGeometry(10, 35, 560, 41)
+        def_label.setFont(self.s_font)
+        def_label.setWordWrap(True)
+
+    def list_creation(self):
+        """Creates the lists of shows and tags, every item selected at first.
+        Ctrl and Shift select or leave out more than one item.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        def selection_list(title, items, x_axis_value):
+            label = QtWidgets.QLabel(title, self.bulk_groupbox)
+            label.setGeometry(x_axis_value, 80, 180, 22)
+            label.setFont(self.s_font)
+
+            item_list = QtWidgets.QListWidget(self.bulk_groupbox)
+            item_list.setGeometry(x_axis_value, 105, 180, 150)
+            item_list.setFont(self.s_font)
+            item_list.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+            item_list.addItems(items)
+            item_list.selectAll()
+
+            return item_list
+
+        self.shows_list = selection_list(
+            "Shows", [show.upper() for show in self.limits_table.show_positions], 10
+        )
+        self.shows_list.sortItems()
+        self.tags_list = selection_list(
+            "Tags", limits_bulk.tag_names(self.limits_table), 200
+        )
+
+    def operation_creation(self):
+        """Creates the operation combo box, the spin box of its value and the
+        summary of the keys selected and changed.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.operation_combo_box = QtWidgets.QComboBox(self.bulk_groupbox)
+        self.operation_combo_box.setGeometry(390, 105, 180, 22)
+        self.operation_combo_box.setFont(self.s_font)
+        self.operation_combo_box.setStyleSheet("color : #A7F432")
+        self.operation_combo_box.addItems(
+            [operation.capitalize() for operation in limits_bulk.OPERATIONS]
+        )
+
+        self.operand_spinbox = QtWidgets.QDoubleSpinBox(self.bulk_groupbox)
+        self.operand_spinbox.setGeometry(390, 140, 180, 22)
+        self.operand_spinbox.setFont(self.s_font)
+        self.operand_spinbox.setRange(
+            -limits_bulk.MAXIMUM_VALUE, limits_bulk.MAXIMUM_VALUE
+        )
+        self.operand_spinbox.setSingleStep(0.1)
+        self.operand_spinbox.setValue(1.0)
+
+        self.summary_label = QtWidgets.QLabel(self.bulk_groupbox)
+        self.summary_label.setGeometry(390, 175, 180, 80)
+        self.summary_label.setFont(self.s_font)
+        self.summary_label.setWordWrap(True)
+
+    def diff_view_creation(self):
+        """Creates the diff of the keys that change, sortable by any column and
+        filtered by key using the field above it.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.diff_view = LimitsDiffView({}, {}, self.s_font, self.bulk_groupbox)
+        self.diff_view.setGeometry(10, 265, 560, 230)
+
+    def button_creation(self):
+        """Creates 'submit' and 'cancel' buttons within the bulk group box.
+        'submit' stays disabled while nothing changes or a change breaks a
+        constraint.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        # Name can be changed here
+        self.submit_push_button = QtWidgets.QPushButton("Submit", self.bulk_groupbox)
+        self.submit_push_button.setGeometry(380, 505, 91, 22)
+        self.submit_push_button.setFont(self.s_font)
+        self.submit_push_button.setEnabled(False)
+
+        self.submit_push_button.clicked.connect(self.submit_button_clicked)
+        self.submit_push_button.clicked.connect(self.close)
+
+        # Name can be changed here
+        cancel_push_button = QtWidgets.QPushButton("Cancel", self.bulk_groupbox)
+        cancel_push_button.setGeometry(480, 505, 91, 22)
+        cancel_push_button.setFont(self.s_font)
+
+        cancel_push_button.clicked.connect(self.cancel_button_clicked)
+        cancel_push_button.clicked.connect(self.close)
+
+    def refresh_preview(self):
+        """Computes the changes of the operation again, refreshes the diff and
+        checks whether the changes break a constraint.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        positions = limits_bulk.select_positions(
+            self.limits_table,
+            [item.text() for item in self.shows_list.selectedItems()],
+            [item.text() for item in self.tags_list.selectedItems()],
+        )
+        changes = limits_bulk.compute_changes(
+            self.limits_table,
+            positions,
+            self.operation_combo_box.currentText().lower(),
+            self.operand_spinbox.value(),
+        )
+
+        # Keys of the previous preview left out now go back to their value
+        for key in self.changes.keys() - changes.keys():
+            self.constraint_engine.update(key, self.limits_table.value(key))
+        for key, value in changes.items():
+            self.constraint_engine.update(key, value)
+        self.changes = changes
+
+        old_values = limits_bulk.old_values(self.limits_table, changes)
+        self.diff_view.set_values(old_values, changes)
+
+        # Violations the farm already had don't block the operation
+        violations = self.constraint_engine.introduced()
+        summary = f"Tags selected: {len(positions)}\nKeys changing: {len(changes)}"
+        if violations:
+            summary += "\n" + "\n".join(
+                violation.message(self.constraint_engine.values)
+                for violation in violations
+            )
+        self.summary_label.setText(summary)
+        self.summary_label.setStyleSheet(
+            limits_constraints.VIOLATION_STYLE_SHEET if violations else ""
+        )
+
+        self.submit_push_button.setEnabled(bool(changes) and not violations)
+
+    def submit_button_clicked(self):
+        """Calls upon the Confirmation Window with the changes of the
+        operation, which then go through the usual Stage and Write windows.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+
+        changes_confirmation_window = UiConfirmFarmChangesMainWindow(
+            limits_bulk.old_values(self.limits_table, self.changes),
+            dict(self.changes),
+            self.limits_table,
+            self.config_file_path_name,
+            self.temp_folder,
+            self.backup_folder,
+        )
+
+        changes_confirmation_window.show()
+
+    def cancel_button_clicked(self):
+        """Calls upon the main window of the UI if the user decides to cancel
+        the process.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from main_limits_selection_window import UiLimitsMainWindow
+
+        farm_selection_windows = UiLimitsMainWindow()
+        farm_selection_windows.show()
@@ -11,17 +11,15 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-import json
-import os
-
-import subprocess
 import sys
-from urllib.request import urlopen
-from time import sleep
-import datetime
-from datetime import date
 from functools import partial
-from qtpy import QtGui, QtWidgets
+from qtpy import QtCore, QtGui, QtWidgets
+
+import limits_config
+import limits_daemon
+import limits_farms
+from limits_tracing import LOGGER, span, traced
+from limits_undo import SESSION_UNDO_STACK
 
 
 class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
@@ -39,7 +37,7 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         contents_dict (dict): Dictionary containing the contents of the configuration file.
         backup_folder (str): Path to the backup folder.
         new_values_full_dict (dict): Dictionary containing the new license
-        values for each application.
+        values for each modified limit key.
 
     Methods:
         __init__(config_file_path_name, temp_folder, contents_dict, backup_folder,
@@ -54,6 +52,10 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         applied group box.
         button_creation(): Creates and configures buttons within the changes
         applied group box and connects them to their respective actions.
+        undo_redo_creation(): Creates the Undo/Redo buttons for the changes
+        staged during the session.
+        history_label_update(text): Shows the last action of the Undo/Redo history.
+        farms_creation(): Creates the list of other farms to also write to.
     """
 
     def __init__(
@@ -73,10 +75,10 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         Args:
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder.
-            contents_dict (dict): Dictionary containing the contents of the configuration file.
+            contents_dict (LimitsTable): Limits of the configuration file being edited.
             backup_folder (str): Path to the backup folder.
             new_values_full_dict (dict): Dictionary containing the new license
-            values for each application.
+            values for each modified limit key.
 
         Attributes:
             config_file_path_name (str): Path to the main configuration file.
@@ -84,7 +86,9 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
             contents_dict (dict): Dictionary containing the contents of the configuration file.
             backup_folder (str): Path to the backup folder.
             new_values_full_dict (dict): Dictionary containing the new license
-            values for each application.
+            values for each modified limit key.
+            farm (LimitFarm): Farm the changes were staged for.
+            other_farms (list): Every other farm the changes can be written to.
 
         UI Components:
             centralwidget (QWidget): Central widget for the main window.
@@ -107,9 +111,26 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         self.backup_folder = backup_folder
         self.new_values_full_dict = new_values_full_dict
 
+        # Farms
+        farms = limits_farms.load_farms()
+        self.farm = limits_farms.farm_for_config(
+            config_file_path_name, farms
+        ) or limits_farms.LimitFarm(
+            config_file_path_name, config_file_path_name, temp_folder, backup_folder
+        )
+        self.other_farms = [
+            farm for farm in farms.values() if farm.name != self.farm.name
+        ]
+        # Extra height of the window when there are other farms to write to
+        self.farms_height = 60 if self.other_farms else 0
+
         # Sections of the window
         self.centralwidget = ""
         self.changes_applied_groupbox = None
+        self.farms_list = None
+        self.history_label = None
+        self.undo_pushbutton = None
+        self.redo_pushbutton = None
 
         # Fonts
         self.l_font = QtGui.QFont(
@@ -120,6 +141,7 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
 
         self.setup_ui()
 
+    @traced("ui.changes_applied_window", profile=True)
     def setup_ui(self):
         """Sets up the user interface for the 'Changes Applied' main window.
 
@@ -136,7 +158,9 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         self.changes_applied_window_setup()
         self.groupbox_creation()
         self.label_creation()
+        self.farms_creation()
         self.button_creation()
+        self.undo_redo_creation()
 
     def changes_applied_window_setup(self):
         """Sets up the main window of the 'Changes Applied' application.
@@ -154,7 +178,7 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         # Title of the Main Window can be changed here.
         self.setWindowTitle("Write File Window")
         # Window Size can be adjusted here
-        self.setFixedSize(463, 161)
+        self.setFixedSize(463, 161 + self.farms_height)
         # Using this style sheet the theme can be changed
         self.setStyleSheet(
             """background-color: rgb(46, 52, 54);color: rgb(238, 238, 236);"""
@@ -206,7 +230,7 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         self.changes_applied_groupbox = QtWidgets.QGroupBox(
             "Write to File Or Make More Changes", self.centralwidget
         )
-        self.changes_applied_groupbox.setGeometry(10, 10, 441, 141)
+        self.changes_applied_groupbox.setGeometry(10, 10, 441, 141 + self.farms_height)
         self.changes_applied_groupbox.setFont(self.l_font)
 
     def label_creation(self):
@@ -226,10 +250,60 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         question_label = QtWidgets.QLabel(
             "Would you like to make more changes?", self.changes_applied_groupbox
         )
-        question_label.setGeometry(10, 35, 271, 61)
+        question_label.setGeometry(10, 35, 271, 31)
         question_label.setFont(self.s_font)
         question_label.setWordWrap(True)
 
+    def farms_creation(self):
+        """Creates the list of the other farms the changes can also be written
+        to, only when there are other farms.
+
+        Parameters:
+            self (object): The current instance of the class.
+
+        Returns:
+            None
+        """
+
+        if not self.other_farms:
+            return
+
+        farms_label = QtWidgets.QLabel(
+            "Also write to:", self.changes_applied_groupbox
+        )
+        farms_label.setGeometry(10, 110, 111, 22)
+        farms_label.setFont(self.s_font)
+
+        self.farms_list = QtWidgets.QListWidget(self.changes_applied_groupbox)
+        self.farms_list.setGeometry(120, 110, 311, 51)
+        self.farms_list.setFont(self.s_font)
+        self.farms_list.setFlow(QtWidgets.QListView.LeftToRight)
+        self.farms_list.setWrapping(True)
+
+        for farm in self.other_farms:
+            item = QtWidgets.QListWidgetItem(farm.name, self.farms_list)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Unchecked)
+
+    def checked_farms(self):
+        """Returns the other farms ticked in the list.
+
+        Parameters:
+            self (object): The current instance of the class.
+
+        Returns:
+            list: LimitFarm of every ticked farm.
+        """
+
+        if self.farms_list is None:
+            return []
+
+        return [
+            farm
+            for row, farm in enumerate(self.other_farms)
+            if self.farms_list.item(row).checkState() == QtCore.Qt.Checked
+        ]
+
     def button_creation(self):
         """Creates and configures the action buttons within the "Changes Applied" group box.
 
@@ -249,7 +323,7 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         more_changes_pushbutton = QtWidgets.QPushButton(
             "More Changes", self.changes_applied_groupbox
         )
-        more_changes_pushbutton.setGeometry(160, 110, 121, 22)
+        more_changes_pushbutton.setGeometry(160, 110 + self.farms_height, 121, 22)
         more_changes_pushbutton.setFont(self.s_font)
         more_changes_pushbutton.setStyleSheet("color : yellow")
 
@@ -280,33 +354,38 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         exit_pushbutton = QtWidgets.QPushButton(
             "Exit/Discard", self.changes_applied_groupbox
         )
-        exit_pushbutton.setGeometry(310, 110, 121, 22)
+        exit_pushbutton.setGeometry(310, 110 + self.farms_height, 121, 22)
         exit_pushbutton.setFont(self.s_font)
         exit_pushbutton.setStyleSheet("color : #D21404")
 
-        def delete_tmp(tf):  # temp_folder
-            tmp_file_name = f"{tf}temp.config"
-            os.remove(tmp_file_name)
-
-        exit_pushbutton.clicked.connect(partial(delete_tmp, self.temp_folder))
+        exit_pushbutton.clicked.connect(
+            partial(limits_config.discard_staged, self.temp_folder)
+        )
+        exit_pushbutton.clicked.connect(SESSION_UNDO_STACK.clear)
         exit_pushbutton.clicked.connect(self.close)
 
         # Text can be changed here
         write_button = QtWidgets.QPushButton("Write", self.changes_applied_groupbox)
-        write_button.setGeometry(10, 110, 121, 22)
+        write_button.setGeometry(10, 110 + self.farms_height, 121, 22)
         write_button.setFont(self.s_font)
         write_button.setStyleSheet("color : #A7F432")
 
         def write_to_config():
             """Applies changes to the configuration file and updates the system.
 
-            This method performs several tasks:
+            This method performs several tasks for the farm the changes were
+            staged for and every other farm ticked, all of them in parallel:
             1. It backs up the current configuration file if it exists.
-            2. It removes a temporary configuration file.
-            3. It writes the updated configuration data to the main configuration file.
-            4. It reloads the configuration by running an external script.
-            5. It verifies the successful application of changes by comparing
-            values on a remote website.
+            2. It writes the updated configuration data to the main configuration file,
+            merged with whatever changed on disk since the session read it.
+            3. It reloads the configuration by running the reload script of the farm.
+            4. It verifies the successful application of changes by comparing
+            values on the engine website of the farm.
+            5. It records every changed key in the audit log of the farm.
+            Finally it removes the temporary configuration file. When the limits
+            daemon is running it does all of it, one commit at a time.
+
+            Every phase is timed and logged through limits_tracing.
 
             Parameters:
                 None
@@ -315,85 +394,127 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
                 None
             """
 
-            print("The write_to_config() method has started")
-
-            # Move this to the next window
-            if os.path.exists(self.config_file_path_name):
-
-                backup_file_name = (
-                    f"{self.backup_folder}D{date.today()}"
-                    f"-T{datetime.datetime.now().strftime('%H:%M:%S')}.config"
+            with span("ui.write", source="ui"):
+                LOGGER.info("The write_to_config() method has started")
+
+                # Every value changed during the session (or the 'New Values
+                # Directory' sent from the previous window) is verified against
+                # the engine of every farm in one batch
+                if SESSION_UNDO_STACK:
+                    new_values = {
+                        key: new
+                        for key, (_, new) in SESSION_UNDO_STACK.net_changes().items()
+                    }
+                else:
+                    new_values = self.new_values_full_dict
+
+                # The farm the changes were staged for writes the staged
+                # contents, the other ones get the same values applied to
+                # their own configuration file
+                farms = [self.farm] + self.checked_farms()
+                results = limits_daemon.commit(
+                    farms,
+                    new_values,
+                    {self.farm.name: self.contents_dict},
+                    self.temp_folder,
                 )
 
-                final_backup_file = backup_file_name.replace(":", "")
-                os.rename(self.config_file_path_name, final_backup_file)
-
-                tmp_file_name = f"{self.temp_folder}temp.config"
-                os.remove(tmp_file_name)
-
-            json.dump(
-                self.contents_dict, open(self.config_file_path_name, mode="w"), indent=4
-            )
-
-            # Reloads config file
-            reload_process = subprocess.Popen(
-                "/bin/bash /sw/pipeline/rendering/"
-                "tractor-config-tools/reloadconfig_bash.sh",
-                shell=True,
-            )
-            reload_process.wait()
-            index = 1
-
-            # Checking if the command was completed successfully
-            if reload_process.returncode == 0:
-                print("The first reload of the config file has just occurred :)")
-                print("Command succeeded!")
-            else:
-                print("Command failed")
-
-            # Loading website containing the updated '.config' file info
-            web_info = urlopen("http://tractor-engine/Tractor/queue?q=limits")
-            sleep(5)
-            web_info_dict = json.load(web_info)
-            print("Config-file website has just been fully loaded!")
-
-            # Iterates through the 'New Values Directory' sent from the
-            # previous window and compares every value to those in the
-            # 'Tractor Limits' website.
-            for application, limit in self.new_values_full_dict.items():
-                web_value = web_info_dict["Limits"][application.lower()]["SiteMax"]
-                index = 1
-                print(web_value, limit)
-
-                while web_value != limit:
-
-                    web_info = urlopen("http://tractor-engine/Tractor/queue?q=limits")
-                    sleep(5)
-                    web_info_dict = json.load(web_info)
-                    index += 1
-
-                    if 1 < index < 7:
-                        reload_process = subprocess.Popen(
-                            "/bin/bash /sw/pipeline/rendering/"
-                            "tractor-config-tools/reloadconfig_bash.sh",
-                            shell=True,
-                        )
-                        reload_process.wait()
-
-                        if reload_process.returncode == 0:
-                            print("Command apparently succeeded in 'while' loop")
-                        else:
-                            print("Command failed")
-
-                        print(f"Amount of config-reloads: {index}")
-
-                    elif index == 8:
-                        print(
-                            "The Config was reloaded too many times before "
-                            "this change could be properly applied. Attempt "
-                            "to reload manually."
-                        )
-                        sys.exit()
+                if not limits_farms.log_results(results):
+                    LOGGER.error(
+                        "The Config was reloaded too many times before "
+                        "this change could be properly applied. Attempt "
+                        "to reload manually."
+                    )
+                    sys.exit()
+
+                # Only once every farm has the values, a failed commit keeps
+                # the history to undo or write again
+                SESSION_UNDO_STACK.clear()
 
         write_button.clicked.connect(write_to_config)
         write_button.clicked.connect(self.close)
+
+    def undo_redo_creation(self):
+        """Creates the Undo and Redo buttons within the "Changes Applied" group box.
+
+        Undoing or redoing walks the Undo/Redo history of the whole session, no
+        matter which window staged the changes. The values are changed in the
+        contents already in memory and staged again, without reading any file.
+
+        Parameters:
+            self (object): The current instance of the class.
+
+        Returns:
+            None
+        """
+
+        self.history_label = QtWidgets.QLabel("", self.changes_applied_groupbox)
+        self.history_label.setGeometry(10, 70, 281, 31)
+        self.history_label.setFont(self.s_font)
+        self.history_label.setWordWrap(True)
+
+        self.undo_pushbutton = QtWidgets.QPushButton(
+            "Undo", self.changes_applied_groupbox
+        )
+        self.undo_pushbutton.setGeometry(300, 45, 61, 22)
+        self.undo_pushbutton.setFont(self.s_font)
+
+        self.redo_pushbutton = QtWidgets.QPushButton(
+            "Redo", self.changes_applied_groupbox
+        )
+        self.redo_pushbutton.setGeometry(370, 45, 61, 22)
+        self.redo_pushbutton.setFont(self.s_font)
+
+        def undo_redo_clicked(undo):
+            """Undoes or redoes the last staged changes and stages the result.
+
+            Parameters:
+                undo (bool): True to undo, False to redo.
+
+            Returns:
+                None
+            """
+
+            if undo:
+                command = SESSION_UNDO_STACK.undo(self.contents_dict)
+                action = "Undone"
+            else:
+                command = SESSION_UNDO_STACK.redo(self.contents_dict)
+                action = "Redone"
+
+            if command is not None:
+                limits_daemon.stage(
+                    self.contents_dict,
+                    {
+                        key: old if undo else new
+                        for key, old, new in command.changes
+                    },
+                    self.config_file_path_name,
+                    self.temp_folder,
+                )
+                self.history_label_update(f"{action}: {command.description()}")
+
+        self.undo_pushbutton.clicked.connect(partial(undo_redo_clicked, True))
+        self.redo_pushbutton.clicked.connect(partial(undo_redo_clicked, False))
+
+        if SESSION_UNDO_STACK.undo_commands:
+            last_command = SESSION_UNDO_STACK.undo_commands[-1]
+            self.history_label_update(f"Staged: {last_command.description()}")
+        else:
+            self.history_label_update("")
+
+    def history_label_update(self, text):
+        """Shows the last action of the Undo/Redo history and enables the
+        Undo and Redo buttons only when there is something to undo or redo.
+
+        Parameters:
+            self (object): The current instance of the class.
+            text (str): Text describing the last action.
+
+        Returns:
+            None
+        """
+
+        self.history_label.setText(text)
+        self.undo_pushbutton.setEnabled(bool(SESSION_UNDO_STACK.undo_commands))
+        self.redo_pushbutton.setEnabled(bool(SESSION_UNDO_STACK.redo_commands))
@@ -11,11 +11,11 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-import json
 from qtpy import QtGui, QtWidgets
 
-from changes_applied_window import UiChangesAppliedMainWindow
-from main_limits_selection_window import UiLimitsMainWindow
+from limits_diff_view import LimitsDiffView
+from limits_tracing import traced
+from limits_undo import SESSION_UNDO_STACK, StageCommand
 
 
 class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
@@ -28,9 +28,9 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
 
     Args:
         current_values_full_dict (dict): Dictionary containing the current
-        license values for each application.
+        license values for each modified limit key.
         new_values_full_dict (dict): Dictionary containing the new license
-        values for each application.
+        values for each modified limit key.
         contents_dict (dict): Dictionary containing the contents of the
         configuration file.
         config_file_path_name (str): Path to the main configuration file.
@@ -43,8 +43,8 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         changes confirmation interface.
         groupbox_creation(): Creates a group box for the 'Review Your Changes'
         section of the window.
-        text_browser_creation(): Creates text browsers for displaying current
-        and new application limits.
+        diff_view_creation(): Creates the diff view comparing current and new
+        limits.
         label_creation(): Creates labels for the 'Review Your Changes' group box.
         button_creation(): Creates and configures buttons for the
         'Review Your Changes' group box.
@@ -70,19 +70,19 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
 
         Args:
             current_values_full_dict (dict): Dictionary containing the current
-            license values for each application.
+            license values for each modified limit key.
             new_values_full_dict (dict): Dictionary containing the new license
-            values for each application.
-            contents_dict (dict): Dictionary containing the contents of the configuration file.
+            values for each modified limit key.
+            contents_dict (LimitsTable): Limits of the configuration file being edited.
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder.
             backup_folder (str): Path to the backup folder.
 
         Attributes:
             current_values_full_dict (dict): Dictionary containing the current
-            license values for each application.
+            license values for each modified limit key.
             new_values_full_dict (dict): Dictionary containing the new license
-            values for each application.
+            values for each modified limit key.
             contents_dict (dict): Dictionary containing the contents of the
             configuration file.
             config_file_path_name (str): Path to the main configuration file.
@@ -91,6 +91,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             centralwidget (QWidget): Central widget for the main window.
             confirm_changes_groupbox (QGroupBox): Group box for the confirm
             changes UI components.
+            diff_view (LimitsDiffView): Table comparing current and new limits.
 
         Fonts:
             l_font (QFont): Large, bold, italic font with underline for headings.
@@ -113,6 +114,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         # Sections of the window
         self.centralwidget = ""
         self.confirm_changes_groupbox = None
+        self.diff_view = None
 
         # Fonts
         self.l_font = QtGui.QFont(
@@ -125,6 +127,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
 
         self.setup_ui()
 
+    @traced("ui.confirmation_window", profile=True)
     def setup_ui(self):
         """Sets up the user interface for the App Limits application.
 
@@ -144,8 +147,8 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         self.changes_confirm_window_setup()
         # Create the groupbox
         self.groupbox_creation()
-        # Create Text Browser
-        self.text_browser_creation()
+        # Create Diff View
+        self.diff_view_creation()
         # Label Creation
         self.label_creation()
         # Button Creation
@@ -211,15 +214,14 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         self.confirm_changes_groupbox.setFont(self.l_font)
         self.confirm_changes_groupbox.setGeometry(10, 10, 441, 331)
 
-    def text_browser_creation(self):
+    def diff_view_creation(self):
         """
-        Creates text browsers for displaying current and new application limits.
+        Creates the diff view comparing the current and new limits.
 
-        This method sets up two read-only QTextBrowser widgets within the
-        "Review Your Changes" group box. The first text browser displays the
-        current application limits, and the second text browser displays the
-        new application limits. It configures the geometry and font for each
-        text browser and populates them with the respective data.
+        This method sets up a single read-only table within the "Review Your
+        Changes" group box listing every modified key with its value before,
+        its value after and the delta. The table can be sorted by any column
+        and filtered by key using the field above it.
 
         Parameters:
             self (object): The object instance
@@ -228,31 +230,21 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        before_text_browser = QtWidgets.QTextBrowser(self.confirm_changes_groupbox)
-        before_text_browser.setGeometry(10, 140, 141, 131)
-        before_text_browser.setFont(self.s_font)
-        before_text_browser.setReadOnly(True)
-
-        for application, limits in self.current_values_full_dict.items():
-            before_text_browser.append(f"{application}: {limits}")
-
-        after_text_browser = QtWidgets.QTextBrowser(self.confirm_changes_groupbox)
-        after_text_browser.setGeometry(230, 140, 141, 131)
-        after_text_browser.setFont(self.s_font)
-        after_text_browser.setReadOnly(True)
-        after_text_browser.setObjectName("after_text_browser")
-
-        for application, limits in self.new_values_full_dict.items():
-            after_text_browser.append(f"{application}: {limits}")
+        self.diff_view = LimitsDiffView(
+            self.current_values_full_dict,
+            self.new_values_full_dict,
+            self.s_font,
+            self.confirm_changes_groupbox,
+        )
+        self.diff_view.setGeometry(10, 100, 421, 191)
 
     def label_creation(self):
         """Creates labels for the "Review Your Changes" group box.
 
-        This method sets up and configures several QLabel widgets within
-        the "Review Your Changes" group box. These labels provide instructional
-        text and headings for the text browsers that display the current and
-        new application limits. The method configures the text, geometry, font,
-        word wrap, and style for each label.
+        This method sets up and configures the QLabel widget within the
+        "Review Your Changes" group box that provides the instructional text
+        for the diff view. The method configures the text, geometry, font and
+        word wrap of the label.
 
         Parameters:
             self (object): The object instance
@@ -268,22 +260,10 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             "apply them:",
             self.confirm_changes_groupbox,
         )
-        review_changes_label.setGeometry(10, 40, 421, 61)
+        review_changes_label.setGeometry(10, 35, 421, 61)
         review_changes_label.setFont(self.s_font)
         review_changes_label.setWordWrap(True)
 
-        before_label = QtWidgets.QLabel("Before:", self.confirm_changes_groupbox)
-        before_label.setGeometry(10, 110, 61, 20)
-        before_label.setFont(self.l_font)
-        before_label.setWordWrap(True)
-        before_label.setStyleSheet("color : #D21404")
-
-        after_label = QtWidgets.QLabel("After:", self.confirm_changes_groupbox)
-        after_label.setGeometry(230, 110, 51, 20)
-        after_label.setFont(self.l_font)
-        after_label.setWordWrap(True)
-        after_label.setStyleSheet("color : #A7F432")
-
     def button_creation(self):
         """Creates and configures buttons for the "Review Your Changes" group box.
 
@@ -312,8 +292,10 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             """Stages changes and opens the "Changes Applied" window.
 
             This method performs the following tasks:
-            1. Creates a temporary configuration file and updates it with the new values.
-            2. Writes the updated configuration data to the temporary file.
+            1. Updates the configuration data with the modified values only and
+            records them in the session's Undo/Redo history.
+            2. Writes the updated configuration data to the temporary file,
+            through the limits daemon when it is running.
             3. Initializes and displays the "Changes Applied" window, passing necessary
             configuration details for further processing.
 
@@ -324,13 +306,24 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
                 None
             """
 
-            tmp_file_name = f"{self.temp_folder}temp.config"
+            import limits_daemon
+            from changes_applied_window import UiChangesAppliedMainWindow
 
-            for application, limit in self.new_values_full_dict.items():
-                self.contents_dict["Limits"][application.lower()]["SiteMax"] = limit
+            stage_command = StageCommand(
+                {
+                    application: (self.current_values_full_dict[application], limit)
+                    for application, limit in self.new_values_full_dict.items()
+                }
+            )
+            stage_command.apply(self.contents_dict)
+            SESSION_UNDO_STACK.push(stage_command)
 
-            with open(tmp_file_name, mode="w") as created_file:
-                json.dump(self.contents_dict, created_file, indent=4)
+            limits_daemon.stage(
+                self.contents_dict,
+                self.new_values_full_dict,
+                self.config_file_path_name,
+                self.temp_folder,
+            )
 
             changes_applied_window = UiChangesAppliedMainWindow(
                 self.config_file_path_name,
@@ -364,5 +357,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             None
         """
 
+        from main_limits_selection_window import UiLimitsMainWindow
+
         main_limits_window = UiLimitsMainWindow()
         main_limits_window.show()  # Sections of the window
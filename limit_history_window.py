@@ -0,0 +1,472 @@
+#!/usr/bin/python3
+
+"""
+This window opens up when "Limit History" is selected through the Main Limits
+Selection Window of the Farm UI. Draws how a limit changed over time from the
+columnar history index of the backup folder, and lists who changed it from the
+audit log.
+Created using QtPy.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+import datetime
+import time
+from qtpy import QtCore, QtGui, QtWidgets
+
+import limits_audit
+import limits_config
+import limits_history_index
+from limits_tracing import traced
+
+# Name of every range of the combo box and how many days it covers
+HISTORY_RANGES = (
+    ("Last 24 Hours", 1),
+    ("Last 7 Days", 7),
+    ("Last 30 Days", 30),
+    ("Last 90 Days", 90),
+    ("Last Year", 365),
+    ("Everything", None),
+)
+
+
+class LimitSparkline(QtWidgets.QWidget):
+    """Step chart of the values of one limit over a time range.
+
+    Args:
+        parent (QWidget): Parent widget.
+
+    Methods:
+        set_points(timestamps, values, start, end): Changes what is drawn.
+        paintEvent(event): Draws the chart.
+    """
+
+    def __init__(self, parent=None):
+        """Starts with nothing to draw."""
+
+        super().__init__(parent)
+
+        self.timestamps = ()
+        self.values = ()
+        self.start = 0
+        self.end = 1
+
+    def set_points(self, timestamps, values, start, end):
+        """Changes the points drawn, every value lasts until the next one.
+        Nothing is drawn while the limit was removed.
+
+        Parameters:
+            timestamps (sequence): Time of every change, since the epoch.
+            values (sequence): Value after every change, REMOVED while the
+            limit wasn't in the '.config' file.
+            start (int): Time at the left edge of the chart.
+            end (int): Time at the right edge of the chart.
+
+        Returns:
+            None
+        """
+
+        self.timestamps = timestamps
+        self.values = values
+        self.start = start
+        self.end = max(end, start + 1)
+        self.update()
+
+    def paintEvent(self, event):
+        """Draws the values as a step line scaled to the widget.
+
+        Parameters:
+            event (QPaintEvent): The paint event.
+
+        Returns:
+            None
+        """
+
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtGui.QPen(QtGui.QColor("#555753"), 1))
+        painter.drawRect(0, 0, self.width() - 1, self.height() - 1)
+
+        present = [
+            value for value in self.values if value != limits_history_index.REMOVED
+        ]
+        if not present:
+            return
+
+        low = min(present)
+        spread = (max(present) - low) or 1
+        width = self.width() - 8
+        height = self.height() - 8
+        span = self.end - self.start
+
+        def x(moment):
+            return 4 + width * (max(moment, self.start) - self.start) / span
+
+        def y(value):
+            return 4 + height - height * (value - low) / spread
+
+        painter.setPen(QtGui.QPen(QtGui.QColor("#A7F432"), 2))
+
+        # One line per stretch of time the limit existed
+        points = []
+        for moment, value in zip(self.timestamps, self.values):
+            if points:
+                points.append(QtCore.QPointF(x(moment), points[-1].y()))
+            if value == limits_history_index.REMOVED:
+                if points:
+                    painter.drawPolyline(QtGui.QPolygonF(points))
+                points = []
+            else:
+                points.append(QtCore.QPointF(x(moment), y(value)))
+        if points:
+            points.append(QtCore.QPointF(x(self.end), points[-1].y()))
+            painter.drawPolyline(QtGui.QPolygonF(points))
+
+
+class UiLimitHistoryMainWindow(QtWidgets.QMainWindow):
+    """
+    The main window class for browsing the history of every limit.
+
+    The history index is brought up to date with the new backups when the
+    window opens, after that every query is answered from the memory map.
+
+    Args:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+        backup_folder (str): Path to the backup folder.
+
+    Methods:
+        setup_ui(): Sets up the user interface components.
+        history_window_setup(): Sets up the history window.
+        groupbox_creation(): Creates the group box of the window.
+        combo_box_creation(): Creates the limit and range combo boxes.
+        audit_table_creation(): Creates the table listing the audit records.
+        refresh_history(): Draws the history of the selected limit.
+        refresh_audit(key, start): Lists the audit records of a limit.
+        button_creation(): Creates the 'back' button.
+        back_button_clicked(): Opens the main window of the UI again.
+    """
+
+    def __init__(self, config_file_path_name, temp_folder, backup_folder):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            config_file_path_name (str): Path to the main configuration file.
+            temp_folder (str): Path to the temporary folder.
+            backup_folder (str): Path to the backup folder.
+
+        Attributes:
+            contents_dict (dict): Contents of the live configuration file.
+            history_index (LimitsHistoryIndex): Memory mapped history index.
+
+        UI Components:
+            centralwidget (QWidget): Central widget for the main window.
+            history_groupbox (QGroupBox): Group box for the history.
+            limit_combo_box (QComboBox): Limit to draw.
+            range_combo_box (QComboBox): Time range to draw.
+            sparkline (LimitSparkline): Chart of the selected limit.
+            summary_label (QLabel): Changes, lowest and highest value drawn.
+            audit_table (QTableWidget): Audit records of the selected limit.
+
+        Calls:
+            setup_ui(): Sets up the user interface components.
+        """
+
+        super().__init__()
+
+        # All Folders
+        self.config_file_path_name = config_file_path_name
+        self.temp_folder = temp_folder
+        self.backup_folder = backup_folder
+
+        self.contents_dict = limits_config.read_config(config_file_path_name)
+
+        limits_history_index.update_index(backup_folder)
+        self.history_index = limits_history_index.LimitsHistoryIndex(
+            limits_history_index.index_file_path(backup_folder)
+        )
+
+        # Sections of the window
+        self.centralwidget = ""
+        self.history_groupbox = None
+        self.limit_combo_box = None
+        self.range_combo_box = None
+        self.sparkline = None
+        self.summary_label = None
+        self.audit_table = None
+
+        # Fonts
+        self.l_font = QtGui.QFont(
+            "Cantarell", 14, QtGui.QFont.Bold, QtGui.QFont.StyleItalic
+        )
+        self.l_font.setUnderline(True)
+        self.s_font = QtGui.QFont("Cantarell", 12)
+
+        self.setup_ui()
+
+    @traced("ui.limit_history_window", profile=True)
+    def setup_ui(self):
+        """Sets up the user interface for the Limit History.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.history_window_setup()
+        self.groupbox_creation()
+        self.combo_box_creation()
+        self.audit_table_creation()
+        self.button_creation()
+        self.refresh_history()
+
+    def history_window_setup(self):
+        """Sets up the history window, including the window's size, style,
+        and title, and centers it on the screen.
+
+        Parameters:
+            self (object): The object instance
+
+        Returns:
+            None
+        """
+
+        # Title of the Main Window can be changed here.
+        self.setWindowTitle("Limit History Window")
+        # Window Size can be adjusted here
+        self.setFixedSize(600, 560)
+        # Using this style sheet the theme can be changed
+        self.setStyleSheet(
+            """background-color: rgb(46, 52, 54);color: rgb(238, 238, 236);"""
+        )
+
+        self.centralwidget = QtWidgets.QWidget(self)
+        self.setCentralWidget(self.centralwidget)
+
+        def center_window(window):
+
+            frame = window.frameGeometry()
+            screen = QtGui.QGuiApplication.screenAt(QtGui.QCursor().pos())
+
+            if screen is None:
+                screen = QtGui.QGuiApplication.primaryScreen()
+
+            frame.moveCenter(screen.geometry().center())
+            window.move(frame.topLeft())
+
+        center_window(self)
+
+    def groupbox_creation(self):
+        """Creates the group box of the window together with the chart.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        # Title of the Group Box
+        self.history_groupbox = QtWidgets.QGroupBox("Limit History", self.centralwidget)
+        self.history_groupbox.setFont(self.l_font)
+        self.history_groupbox.setGeometry(10, 10, 580, 540)
+
+        def_label = QtWidgets.QLabel(
+            "Select a limit and a time range to see how its value changed "
+            "across the backups of the configuration:",
+            self.history_groupbox,
+        )
+        def_label.setGeometry(10, 35, 560, 41)
+        def_label.setFont(self.s_font)
+        def_label.setWordWrap(True)
+
+        self.sparkline = LimitSparkline(self.history_groupbox)
+        self.sparkline.setGeometry(10, 120, 560, 150)
+
+        self.summary_label = QtWidgets.QLabel(self.history_groupbox)
+        self.summary_label.setGeometry(10, 275, 560, 22)
+        self.summary_label.setFont(self.s_font)
+
+    def combo_box_creation(self):
+        """Creates the combo boxes to pick the limit and the time range.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.limit_combo_box = QtWidgets.QComboBox(self.history_groupbox)
+        self.limit_combo_box.setGeometry(10, 85, 331, 22)
+        self.limit_combo_box.setFont(self.s_font)
+        self.limit_combo_box.setStyleSheet("color : #A7F432")
+        for key in sorted(self.history_index.keys):
+            self.limit_combo_box.addItem(key.capitalize(), key)
+
+        self.range_combo_box = QtWidgets.QComboBox(self.history_groupbox)
+        self.range_combo_box.setGeometry(370, 85, 201, 22)
+        self.range_combo_box.setFont(self.s_font)
+        for name, days in HISTORY_RANGES:
+            self.range_combo_box.addItem(name, days)
+
+        self.limit_combo_box.currentIndexChanged.connect(self.refresh_history)
+        self.range_combo_box.currentIndexChanged.connect(self.refresh_history)
+
+    def audit_table_creation(self):
+        """Creates the table listing who changed the selected limit, when, and
+        whether the change went live.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        audit_label = QtWidgets.QLabel("Changes Made", self.history_groupbox)
+        audit_label.setGeometry(10, 305, 560, 22)
+        audit_label.setFont(self.s_font)
+
+        self.audit_table = QtWidgets.QTableWidget(0, 4, self.history_groupbox)
+        self.audit_table.setGeometry(10, 330, 560, 165)
+        self.audit_table.setFont(self.s_font)
+        self.audit_table.setHorizontalHeaderLabels(
+            ["Time", "User", "Change", "Outcome"]
+        )
+        self.audit_table.verticalHeader().setVisible(False)
+        self.audit_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.audit_table.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        header = self.audit_table.horizontalHeader()
+        for column, width in enumerate((150, 150, 110)):
+            header.resizeSection(column, width)
+        header.setStretchLastSection(True)
+
+    def refresh_history(self):
+        """Queries the index for the selected limit and range and draws it.
+        The live value of the limit closes the chart.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        key = self.limit_combo_box.currentData()
+        if key is None:
+            self.summary_label.setText("No backups have been indexed yet.")
+            self.audit_table.setRowCount(0)
+            return
+
+        end = int(time.time())
+        days = self.range_combo_box.currentData()
+        timestamps, values = self.history_index.query(
+            key, None if days is None else end - days * 86400, end
+        )
+        timestamps, values = list(timestamps), list(values)
+
+        live_value = limits_config.get_limit_value(self.contents_dict, key)
+        if isinstance(live_value, int) and (not values or values[-1] != live_value):
+            timestamps.append(end)
+            values.append(live_value)
+
+        if days is not None:
+            start = end - days * 86400
+        else:
+            start = timestamps[0] if timestamps else end
+
+        self.sparkline.set_points(timestamps, values, start, end)
+
+        present = [value for value in values if value != limits_history_index.REMOVED]
+        if present:
+            since = datetime.datetime.fromtimestamp(start)
+            now = values[-1]
+            if now == limits_history_index.REMOVED:
+                now = "removed"
+            self.summary_label.setText(
+                f"Since {since:%Y-%m-%d}: {len(values) - 1} changes, "
+                f"lowest {min(present)}, highest {max(present)}, "
+                f"now {now}"
+            )
+        else:
+            self.summary_label.setText("No history for this limit.")
+
+        self.refresh_audit(key, None if days is None else start)
+
+    def refresh_audit(self, key, start):
+        """Lists the audit records of a limit within a time range, newest
+        first.
+
+        Parameters:
+            self (object): The object instance.
+            key (str): Limit key.
+            start (int): Oldest time to list, everything if None.
+
+        Returns:
+            None
+        """
+
+        records = limits_audit.query_audit(
+            limits_audit.audit_file_path(self.config_file_path_name),
+            [key],
+            start,
+        )
+
+        self.audit_table.setRowCount(len(records))
+        for row, record in enumerate(reversed(records)):
+            moment = datetime.datetime.fromtimestamp(record["time"])
+            if record["verified"]:
+                outcome = f"Live ({record['reloads']} reloads)"
+            else:
+                outcome = f"Not live, engine had {record['live']}"
+
+            cells = (
+                f"{moment:%Y-%m-%d %H:%M}",
+                f"{record['user']}@{record['host']}",
+                f"{record['old']} -> {record['new']}",
+                outcome,
+            )
+            for column, text in enumerate(cells):
+                self.audit_table.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+
+    def button_creation(self):
+        """Creates the 'back' button within the history group box.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        # Name can be changed here
+        back_push_button = QtWidgets.QPushButton("Back", self.history_groupbox)
+        back_push_button.setGeometry(480, 505, 91, 22)
+        back_push_button.setFont(self.s_font)
+
+        back_push_button.clicked.connect(self.back_button_clicked)
+        back_push_button.clicked.connect(self.close)
+
+    def back_button_clicked(self):
+        """Calls upon the main window of the UI and releases the index.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from main_limits_selection_window import UiLimitsMainWindow
+
+        self.history_index.close()
+
+        farm_selection_windows = UiLimitsMainWindow()
+        farm_selection_windows.show()
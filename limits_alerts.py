@@ -0,0 +1,551 @@
+#!/usr/bin/python3
+
+"""
+Saturation and starvation alerts over the limits reported by the Tractor
+engine. Follows the ring buffer written by limits_sampler and evaluates every
+rule incrementally over a sliding window per limit key, so a license pinned at
+'SiteMax' for an hour, or tasks waiting for a tag nobody is using, are
+reported as they happen instead of when artists complain.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Rules are read from a 'limits_alerts.config' file next to the '.config' file,
+DEFAULT_RULES when there is none:
+
+    {
+        "Rules": [
+            {"name": "saturated", "keys": ["katana", "*_katana"],
+             "condition": "saturated", "threshold": 0.95, "minutes": 15},
+            {"name": "starved", "keys": ["*"], "condition": "starved",
+             "minutes": 10, "fraction": 0.9}
+        ],
+        "Hook": "/sw/tractor/bin/limits_alert_hook"
+    }
+
+    - saturated: in use at or above 'threshold' times 'SiteMax'
+    - starved: nothing in use while tasks are waiting for the tag
+
+A rule fires once its condition held for at least 'fraction' (all by default)
+of the samples of the last 'minutes', and is resolved once it doesn't. Every
+change is appended to 'limits_alerts.log' next to the '.config' file as JSON
+lines and, when there is a hook, the hook is run with the alert as JSON on its
+standard input and as LIMITS_ALERT_* environment variables. Every alert holds
+the command opening the window of its limit (LIMITS_ALERT_OPEN).
+
+Usage:
+    limits_alerts.py [--farm NAME] run
+    limits_alerts.py [--farm NAME] check
+"""
+
+import argparse
+import json
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from collections import OrderedDict, deque
+from fnmatch import fnmatchcase
+
+import limits_farms
+import limits_sampler
+import limits_tracing
+import limits_usage
+from limits_tracing import LOGGER
+
+ALERTS_FILE_NAME = "limits_alerts.config"
+ALERTS_LOG_NAME = "limits_alerts.log"
+HOOK_TIMEOUT = 30
+
+DEFAULT_RULES = [
+    {"name": "saturated", "keys": ["*"], "condition": "saturated", "minutes": 15},
+    {"name": "starved", "keys": ["*"], "condition": "starved", "minutes": 10},
+]
+DEFAULT_THRESHOLD = 0.95
+
+WINDOW_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "main_limits_selection_window.py"
+)
+
+
+def _saturated(in_use, site_max, waiting, threshold):
+    """Whether the slots in use are at the threshold of 'SiteMax'."""
+
+    return site_max > 0 and in_use >= threshold * site_max
+
+
+def _starved(in_use, site_max, waiting, threshold):
+    """Whether tasks are waiting for a tag nobody is using."""
+
+    return in_use == 0 and waiting > 0
+
+
+CONDITIONS = {"saturated": _saturated, "starved": _starved}
+
+
+def alerts_file_path(config_file_path_name):
+    """Returns the path of the rules file of a configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the rules file.
+    """
+
+    return os.path.join(
+        os.path.dirname(os.path.abspath(config_file_path_name)), ALERTS_FILE_NAME
+    )
+
+
+def alerts_log_path(config_file_path_name):
+    """Returns the path of the alerts log of a configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the alerts log.
+    """
+
+    return os.path.join(
+        os.path.dirname(os.path.abspath(config_file_path_name)), ALERTS_LOG_NAME
+    )
+
+
+class AlertRule:
+    """A condition that must hold over a window of time to fire an alert.
+
+    Args:
+        name (str): Name of the rule.
+        keys (list): Patterns of the limit keys it applies to.
+        condition (str): One of CONDITIONS.
+        threshold (float): Fraction of 'SiteMax' used by 'saturated'.
+        minutes (float): Length of the window.
+        fraction (float): Share of the samples of the window that must match.
+    """
+
+    __slots__ = ("name", "keys", "condition", "threshold", "seconds", "fraction")
+
+    def __init__(
+        self,
+        name,
+        keys,
+        condition,
+        threshold=DEFAULT_THRESHOLD,
+        minutes=15,
+        fraction=1.0,
+    ):
+        """Checks and stores the settings of the rule."""
+
+        if condition not in CONDITIONS:
+            raise ValueError(f"Unknown condition of the rule {name}: {condition}")
+
+        self.name = name
+        self.keys = list(keys)
+        self.condition = CONDITIONS[condition]
+        self.threshold = threshold
+        self.seconds = minutes * 60
+        self.fraction = fraction
+
+    def __repr__(self):
+        return f"AlertRule({self.name!r}, keys={self.keys!r})"
+
+    def matches(self, key):
+        """Returns whether the rule applies to a limit key.
+
+        Parameters:
+            key (str): Limit key.
+
+        Returns:
+            bool: Whether any of the patterns matches.
+        """
+
+        return any(fnmatchcase(key, pattern) for pattern in self.keys)
+
+
+def load_rules(config_file_path_name):
+    """Reads the rules and the hook of a configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        tuple: (rules, hook) with the AlertRule list and the hook command,
+        None if there is none.
+    """
+
+    alerts_path = alerts_file_path(config_file_path_name)
+    alerts_dict = {"Rules": DEFAULT_RULES}
+
+    if os.path.exists(alerts_path):
+        with open(alerts_path, "r") as i:
+            alerts_dict = json.load(i, object_pairs_hook=OrderedDict)
+
+    rules = [AlertRule(**settings) for settings in alerts_dict.get("Rules", [])]
+
+    return rules, alerts_dict.get("Hook")
+
+
+class SlidingWindow:
+    """Samples of one rule and one key within the last seconds of the rule.
+    Adding a sample drops the ones that left the window and keeps the amount
+    of matching samples up to date, so every sample costs the same however
+    long the window is.
+
+    Args:
+        seconds (float): Length of the window.
+        max_gap (float): Seconds without samples after which the window
+        starts again, since nothing is known about that time.
+    """
+
+    __slots__ = ("seconds", "max_gap", "samples", "hits", "start")
+
+    def __init__(self, seconds, max_gap=limits_usage.MAX_SAMPLE_GAP):
+        """Initializes an empty window."""
+
+        self.seconds = seconds
+        self.max_gap = max_gap
+        self.samples = deque()
+        self.hits = 0
+        self.start = None
+
+    def add(self, moment, hit):
+        """Adds a sample.
+
+        Parameters:
+            moment (int): Time of the sample.
+            hit (bool): Whether the condition held.
+
+        Returns:
+            None
+        """
+
+        if self.samples and moment - self.samples[-1][0] > self.max_gap:
+            self.samples.clear()
+            self.hits = 0
+            self.start = None
+
+        if self.start is None:
+            self.start = moment
+
+        self.samples.append((moment, hit))
+        self.hits += hit
+
+        while self.samples[0][0] <= moment - self.seconds:
+            self.hits -= self.samples.popleft()[1]
+
+    def active(self, fraction):
+        """Returns whether the condition held long enough.
+
+        Parameters:
+            fraction (float): Share of the samples that must match.
+
+        Returns:
+            bool: Whether the window is covered and enough samples matched.
+        """
+
+        return (
+            bool(self.samples)
+            and self.samples[-1][0] - self.start >= self.seconds
+            and self.hits >= fraction * len(self.samples)
+        )
+
+
+class Alert:
+    """A rule that started or stopped firing for a limit key.
+
+    Attributes:
+        rule (str): Name of the rule.
+        key (str): Limit key.
+        state (str): 'firing' or 'resolved'.
+        moment (int): Time of the sample that changed the state.
+        in_use (int): Slots in use then.
+        site_max (int): 'SiteMax' then.
+        waiting (int): Tasks waiting then, -1 if unknown.
+        farm (str): Name of the farm.
+    """
+
+    __slots__ = (
+        "rule",
+        "key",
+        "state",
+        "moment",
+        "in_use",
+        "site_max",
+        "waiting",
+        "farm",
+    )
+
+    def __init__(self, rule, key, state, moment, usage, farm):
+        self.rule = rule
+        self.key = key
+        self.state = state
+        self.moment = moment
+        self.in_use, self.site_max, self.waiting = usage
+        self.farm = farm
+
+    def __str__(self):
+        return (
+            f"{self.rule} {self.state} for {self.key} on {self.farm}: "
+            f"{self.in_use}/{self.site_max} in use, {self.waiting} waiting"
+        )
+
+    def open_command(self):
+        """Returns the command opening the window of the limit.
+
+        Returns:
+            str: Shell command.
+        """
+
+        return shlex.join(
+            [sys.executable, WINDOW_SCRIPT, "--farm", self.farm, "--open-key", self.key]
+        )
+
+    def to_dict(self):
+        """Returns the alert as it is logged and given to the hook.
+
+        Returns:
+            OrderedDict: Every attribute and the 'open' command.
+        """
+
+        alert_dict = OrderedDict(
+            (attribute, getattr(self, attribute)) for attribute in self.__slots__
+        )
+        alert_dict["open"] = self.open_command()
+
+        return alert_dict
+
+
+class AlertEvaluator:
+    """Evaluates every rule over the samples of a farm, one sample at a time.
+
+    Args:
+        rules (list): AlertRule list.
+        farm (str): Name of the farm, for the alerts.
+
+    Attributes:
+        firing (OrderedDict): Last Alert per (rule, key) currently firing.
+
+    Methods:
+        feed(moment, usage): Evaluates one sample, returns the alerts.
+    """
+
+    def __init__(self, rules, farm):
+        """Initializes the evaluator without any window yet."""
+
+        self.rules = rules
+        self.farm = farm
+        self.rules_by_key = {}
+        self.windows = {}
+        self.firing = OrderedDict()
+
+    def feed(self, moment, usage):
+        """Adds one sample to the window of every rule and key it applies to.
+
+        Parameters:
+            moment (int): Time of the sample.
+            usage (dict): (in_use, site_max, waiting) per limit key.
+
+        Returns:
+            list: Alert per rule and key that started or stopped firing.
+        """
+
+        alerts = []
+
+        for key, values in usage.items():
+            rules = self.rules_by_key.get(key)
+            if rules is None:
+                rules = [rule for rule in self.rules if rule.matches(key)]
+                self.rules_by_key[key] = rules
+
+            for rule in rules:
+                window = self.windows.get((rule.name, key))
+                if window is None:
+                    window = SlidingWindow(rule.seconds)
+                    self.windows[(rule.name, key)] = window
+
+                window.add(moment, rule.condition(*values, rule.threshold))
+                active = window.active(rule.fraction)
+
+                if active != ((rule.name, key) in self.firing):
+                    alert = Alert(
+                        rule.name,
+                        key,
+                        "firing" if active else "resolved",
+                        moment,
+                        values,
+                        self.farm,
+                    )
+                    if active:
+                        self.firing[(rule.name, key)] = alert
+                    else:
+                        del self.firing[(rule.name, key)]
+                    alerts.append(alert)
+
+        return alerts
+
+
+def notify(alert, log_path, hook=None):
+    """Logs an alert and runs the hook with it.
+
+    Parameters:
+        alert (Alert): The alert.
+        log_path (str): Path to the alerts log.
+        hook (str): Command run for every alert, None for none.
+
+    Returns:
+        None
+    """
+
+    alert_dict = alert.to_dict()
+    line = json.dumps(alert_dict)
+
+    if alert.state == "firing":
+        LOGGER.warning("%s, open it with: %s", alert, alert_dict["open"])
+    else:
+        LOGGER.info("%s", alert)
+
+    try:
+        with open(log_path, "a") as log_file:
+            log_file.write(line + "\n")
+    except OSError as error:
+        LOGGER.error("Could not write %s: %s", log_path, error)
+
+    if not hook:
+        return
+
+    environment = dict(os.environ)
+    for attribute, value in alert_dict.items():
+        environment[f"LIMITS_ALERT_{attribute.upper()}"] = str(value)
+
+    try:
+        subprocess.run(
+            shlex.split(hook),
+            input=line,
+            text=True,
+            env=environment,
+            timeout=HOOK_TIMEOUT,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError) as error:
+        LOGGER.error("The alert hook failed: %s", error)
+
+
+def _open_ring(ring_path):
+    """Opens the ring, waiting for the sampler to create it."""
+
+    while True:
+        try:
+            return limits_sampler.UsageRing(ring_path)
+        except (OSError, ValueError):
+            LOGGER.info("Waiting for the sampler to create %s", ring_path)
+            time.sleep(limits_sampler.DEFAULT_INTERVAL)
+
+
+def run(farm, rules, hook=None):
+    """Evaluates the rules over the samples of a farm until interrupted.
+
+    The samples already in the ring are evaluated first without notifying
+    anything, then only the alerts still firing are notified, so a restart
+    doesn't report again what was already resolved.
+
+    Parameters:
+        farm (LimitFarm): Farm to watch.
+        rules (list): AlertRule list.
+        hook (str): Command run for every alert, None for none.
+
+    Returns:
+        None
+    """
+
+    ring_path = limits_sampler.ring_file_path(farm.config_file_path_name)
+    log_path = alerts_log_path(farm.config_file_path_name)
+    evaluator = AlertEvaluator(rules, farm.name)
+    ring = _open_ring(ring_path)
+    LOGGER.info("Evaluating %d alert rules over %s", len(rules), ring_path)
+
+    try:
+        after = 0
+        for after, moment, usage in ring.samples():
+            evaluator.feed(moment, usage)
+        for alert in list(evaluator.firing.values()):
+            notify(alert, log_path, hook)
+
+        while True:
+            time.sleep(ring.interval or limits_sampler.DEFAULT_INTERVAL)
+
+            # The sampler creates the ring again when its size changes
+            if os.stat(ring_path).st_ino != os.fstat(ring.ring_file.fileno()).st_ino:
+                ring.close()
+                ring = _open_ring(ring_path)
+                after = 0
+
+            for after, moment, usage in ring.samples(after):
+                for alert in evaluator.feed(moment, usage):
+                    notify(alert, log_path, hook)
+    finally:
+        ring.close()
+
+
+def main(argv=None):
+    """Parses the command line and evaluates the rules.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code, 'check' returns 1 when any alert is firing.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--farm", default=None, help="farm to use, the first one by default"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="evaluate the rules as samples arrive")
+    commands.add_parser("check", help="print the alerts firing now")
+    args = parser.parse_args(argv)
+
+    limits_tracing.configure()
+
+    farms = limits_farms.load_farms()
+    if args.farm is not None and args.farm not in farms:
+        LOGGER.error("Unknown farm: %s", args.farm)
+        return 1
+    farm = farms[args.farm] if args.farm else limits_farms.selected_farm(farms)
+
+    try:
+        rules, hook = load_rules(farm.config_file_path_name)
+    except (OSError, ValueError, TypeError) as error:
+        LOGGER.error("Could not read the alert rules: %s", error)
+        return 1
+
+    if args.command == "run":
+        # Stopped by the service manager the same way as with Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            run(farm, rules, hook)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    evaluator = AlertEvaluator(rules, farm.name)
+    with limits_sampler.UsageRing(
+        limits_sampler.ring_file_path(farm.config_file_path_name)
+    ) as ring:
+        for _, moment, usage in ring.samples():
+            evaluator.feed(moment, usage)
+
+    for alert in evaluator.firing.values():
+        print(f"{alert}\n    {alert.open_command()}")
+
+    return 1 if evaluator.firing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
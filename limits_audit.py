@@ -0,0 +1,386 @@
+#!/usr/bin/python3
+
+"""
+Audit log of every change written to the '.config' file by the Farm UI or the
+scheduler. Every changed key is appended as one JSON line to a
+'limits_audit.log' file next to the main '.config' file, together with who
+made it, from where, when, and whether Tractor picked it up.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+A 'limits_audit.idx' file keeps, for every key, the time and byte offset of
+each of its records. The index only ever reads the part of the log written
+since it was last updated and appends one line per new record to the index
+file, which is never rewritten. Every process keeps the index in memory and
+only reads the lines appended to the file since, and queries bisect it by
+time and then seek straight to the matching lines instead of scanning the
+whole log.
+
+Example of a line of the index, [time, offset, end offset, key]:
+
+    [1718000000.0, 5120, 5342, "katana"]
+
+Example of a record:
+
+    {"time": 1718000000.0, "commit": "1718000000-4242", "user": "gaguero",
+     "host": "ws042", "source": "ui", "key": "katana", "old": 100, "new": 120,
+     "reloads": 1, "verified": true, "live": 120}
+
+Usage:
+    limits_audit.py [--config PATH] [--key PATTERN ...] [--show SHOW]
+                    [--hours N] [--json]
+"""
+
+import argparse
+import datetime
+import fcntl
+import getpass
+import json
+import os
+import socket
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from fnmatch import fnmatchcase
+
+import limits_config
+
+CONFIG_FILE_PATH_NAME = "/sw/tractor/config/limits.config"
+AUDIT_FILE_NAME = "limits_audit.log"
+AUDIT_INDEX_FILE_NAME = "limits_audit.idx"
+
+# Index already read per index file, see _read_index()
+_indexes = {}
+
+
+def audit_file_path(config_file_path_name):
+    """Returns the path of the audit log that lives next to the main
+    configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the audit log.
+    """
+
+    return os.path.join(os.path.dirname(config_file_path_name), AUDIT_FILE_NAME)
+
+
+def index_file_path(audit_path):
+    """Returns the path of the index of an audit log.
+
+    Parameters:
+        audit_path (str): Path to the audit log.
+
+    Returns:
+        str: Path to the index file.
+    """
+
+    return os.path.join(os.path.dirname(audit_path), AUDIT_INDEX_FILE_NAME)
+
+
+def record_commit(audit_path, changes, reloads, mismatches, source="ui", moment=None):
+    """Appends one record per changed key to the audit log.
+
+    The whole commit is written with a single call while holding an exclusive
+    lock, so commits made at the same time from different machines never mix.
+
+    Parameters:
+        audit_path (str): Path to the audit log.
+        changes (dict): (old, new) per limit key.
+        reloads (int): Extra reloads needed while verifying.
+        mismatches (dict): (live, expected) per key still not live.
+        source (str): What made the change, e.g. 'ui' or 'profile:night'.
+        moment (float): Time of the commit, defaults to now.
+
+    Returns:
+        list: The records appended.
+    """
+
+    moment = time.time() if moment is None else moment
+    commit_id = f"{int(moment)}-{os.getpid()}"
+    user = getpass.getuser()
+    host = socket.gethostname()
+
+    records = []
+    for key, (old_value, new_value) in changes.items():
+        live_value = mismatches[key][0] if key in mismatches else new_value
+        records.append(
+            {
+                "time": moment,
+                "commit": commit_id,
+                "user": user,
+                "host": host,
+                "source": source,
+                "key": key,
+                "old": old_value,
+                "new": new_value,
+                "reloads": reloads,
+                "verified": key not in mismatches,
+                "live": live_value,
+            }
+        )
+
+    if not records:
+        return records
+
+    lines = "".join(json.dumps(record) + "\n" for record in records)
+    with open(audit_path, "a") as audit_file:
+        fcntl.flock(audit_file, fcntl.LOCK_EX)
+        try:
+            audit_file.write(lines)
+        finally:
+            fcntl.flock(audit_file, fcntl.LOCK_UN)
+
+    return records
+
+
+def _new_index(inode):
+    """Returns an empty index of an index file."""
+
+    return {"inode": inode, "position": 0, "size": 0, "keys": {}}
+
+
+def _add_entry(index, moment, offset, key):
+    """Adds the time and offset of a record to the entries of its key, kept
+    sorted by time."""
+
+    entries = index["keys"].setdefault(key, [])
+    entry = [moment, offset]
+    if entries and entries[-1][0] > moment:
+        entries.insert(bisect_right(entries, entry), entry)
+    else:
+        entries.append(entry)
+
+
+def _read_index(index_path, index_file):
+    """Returns the index of an index file, only reading the lines appended
+    since this process last read it. Must be called holding the lock.
+
+    Parameters:
+        index_path (str): Path to the index file.
+        index_file (file): The index file, opened in binary append mode.
+
+    Returns:
+        dict: The index, see update_audit_index().
+    """
+
+    status = os.fstat(index_file.fileno())
+    index = _indexes.get(index_path)
+    if (
+        index is None
+        or index["inode"] != status.st_ino
+        or status.st_size < index["position"]
+    ):
+        index = _indexes[index_path] = _new_index(status.st_ino)
+
+    index_file.seek(index["position"])
+    data = index_file.read()
+    complete = data.rfind(b"\n") + 1
+
+    try:
+        for line in data[:complete].splitlines():
+            moment, offset, end, key = json.loads(line)
+            _add_entry(index, moment, offset, key)
+            index["size"] = end
+    except (ValueError, TypeError):
+        # An index in an older format, it is built again from the log
+        index_file.truncate(0)
+        index = _indexes[index_path] = _new_index(status.st_ino)
+        return index
+
+    index["position"] += complete
+    if complete < len(data):
+        # Left by an update that didn't finish, nobody else is writing
+        index_file.truncate(index["position"])
+
+    return index
+
+
+def update_audit_index(audit_path):
+    """Brings the index up to date with the records appended since the last
+    update, reading only that part of the log and appending the new entries
+    to the index file while holding an exclusive lock on it.
+
+    Parameters:
+        audit_path (str): Path to the audit log.
+
+    Returns:
+        dict: The index, holding the 'size' of the log already indexed and the
+        'keys' with [time, offset] pairs sorted by time for every key.
+    """
+
+    index_path = index_file_path(audit_path)
+
+    if not os.path.exists(audit_path):
+        return _new_index(None)
+
+    with open(index_path, "a+b") as index_file:
+        fcntl.flock(index_file, fcntl.LOCK_EX)
+        index = _read_index(index_path, index_file)
+        log_size = os.path.getsize(audit_path)
+
+        if log_size < index["size"]:
+            # The log was truncated or replaced, start over
+            index_file.truncate(0)
+            index = _indexes[index_path] = _new_index(index["inode"])
+
+        if log_size == index["size"]:
+            return index
+
+        entries = []
+        with open(audit_path, "rb") as audit_file:
+            audit_file.seek(index["size"])
+            offset = index["size"]
+
+            for line in audit_file:
+                # A line still being written is left for the next update
+                if not line.endswith(b"\n"):
+                    break
+
+                record = json.loads(line)
+                end = offset + len(line)
+                entries.append([record["time"], offset, end, record["key"]])
+                offset = end
+
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        index_file.write(data)
+        index_file.flush()
+
+        for moment, offset, end, key in entries:
+            _add_entry(index, moment, offset, key)
+            index["size"] = end
+        index["position"] += len(data)
+
+    return index
+
+
+def show_patterns(show):
+    """Returns the key patterns of every limit belonging to a show.
+
+    Parameters:
+        show (str): Name of the show.
+
+    Returns:
+        list: Shell-style patterns matching the keys of the show.
+    """
+
+    show = show.lower()
+    shares = limits_config.PATH_SEPARATOR.join(("linuxfarm", "Shares", show))
+
+    return [
+        show,
+        f"{show}_*",
+        f"*_{show}",
+        shares,
+        f"{shares}{limits_config.PATH_SEPARATOR}*",
+    ]
+
+
+def query_audit(audit_path, patterns=None, since=None, until=None):
+    """Returns the records of the keys matching some patterns within a time
+    range, oldest first, reading only the matching lines of the log.
+
+    Parameters:
+        audit_path (str): Path to the audit log.
+        patterns (list): Shell-style patterns of the keys, every key if None.
+        since (float): Oldest time to return, since the epoch.
+        until (float): Newest time to return, since the epoch.
+
+    Returns:
+        list: Matching records.
+    """
+
+    index = update_audit_index(audit_path)
+
+    low = [float("-inf") if since is None else since]
+    high = [float("inf") if until is None else until, float("inf")]
+
+    matches = []
+    for key, entries in index["keys"].items():
+        if patterns is not None and not any(
+            fnmatchcase(key, pattern) for pattern in patterns
+        ):
+            continue
+        first = bisect_left(entries, low)
+        last = bisect_right(entries, high)
+        matches.extend(entries[first:last])
+
+    matches.sort()
+    if not matches:
+        return []
+
+    records = []
+    with open(audit_path, "rb") as audit_file:
+        for _, offset in matches:
+            audit_file.seek(offset)
+            records.append(json.loads(audit_file.readline()))
+
+    return records
+
+
+def print_records(records):
+    """Prints records as a table.
+
+    Parameters:
+        records (list): Records to print.
+
+    Returns:
+        None
+    """
+
+    for record in records:
+        moment = datetime.datetime.fromtimestamp(record["time"])
+        outcome = "ok" if record["verified"] else f"NOT LIVE ({record['live']})"
+        print(
+            f"{moment:%Y-%m-%d %H:%M:%S}  {record['user']}@{record['host']}  "
+            f"{record['key']}: {record['old']} -> {record['new']}  "
+            f"reloads {record['reloads']}  {outcome}  [{record['source']}]"
+        )
+
+
+def main(argv=None):
+    """Parses the command line and prints the matching records.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--config", default=CONFIG_FILE_PATH_NAME)
+    parser.add_argument("--key", action="append", help="key pattern, repeatable")
+    parser.add_argument("--show", help="every key of a show")
+    parser.add_argument("--hours", type=float, help="only the last N hours")
+    parser.add_argument("--json", action="store_true", help="print JSON lines")
+    args = parser.parse_args(argv)
+
+    patterns = None
+    if args.key or args.show:
+        patterns = list(args.key or [])
+        if args.show:
+            patterns += show_patterns(args.show)
+
+    since = None
+    if args.hours is not None:
+        since = time.time() - args.hours * 3600
+
+    records = query_audit(audit_file_path(args.config), patterns, since)
+
+    if args.json:
+        for record in records:
+            print(json.dumps(record))
+    else:
+        print_records(records)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
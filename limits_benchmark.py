@@ -0,0 +1,569 @@
+#!/usr/bin/python3
+
+"""
+Benchmark suite of the Farm UI. Runs headless with the Qt offscreen platform
+against a synthetic '.config' file and a stub Tractor engine, times every
+phase of the tool and stores the results as JSON so they can be compared
+across commits.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Usage:
+    limits_benchmark.py [--shows N] [--tags M] [--applications K]
+                        [--repeat R] [--output FILE] [--compare OLD_FILE]
+                        [--import-budget MS]
+
+The import of the first window is measured with 'python -X importtime' in
+several interpreters and fails the run when the median takes longer than the
+budget, or when it imports any of the modules that are only meant to be loaded
+once they are used. tests/test_startup.py runs the same checks with pytest.
+
+Example, comparing the current tree against the results of another commit:
+
+    limits_benchmark.py --output new.json --compare old.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from array import array
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import limits_bulk
+import limits_config
+import limits_merge
+import limits_show_search
+import limits_table
+import limits_usage
+import synthetic_config
+
+# Slower than this compared to the old results is flagged as a regression
+REGRESSION_THRESHOLD = 1.2
+
+# Hours of usage history the recommendations are computed from
+USAGE_HOURS = 90 * 24
+
+# Module of the first window, and the milliseconds the median of its import
+# over IMPORT_RUNS interpreters at least may take
+STARTUP_MODULE = "main_limits_selection_window"
+IMPORT_BUDGET_MS = 100
+IMPORT_RUNS = 5
+# Loaded on first use only, the first window must not import them
+DEFERRED_MODULES = (
+    "application_limits_window",
+    "changes_applied_window",
+    "bulk_operations_window",
+    "changes_confirmation_window",
+    "concurrent.futures",
+    "cProfile",
+    "limits_bulk",
+    "limits_daemon",
+    "limits_show_search",
+    "limits_store",
+    "limits_table",
+    "limits_usage",
+    "shares_editor_window",
+    "show_limits_window",
+    "show_selection_window",
+    "sqlite3",
+    "subprocess",
+    "tracemalloc",
+    "urllib.request",
+)
+
+
+class StubEngine:
+    """Stub of the Tractor engine serving the live limits from the '.config'
+    file itself, so every change is live as soon as it is written.
+
+    Args:
+        config_file_path_name (str): Path to the configuration file served.
+
+    Attributes:
+        url (str): Address to use as limits_config.ENGINE_LIMITS_URL.
+    """
+
+    def __init__(self, config_file_path_name):
+        """Starts serving on a free local port in a background thread."""
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with open(config_file_path_name, "rb") as i:
+                    data = i.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops serving.
+
+        Returns:
+            None
+        """
+
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def write_synthetic_usage(usage_path, keys, hours=USAGE_HOURS, seed=0):
+    """Writes a usage file with one record per hour for every key, as if the
+    engine had been sampled every minute.
+
+    Parameters:
+        usage_path (str): Path to the usage file.
+        keys (list): Keys of the limits.
+        hours (int): Hours of history, ending now.
+        seed (int): Seed of the random usage.
+
+    Returns:
+        None
+    """
+
+    generator = random.Random(seed)
+    now = int(time.time())
+    first_hour = now - now % limits_usage.BUCKET_SECONDS - hours * 3600
+    records = array("q")
+
+    for hour in range(hours):
+        start = first_hour + hour * 3600
+        records.extend((start, start + 3540))
+        for _ in keys:
+            peak = generator.randrange(100)
+            records.extend((60, peak, peak * 40, int(peak > 95), 600000))
+
+    limits_usage.write_usage(usage_path, list(keys), records)
+
+
+def time_function(function, repeat):
+    """Runs a function several times and measures every run.
+
+    Parameters:
+        function (callable): Function to run, without arguments.
+        repeat (int): Amount of runs.
+
+    Returns:
+        dict: Fastest, median and mean run in milliseconds, and the runs.
+    """
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "min_ms": min(runs),
+        "median_ms": statistics.median(runs),
+        "mean_ms": statistics.mean(runs),
+        "runs": repeat,
+    }
+
+
+def git_revision():
+    """Returns the commit of the tree being benchmarked.
+
+    Returns:
+        str: Hash of HEAD, or None outside of a git repository.
+    """
+
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(shows, tags_per_show, applications, repeat):
+    """Creates a synthetic farm and times every phase of the tool on it.
+
+    Parameters:
+        shows (int): Shows in the 'linuxfarm' Shares.
+        tags_per_show (int): Tags of every show.
+        applications (int): Application tags.
+        repeat (int): Runs of every benchmark.
+
+    Returns:
+        dict: Timings per benchmark.
+    """
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from qtpy import QtWidgets
+
+    from application_limits_window import UiApplicationLimitsMainWindow
+    from bulk_operations_window import UiBulkOperationsMainWindow
+    from shares_editor_window import UiSharesEditorMainWindow
+    from show_limits_window import UiShowLimitsMainWindow
+    from show_selection_window import UiShowSelectionLimitsMainWindow
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as farm_folder:
+        config_file_path_name = os.path.join(farm_folder, "limits.config")
+        temp_folder = os.path.join(farm_folder, "tmp", "")
+        backup_folder = os.path.join(farm_folder, "limits_backup", "")
+        os.makedirs(temp_folder)
+        os.makedirs(backup_folder)
+        os.environ["LIMITS_METRICS_FILE"] = os.path.join(farm_folder, "bench.prom")
+
+        contents_dict = synthetic_config.generate_config(
+            shows, tags_per_show, applications
+        )
+        limits_config.write_config(contents_dict, config_file_path_name)
+        shows_list = list(contents_dict["Limits"]["linuxfarm"]["Shares"])[:-1]
+        show = shows_list[-1].upper()
+
+        engine = StubEngine(config_file_path_name)
+        limits_config.ENGINE_LIMITS_URL = engine.url
+        limits_config.RELOAD_COMMAND = "true"
+        limits_config.POLL_DELAY = 0
+
+        folders = (config_file_path_name, temp_folder, backup_folder)
+
+        def build_window(window_class, *args):
+            def build():
+                window = window_class(*args)
+                window.close()
+                window.deleteLater()
+                app.processEvents()
+
+            return build
+
+        table = limits_table.LimitsTable.from_file(config_file_path_name)
+
+        def classify_applications():
+            window = types.SimpleNamespace(limits_table=table, applications=[])
+            UiApplicationLimitsMainWindow.create_applications_list(window)
+
+        def classify_show_limits():
+            for show_name in shows_list:
+                window = types.SimpleNamespace(
+                    limits_table=table,
+                    show_name=show_name,
+                    show_limit_sections=[],
+                )
+                UiShowLimitsMainWindow.create_show_limit_sections(window)
+
+        # A session changing every application while someone else changed
+        # every tag of the last show, with one key changed by both
+        ours = limits_table.LimitsTable(table.text)
+        theirs = limits_table.LimitsTable(table.text)
+        for key in table.application_keys():
+            ours.set_value(key, table.value(key) + 1)
+        for key in table.show_keys(show):
+            theirs.set_value(key, table.value(key) + 2)
+        ours.set_value(key, table.value(key) + 1)
+        their_values = theirs.values[:]
+
+        def merge_config():
+            theirs.values[:] = their_values
+            limits_merge.merge_config(table, ours, theirs)
+
+        commit_key = synthetic_config.COMMON_APPLICATIONS[0]
+
+        write_synthetic_usage(
+            limits_usage.usage_file_path(config_file_path_name),
+            list(table.limit_values()),
+        )
+
+        def search_shows():
+            index = limits_show_search.ShowIndex(table.shows)
+            for show_name in shows_list:
+                index.search(show_name[:3])
+                index.key_for(show_name.upper())
+
+        # Every tag of every show but the first one scaled by 0.8
+        def scale_show_tags():
+            positions = limits_bulk.select_positions(
+                table, tags=["*"], exclude=shows_list[:1]
+            )
+            limits_bulk.compute_changes(table, positions, "scale", 0.8)
+
+        def recommend_limits():
+            limits_usage.recommend_for_config(config_file_path_name)
+
+        def commit():
+            value = limits_config.get_limit_value(contents_dict, commit_key) % 500 + 1
+            changed = limits_config.apply_values(contents_dict, {commit_key: value})
+            limits_config.commit_config(
+                contents_dict, changed, config_file_path_name, backup_folder
+            )
+
+        benchmarks = (
+            ("parse_config", lambda: limits_config.read_config(config_file_path_name)),
+            (
+                "load_limits_table",
+                lambda: limits_table.LimitsTable.from_file(config_file_path_name),
+            ),
+            ("create_applications_list", classify_applications),
+            ("create_show_limit_sections_all_shows", classify_show_limits),
+            (
+                "window_show_selection",
+                build_window(UiShowSelectionLimitsMainWindow, *folders),
+            ),
+            (
+                "window_show_limits",
+                build_window(UiShowLimitsMainWindow, show, *folders),
+            ),
+            (
+                "window_application_limits",
+                build_window(UiApplicationLimitsMainWindow, *folders),
+            ),
+            ("window_shares_editor", build_window(UiSharesEditorMainWindow, *folders)),
+            (
+                "window_bulk_operations",
+                build_window(UiBulkOperationsMainWindow, *folders),
+            ),
+            (
+                "stage_config",
+                lambda: limits_config.stage_config(contents_dict, temp_folder),
+            ),
+            ("merge_config", merge_config),
+            ("show_search_all_shows", search_shows),
+            ("bulk_scale_all_shows", scale_show_tags),
+            ("usage_recommend", recommend_limits),
+            ("commit_config", commit),
+        )
+
+        results = {}
+        try:
+            for name, function in benchmarks:
+                results[name] = time_function(function, repeat)
+                limits_config.discard_staged(temp_folder)
+        finally:
+            engine.stop()
+
+    return results
+
+
+def measure_memory(shows, tags_per_show, applications):
+    """Measures the memory used by the contents of a synthetic configuration
+    file when read as a dictionary and as a limits table.
+
+    Parameters:
+        shows (int): Shows in the 'linuxfarm' Shares.
+        tags_per_show (int): Tags of every show.
+        applications (int): Application tags.
+
+    Returns:
+        dict: Kilobytes used by each, the text kept by the table included.
+    """
+
+    text = json.dumps(
+        synthetic_config.generate_config(shows, tags_per_show, applications),
+        indent=4,
+    )
+    memory = {}
+
+    for name, load in (
+        ("config_dict_kb", lambda: json.loads(text, object_pairs_hook=OrderedDict)),
+        ("limits_table_kb", lambda: limits_table.LimitsTable(text)),
+    ):
+        tracemalloc.start()
+        loaded = load()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del loaded
+        if name == "limits_table_kb":
+            used += sys.getsizeof(text)
+        memory[name] = round(used / 1024, 1)
+
+    return memory
+
+
+def measure_import_time(module=STARTUP_MODULE, repeat=IMPORT_RUNS):
+    """Measures the import of a module in new interpreters with
+    'python -X importtime'.
+
+    Parameters:
+        module (str): Module to import.
+        repeat (int): Interpreters started, the median is kept.
+
+    Returns:
+        dict: Median milliseconds as 'import_ms', the modules of the Farm UI
+        it imported as 'package_imported' and the DEFERRED_MODULES it imported
+        as 'deferred_imported'.
+    """
+
+    package_folder = os.path.dirname(os.path.abspath(__file__))
+    package_modules = {
+        os.path.splitext(name)[0]
+        for name in os.listdir(package_folder)
+        if name.endswith(".py")
+    }
+    timings = []
+    imported = set()
+
+    for _ in range(max(repeat, 1)):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=package_folder,
+            env=dict(os.environ, QT_QPA_PLATFORM="offscreen"),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line.split("|")
+            name = name.strip()
+            imported.add(name)
+            if name == module:
+                timings.append(int(cumulative) / 1000)
+
+    return {
+        "import_ms": round(statistics.median(timings), 2),
+        "package_imported": sorted(imported & package_modules),
+        "deferred_imported": sorted(imported.intersection(DEFERRED_MODULES)),
+    }
+
+
+def compare_results(old_results, new_results, threshold=REGRESSION_THRESHOLD):
+    """Prints the median of every benchmark before and after, flagging the
+    ones that got slower than the threshold.
+
+    Parameters:
+        old_results (dict): Results file of the baseline.
+        new_results (dict): Results file to compare.
+        threshold (float): Ratio above which a benchmark is a regression.
+
+    Returns:
+        list: Names of the benchmarks that regressed.
+    """
+
+    regressions = []
+
+    print(f"{'':40}{'Before (ms)':>14}{'After (ms)':>14}{'Ratio':>8}")
+    for name, result in new_results["results"].items():
+        before = old_results["results"].get(name)
+        if before is None:
+            print(f"{name:40}{'-':>14}{result['median_ms']:>14.2f}")
+            continue
+
+        ratio = result["median_ms"] / max(before["median_ms"], 1e-9)
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = "  <-- slower"
+        print(
+            f"{name:40}{before['median_ms']:>14.2f}{result['median_ms']:>14.2f}"
+            f"{ratio:>8.2f}{flag}"
+        )
+
+    return regressions
+
+
+def main(argv=None):
+    """Parses the command line, runs the benchmarks and stores the results.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code, 1 if a benchmark regressed against --compare or the
+        import of the first window is over its budget.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--shows", type=int, default=40)
+    parser.add_argument("--tags", type=int, default=6, help="tags per show")
+    parser.add_argument("--applications", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON file to store the results in")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    parser.add_argument(
+        "--import-budget",
+        type=float,
+        default=IMPORT_BUDGET_MS,
+        help="milliseconds the import of the first window may take",
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "revision": git_revision(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": {
+            "shows": args.shows,
+            "tags_per_show": args.tags,
+            "applications": args.applications,
+            "repeat": args.repeat,
+        },
+        "results": run_benchmarks(
+            args.shows, args.tags, args.applications, args.repeat
+        ),
+        "memory": measure_memory(args.shows, args.tags, args.applications),
+        "startup": measure_import_time(repeat=max(args.repeat, IMPORT_RUNS)),
+    }
+
+    if args.output:
+        with open(args.output, "w") as o:
+            json.dump(results, o, indent=4)
+
+    startup = results["startup"]
+    over_budget = startup["import_ms"] > args.import_budget
+    if over_budget:
+        print(
+            f"Importing {STARTUP_MODULE} took {startup['import_ms']:.1f} ms, "
+            f"over the budget of {args.import_budget:.0f} ms"
+        )
+    if startup["deferred_imported"]:
+        over_budget = True
+        print(
+            f"{STARTUP_MODULE} imports modules meant to be loaded on first use: "
+            f"{', '.join(startup['deferred_imported'])}"
+        )
+
+    if args.compare:
+        with open(args.compare, "r") as i:
+            old_results = json.load(i)
+        if old_results.get("scale") != results["scale"]:
+            print("Warning: the results being compared used a different scale")
+        return 1 if compare_results(old_results, results) or over_budget else 0
+
+    for name, result in results["results"].items():
+        print(
+            f"{name:40}{result['median_ms']:>10.2f} ms median"
+            f"{result['min_ms']:>10.2f} ms min"
+        )
+    for name, kilobytes in results["memory"].items():
+        print(f"{name:40}{kilobytes:>10.1f} KB")
+    print(f"{'import ' + STARTUP_MODULE:40}{startup['import_ms']:>10.2f} ms median")
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
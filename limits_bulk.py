@@ -0,0 +1,253 @@
+#!/usr/bin/python3
+
+"""
+Bulk operations over the tags of many shows at once for the Farm UI, e.g.
+"scale the 'maya' tag of every show but XYZ by 0.8" or "cap every 'nuke' tag
+at 50". The tags are selected by show and by shell-style pattern from the
+positions of the limits table, then the operation is computed in one pass over
+the values of the table and only the keys that change are returned, ready to
+be reviewed as one diff and written as one change set with one reload.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+From the terminal, e.g.:
+
+    limits_bulk.py scale 0.8 --tags maya --exclude xyz
+    limits_bulk.py clamp 50 --tags nuke --open
+"""
+
+import argparse
+import re
+import sys
+from array import array
+from collections import OrderedDict
+from fnmatch import translate
+
+import limits_farms
+import limits_table
+import limits_tracing
+from limits_tracing import LOGGER, traced
+
+# Same bounds as the spin boxes of the Show Limits window
+MINIMUM_VALUE = 0
+MAXIMUM_VALUE = 10000
+
+# Operation per name, given the current value and the operand
+OPERATIONS = OrderedDict(
+    (
+        ("scale", lambda value, operand: round(value * operand)),
+        ("add", lambda value, operand: value + operand),
+        ("clamp", lambda value, operand: min(value, operand)),
+        ("set", lambda value, operand: operand),
+    )
+)
+
+
+def show_tags(table):
+    """Returns the tags of every show, the keys of the show without the name
+    of the show, e.g. 'maya' for 'pwp_maya'.
+
+    Parameters:
+        table (LimitsTable): Limits of the configuration file.
+
+    Returns:
+        OrderedDict: (position in the table, tag) tuples per lower case show.
+    """
+
+    tags = OrderedDict()
+
+    for show in sorted(table.show_positions):
+        prefix = f"{show}_"
+        tags[show] = [
+            (position, table.records[position].key.split(prefix, 1)[-1])
+            for position in table.show_positions[show]
+        ]
+
+    return tags
+
+
+def tag_names(table):
+    """Returns the name of every tag found in at least one show.
+
+    Parameters:
+        table (LimitsTable): Limits of the configuration file.
+
+    Returns:
+        list: Sorted tag names.
+    """
+
+    return sorted({tag for tags in show_tags(table).values() for _, tag in tags})
+
+
+def select_positions(table, shows=None, tags=None, exclude=()):
+    """Returns the positions in the table of the tags of some shows.
+
+    Parameters:
+        table (LimitsTable): Limits of the configuration file.
+        shows (iterable): Names of the shows in any case, every show if None.
+        tags (iterable): Shell-style patterns the tags must match, e.g. 'maya'
+        or 'nuke*', every tag if None.
+        exclude (iterable): Names of the shows left out, in any case.
+
+    Returns:
+        array: Sorted positions, once each even if a key is a tag of two shows.
+    """
+
+    selected_shows = set(table.show_positions)
+    if shows is not None:
+        selected_shows &= {show.lower() for show in shows}
+    selected_shows -= {show.lower() for show in exclude}
+
+    matcher = None
+    if tags is not None:
+        matcher = re.compile("|".join(translate(tag) for tag in tags) or "(?!)")
+
+    positions = set()
+    for show, tags_of_show in show_tags(table).items():
+        if show not in selected_shows:
+            continue
+        positions.update(
+            position
+            for position, tag in tags_of_show
+            if matcher is None or matcher.match(tag)
+        )
+
+    return array("l", sorted(positions))
+
+
+@traced("bulk.compute")
+def compute_changes(table, positions, operation, operand):
+    """Applies an operation to the values at some positions of the table, in
+    one pass, bounding the results to the values the spin boxes accept.
+
+    Parameters:
+        table (LimitsTable): Limits of the configuration file.
+        positions (array): Positions of the keys to change.
+        operation (str): One of OPERATIONS.
+        operand (float): Factor, amount or value of the operation.
+
+    Returns:
+        OrderedDict: New value per key whose value changes.
+    """
+
+    function = OPERATIONS[operation]
+    values = table.values
+    records = table.records
+
+    changes = OrderedDict()
+    for position in positions:
+        value = values[position]
+        new_value = int(
+            min(max(function(value, operand), MINIMUM_VALUE), MAXIMUM_VALUE)
+        )
+        if new_value != value:
+            changes[records[position].key] = new_value
+
+    return changes
+
+
+def old_values(table, changes):
+    """Returns the current value of every key of some changes.
+
+    Parameters:
+        table (LimitsTable): Limits of the configuration file.
+        changes (dict): New value per key.
+
+    Returns:
+        dict: Current value per key.
+    """
+
+    return {key: table.value(key) for key in changes}
+
+
+def open_confirmation_window(farm, table, changes):
+    """Opens the Confirmation Window with the changes, which then go through
+    the usual Stage and Write windows.
+
+    Parameters:
+        farm (LimitFarm): Farm of the changes.
+        table (LimitsTable): Limits the changes were computed from.
+        changes (dict): New value per key.
+
+    Returns:
+        UiConfirmFarmChangesMainWindow: The window.
+    """
+
+    from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+
+    window = UiConfirmFarmChangesMainWindow(
+        old_values(table, changes), dict(changes), table, *farm.folders()
+    )
+    window.show()
+
+    return window
+
+
+def main(argv=None):
+    """Parses the command line and prints the changes of a bulk operation.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--farm", default=None, help="farm to use, the first one by default"
+    )
+    parser.add_argument("operation", choices=list(OPERATIONS))
+    parser.add_argument("operand", type=float)
+    parser.add_argument("--shows", nargs="+", help="shows to change, all by default")
+    parser.add_argument(
+        "--exclude", nargs="+", default=(), help="shows to leave as they are"
+    )
+    parser.add_argument(
+        "--tags", nargs="+", help="patterns of the tags to change, all by default"
+    )
+    parser.add_argument(
+        "--open", action="store_true", help="open the Confirmation Window"
+    )
+    args, qt_args = parser.parse_known_args(argv)
+    if qt_args and not args.open:
+        parser.error(f"unrecognized arguments: {' '.join(qt_args)}")
+
+    limits_tracing.configure()
+
+    farms = limits_farms.load_farms()
+    if args.farm is not None and args.farm not in farms:
+        LOGGER.error("Unknown farm: %s", args.farm)
+        return 1
+    farm = farms[args.farm] if args.farm else limits_farms.selected_farm(farms)
+    limits_farms.select_farm(farm.name)
+
+    table = limits_table.load_session_table(
+        farm.config_file_path_name, farm.temp_folder
+    )
+    positions = select_positions(table, args.shows, args.tags, args.exclude)
+    changes = compute_changes(table, positions, args.operation, args.operand)
+
+    for key, value in changes.items():
+        old_value = table.value(key)
+        print(f"{key}\t{old_value}\t{value}\t{value - old_value:+d}")
+
+    if not changes:
+        print(f"Nothing changes in the {len(positions)} selected tags")
+        return 0
+
+    if args.open:
+        from qtpy import QtWidgets
+
+        app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+        window = open_confirmation_window(farm, table, changes)
+        return app.exec_()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
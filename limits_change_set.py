@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+
+"""
+Change set used by the limit windows of the Farm UI. It is fed by the
+'valueChanged' signals of the spin boxes and only keeps the values that
+really differ from what was loaded, so the confirmation window, the staging
+and the verification only deal with what the user actually touched.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+from collections import OrderedDict
+from functools import partial
+
+
+class LimitsChangeSet:
+    """Keeps track of the original and the modified values of limit keys.
+
+    Attributes:
+        current_values (OrderedDict): Value of every tracked key when it was loaded.
+        new_values (OrderedDict): New value of every key that was modified.
+        listeners (list): Callables run as 'listener(key, value)' after every change.
+
+    Methods:
+        track(key, current_value): Starts tracking a key with its loaded value.
+        record(key, value): Records a new value for a tracked key.
+        connect_spinbox(key, spinbox): Tracks a key and feeds it from a spin box.
+        rebase(key, current_value): Changes the loaded value of a key.
+        old_values(): Returns the loaded values of the modified keys only.
+        changes(): Returns (old, new) for every modified key.
+    """
+
+    def __init__(self):
+        """Initializes an empty change set."""
+
+        self.current_values = OrderedDict()
+        self.new_values = OrderedDict()
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.new_values)
+
+    def __bool__(self):
+        return bool(self.new_values)
+
+    def __contains__(self, key):
+        return key in self.new_values
+
+    def track(self, key, current_value):
+        """Starts tracking a key with the value it was loaded with.
+
+        Parameters:
+            key (str): Limit key as found in the configuration file.
+            current_value (int): Value the key was loaded with.
+
+        Returns:
+            None
+        """
+
+        self.current_values[key] = current_value
+        self.new_values.pop(key, None)
+
+    def record(self, key, value):
+        """Records a new value for a tracked key. Setting a key back to the
+        value it was loaded with removes it from the change set.
+
+        Parameters:
+            key (str): Limit key as found in the configuration file.
+            value (int): New value of the key.
+
+        Returns:
+            None
+        """
+
+        if value == self.current_values[key]:
+            self.new_values.pop(key, None)
+        else:
+            self.new_values[key] = value
+
+        for listener in self.listeners:
+            listener(key, value)
+
+    def connect_spinbox(self, key, spinbox):
+        """Tracks a key using the current value of a spin box and records
+        every later change of that spin box.
+
+        Parameters:
+            key (str): Limit key as found in the configuration file.
+            spinbox (QSpinBox): The spin box showing the value of the key.
+
+        Returns:
+            None
+        """
+
+        self.track(key, spinbox.value())
+        spinbox.valueChanged.connect(partial(self.record, key))
+
+    def rebase(self, key, current_value):
+        """Changes the value a key was loaded with, for example because
+        someone else wrote the configuration file meanwhile. A modification
+        of the user is kept, unless it now matches the loaded value.
+
+        Listeners are run with the value the key ends up with, so keys that
+        aren't tracked (but are part of a constraint) can be rebased too.
+
+        Parameters:
+            key (str): Limit key as found in the configuration file.
+            current_value (int): Value the key has now in the file.
+
+        Returns:
+            None
+        """
+
+        if key in self.current_values:
+            self.current_values[key] = current_value
+            if self.new_values.get(key) == current_value:
+                del self.new_values[key]
+
+        value = self.new_values.get(key, current_value)
+        for listener in self.listeners:
+            listener(key, value)
+
+    def old_values(self):
+        """Returns the loaded values of the modified keys only.
+
+        Returns:
+            OrderedDict: Loaded value per modified key.
+        """
+
+        return OrderedDict(
+            (key, self.current_values[key]) for key in self.new_values
+        )
+
+    def changes(self):
+        """Returns the old and the new value of every modified key.
+
+        Returns:
+            OrderedDict: (old, new) per modified key.
+        """
+
+        return OrderedDict(
+            (key, (self.current_values[key], value))
+            for key, value in self.new_values.items()
+        )
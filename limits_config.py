@@ -0,0 +1,451 @@
+#!/usr/bin/python3
+
+"""
+Shared helpers for reading, staging, writing and verifying the Tractor
+'.config' file used by every window of the Limits UI.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+import datetime
+import json
+import os
+from collections import OrderedDict
+from datetime import date
+from time import perf_counter, sleep
+
+import limits_metrics
+from limits_tracing import LOGGER, span
+
+# Script used to tell Tractor to re-read the config file
+RELOAD_COMMAND = (
+    "/bin/bash /sw/pipeline/rendering/tractor-config-tools/reloadconfig_bash.sh"
+)
+# Website containing the live '.config' file info
+ENGINE_LIMITS_URL = "http://tractor-engine/Tractor/queue?q=limits"
+# Name of the staging file created inside the temp folder
+TEMP_FILE_NAME = "temp.config"
+# Copy of the '.config' file the staged changes started from, see limits_merge
+BASE_FILE_NAME = "base.config"
+# Separates the parts of keys pointing inside 'Limits' (e.g. Shares weights)
+PATH_SEPARATOR = "/"
+
+# Verification settings (same numbers the Write window has always used)
+POLL_DELAY = 5
+MAX_RELOADS = 6
+
+
+def read_config(config_file_path_name):
+    """Reads a '.config' file keeping the order of its keys.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+
+    Returns:
+        OrderedDict: Contents of the configuration file.
+    """
+
+    with span("config.read", path=config_file_path_name):
+        with open(config_file_path_name, "r") as i:
+            return json.load(i, object_pairs_hook=OrderedDict)
+
+
+def read_session_config(config_file_path_name, temp_folder):
+    """Reads the staged 'temp.config' if there is one, otherwise the main
+    configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+
+    Returns:
+        OrderedDict: Contents of the configuration file being edited.
+    """
+
+    tmp_file_name = f"{temp_folder}{TEMP_FILE_NAME}"
+
+    if os.path.exists(tmp_file_name):
+        return read_config(tmp_file_name)
+
+    return read_config(config_file_path_name)
+
+
+def get_limit_value(contents_dict, key):
+    """Returns the 'SiteMax' of a limit key.
+
+    Keys containing PATH_SEPARATOR are paths inside 'Limits' instead, for
+    example 'linuxfarm/Shares/pwp/share' for the Shares weight of a show.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file, or its
+        limits_table.LimitsTable.
+        key (str): Limit key as found in the configuration file, or a path.
+
+    Returns:
+        int: Current value of the key.
+    """
+
+    if not isinstance(contents_dict, dict):
+        return contents_dict.value(key)
+
+    if PATH_SEPARATOR not in key:
+        return contents_dict["Limits"][key]["SiteMax"]
+
+    value = contents_dict["Limits"]
+    for part in key.split(PATH_SEPARATOR):
+        value = value[part]
+
+    return value
+
+
+def set_limit_value(contents_dict, key, value):
+    """Sets the 'SiteMax' of a limit key, or the value at a path inside
+    'Limits' when the key contains PATH_SEPARATOR.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file, or its
+        limits_table.LimitsTable.
+        key (str): Limit key as found in the configuration file, or a path.
+        value (int): New value of the key.
+
+    Returns:
+        None
+    """
+
+    if not isinstance(contents_dict, dict):
+        contents_dict.set_value(key, value)
+        return
+
+    if PATH_SEPARATOR not in key:
+        contents_dict["Limits"][key]["SiteMax"] = value
+        return
+
+    *parents, last = key.split(PATH_SEPARATOR)
+    container = contents_dict["Limits"]
+    for part in parents:
+        container = container[part]
+
+    container[last] = value
+
+
+def apply_values(contents_dict, new_values):
+    """Applies new values to the contents of a configuration file, skipping
+    the ones that are already set.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file.
+        new_values (dict): New values per limit key.
+
+    Returns:
+        dict: Only the values that actually changed.
+    """
+
+    changed = OrderedDict()
+
+    for key, value in new_values.items():
+        if get_limit_value(contents_dict, key) != value:
+            set_limit_value(contents_dict, key, value)
+            changed[key] = value
+
+    return changed
+
+
+def stage_config(contents_dict, temp_folder):
+    """Writes the contents to 'temp.config' inside the temp folder. The first
+    time, the file the limits were read from is also kept as 'base.config', so
+    the changes can be merged with the file on disk when they are written.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file, or its
+        limits_table.LimitsTable.
+        temp_folder (str): Path to the temporary folder.
+
+    Returns:
+        str: Path of the staged file.
+    """
+
+    tmp_file_name = f"{temp_folder}{TEMP_FILE_NAME}"
+    base_file_name = f"{temp_folder}{BASE_FILE_NAME}"
+
+    with span("config.stage", path=tmp_file_name):
+        if not isinstance(contents_dict, dict) and not os.path.exists(
+            base_file_name
+        ):
+            with open(base_file_name, mode="w") as base_file:
+                base_file.write(contents_dict.text)
+
+        with open(tmp_file_name, mode="w") as created_file:
+            _dump(contents_dict, created_file)
+
+    return tmp_file_name
+
+
+def discard_staged(temp_folder):
+    """Removes 'temp.config' and 'base.config' from the temp folder if they
+    exist.
+
+    Parameters:
+        temp_folder (str): Path to the temporary folder.
+
+    Returns:
+        None
+    """
+
+    for file_name in (TEMP_FILE_NAME, BASE_FILE_NAME):
+        if os.path.exists(f"{temp_folder}{file_name}"):
+            os.remove(f"{temp_folder}{file_name}")
+
+
+def backup_config(config_file_path_name, backup_folder):
+    """Moves the current configuration file into the backup folder.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+
+    Returns:
+        str: Path of the backup file, or None if there was nothing to back up.
+    """
+
+    if not os.path.exists(config_file_path_name):
+        return None
+
+    backup_file_name = (
+        f"{backup_folder}D{date.today()}"
+        f"-T{datetime.datetime.now().strftime('%H:%M:%S')}.config"
+    )
+
+    final_backup_file = backup_file_name.replace(":", "")
+    os.rename(config_file_path_name, final_backup_file)
+
+    return final_backup_file
+
+
+def write_config(contents_dict, config_file_path_name):
+    """Writes the contents to the main configuration file.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file, or its
+        limits_table.LimitsTable.
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        None
+    """
+
+    with span("config.write", path=config_file_path_name):
+        with open(config_file_path_name, mode="w") as config_file:
+            _dump(contents_dict, config_file)
+
+
+def _dump(contents_dict, config_file):
+    """Writes a dictionary as indented JSON, or the text of a LimitsTable
+    with its current values so the rest of the file stays untouched."""
+
+    if isinstance(contents_dict, dict):
+        json.dump(contents_dict, config_file, indent=4)
+    else:
+        config_file.write(contents_dict.render())
+
+
+def reload_config(reload_command=None):
+    """Reloads the configuration file in Tractor by running the reload script.
+
+    Parameters:
+        reload_command (str): Shell command that reloads the config, defaults
+        to RELOAD_COMMAND.
+
+    Returns:
+        bool: True if the script finished successfully.
+    """
+
+    with span("engine.reload") as fields:
+        import subprocess
+
+        reload_process = subprocess.Popen(reload_command or RELOAD_COMMAND, shell=True)
+        reload_process.wait()
+        fields["returncode"] = reload_process.returncode
+
+    return reload_process.returncode == 0
+
+
+def fetch_engine_limits(engine_url=None):
+    """Loads the limits currently live in the Tractor engine.
+
+    Parameters:
+        engine_url (str): Website containing the live '.config' file info,
+        defaults to ENGINE_LIMITS_URL.
+
+    Returns:
+        dict: Limits as reported by the engine.
+    """
+
+    # Imported on first use, it takes longer than the rest of the UI to load
+    from urllib.request import urlopen
+
+    with span("engine.poll", url=engine_url or ENGINE_LIMITS_URL):
+        with urlopen(engine_url or ENGINE_LIMITS_URL) as web_info:
+            return json.load(web_info)
+
+
+def find_mismatches(engine_dict, new_values):
+    """Compares every new value against the values live in the engine.
+
+    Parameters:
+        engine_dict (dict): Limits as reported by the engine.
+        new_values (dict): New values per limit key.
+
+    Returns:
+        dict: Keys still not matching with their (engine, expected) values.
+    """
+
+    mismatches = OrderedDict()
+
+    for key, value in new_values.items():
+        try:
+            web_value = get_limit_value(engine_dict, key)
+        except KeyError:
+            web_value = None
+
+        if web_value != value:
+            mismatches[key] = (web_value, value)
+
+    return mismatches
+
+
+def verify_limits(
+    new_values,
+    engine_url=None,
+    reload_command=None,
+    max_reloads=None,
+    poll_delay=None,
+    reload_results=None,
+):
+    """Checks all new values against the engine in one batch, reloading the
+    config again while any of them is still not live.
+
+    Parameters:
+        new_values (dict): New values per limit key.
+        engine_url (str): Website containing the live '.config' file info,
+        defaults to ENGINE_LIMITS_URL.
+        reload_command (str): Shell command that reloads the config, defaults
+        to RELOAD_COMMAND.
+        max_reloads (int): Extra reloads allowed before giving up, defaults
+        to MAX_RELOADS.
+        poll_delay (int): Seconds to wait before every poll of the engine,
+        defaults to POLL_DELAY.
+        reload_results (list): Whether every reload succeeded is appended to
+        it, if given.
+
+    Returns:
+        tuple: (mismatches, reloads) where mismatches holds the keys still not
+        live and reloads is the amount of extra reloads that were needed.
+    """
+
+    max_reloads = MAX_RELOADS if max_reloads is None else max_reloads
+    poll_delay = POLL_DELAY if poll_delay is None else poll_delay
+    reloads = 0
+
+    while True:
+        sleep(poll_delay)
+        mismatches = find_mismatches(fetch_engine_limits(engine_url), new_values)
+
+        if not mismatches or reloads == max_reloads:
+            return mismatches, reloads
+
+        reloads += 1
+        succeeded = reload_config(reload_command)
+        if reload_results is not None:
+            reload_results.append(succeeded)
+        if succeeded:
+            LOGGER.info("Command apparently succeeded while verifying")
+        else:
+            LOGGER.warning("Command failed")
+        LOGGER.info("Amount of config-reloads: %d", reloads + 1)
+
+
+def commit_config(
+    contents_dict,
+    new_values,
+    config_file_path_name,
+    backup_folder,
+    engine_url=None,
+    reload_command=None,
+    source="ui",
+    farm=None,
+    audit_changes=None,
+):
+    """Backs up and writes the configuration file, reloads Tractor once and
+    verifies all new values in one batch. The outcome is recorded in the audit
+    log when audit_changes is given, then exported to the metrics file,
+    labeled with the farm. The metrics are best-effort, failing to export them
+    doesn't fail the commit.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file to write.
+        new_values (dict): New values per limit key to verify.
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+        engine_url (str): Website containing the live '.config' file info,
+        defaults to ENGINE_LIMITS_URL.
+        reload_command (str): Shell command that reloads the config, defaults
+        to RELOAD_COMMAND.
+        source (str): What made the commit, used as the metrics label.
+        farm (str): Name of the farm for the metrics, defaults to the farm
+        of config_file_path_name.
+        audit_changes (dict): (old, new) per key to record in the audit log
+        next to the configuration file, nothing is recorded if None.
+
+    Returns:
+        tuple: (mismatches, reloads) with the keys still not live in the engine
+        after all reloads and the amount of extra reloads that were needed.
+    """
+
+    with span("config.commit", profile=True, keys=len(new_values)):
+        backup_config(config_file_path_name, backup_folder)
+        write_config(contents_dict, config_file_path_name)
+        written = perf_counter()
+
+        reload_results = [reload_config(reload_command)]
+        if reload_results[0]:
+            LOGGER.info("The first reload of the config file has just occurred :)")
+            LOGGER.info("Command succeeded!")
+        else:
+            LOGGER.warning("Command failed")
+
+        mismatches, reloads = verify_limits(
+            new_values, engine_url, reload_command, reload_results=reload_results
+        )
+
+    if audit_changes is not None:
+        # Imported here, limits_audit imports this module
+        import limits_audit
+
+        limits_audit.record_commit(
+            limits_audit.audit_file_path(config_file_path_name),
+            audit_changes,
+            reloads,
+            mismatches,
+            source,
+        )
+
+    if farm is None:
+        # Imported here, limits_farms imports this module
+        import limits_farms
+
+        farm_found = limits_farms.farm_for_config(config_file_path_name)
+        farm = farm_found.name if farm_found else config_file_path_name
+
+    limits_metrics.record_commit(
+        source,
+        reloads,
+        perf_counter() - written,
+        len(mismatches),
+        reload_results,
+        farm,
+    )
+
+    return mismatches, reloads
@@ -0,0 +1,467 @@
+#!/usr/bin/python3
+
+"""
+Cross-limit constraints for the Farm UI, declared in a 'limits_constraints.config'
+file next to the main '.config' file. The dependency graph between limit keys
+and constraints is computed once, so every time a spin box changes only the
+constraints that depend on that key are evaluated again.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Example of a 'limits_constraints.config' file:
+
+    {
+        "Constraints": [
+            {"name": "Katana licenses", "sum": ["*_katana"], "max": "katana"},
+            {"name": "Maya licenses", "sum": ["*_maya"], "max": "maya"},
+            {"name": "Farm total", "each": ["*_*"], "max": "linuxfarm"}
+        ]
+    }
+
+A "sum" constraint checks that the sum of every key matching its patterns is
+not above "max", while an "each" constraint checks every matching key on its
+own. "max" is either another limit key or a number, and the patterns are
+shell-style wildcards matched against the limit keys.
+"""
+
+import json
+import os
+import re
+from collections import OrderedDict
+from fnmatch import translate
+
+CONSTRAINTS_FILE_NAME = "limits_constraints.config"
+
+# Style used to flag spin boxes taking part in a violated constraint
+VIOLATION_STYLE_SHEET = "border: 2px solid #D21404"
+
+
+class LimitConstraint:
+    """A single constraint between limit keys.
+
+    Args:
+        name (str): Name of the constraint shown to the user.
+        kind (str): Either "sum" or "each".
+        keys (frozenset): Limit keys matched by the patterns of the constraint.
+        bound (str or int): Limit key or number the keys can't go above.
+
+    Attributes:
+        total (int): Running sum of the keys, only used by "sum" constraints.
+        violating (set): Keys currently breaking the constraint.
+    """
+
+    __slots__ = ("name", "kind", "keys", "bound", "total", "violating")
+
+    def __init__(self, name, kind, keys, bound):
+        """Stores the constraint, its state is filled in by the engine."""
+
+        self.name = name
+        self.kind = kind
+        self.keys = keys
+        self.bound = bound
+        self.total = 0
+        self.violating = set()
+
+    def message(self, values):
+        """Returns a text explaining why the constraint is violated.
+
+        Parameters:
+            values (dict): Current value per limit key.
+
+        Returns:
+            str: Explanation of the violation.
+        """
+
+        limit = self.bound_value(values)
+
+        if self.kind == "sum":
+            return f"{self.name}: {self.total} in total is above {limit}"
+
+        keys = ", ".join(sorted(self.violating))
+        return f"{self.name}: {keys} above {limit}"
+
+    def bound_value(self, values):
+        """Returns the value the keys can't go above.
+
+        Parameters:
+            values (dict): Current value per limit key.
+
+        Returns:
+            int: The maximum allowed.
+        """
+
+        if isinstance(self.bound, str):
+            return values.get(self.bound, 0)
+        return self.bound
+
+
+class LimitsConstraintEngine:
+    """Evaluates constraints incrementally while values change.
+
+    Args:
+        rules (list): Constraint declarations as found in the constraints file.
+        values (dict): Current value per limit key.
+
+    Attributes:
+        values (dict): Current value per limit key.
+        constraints (list): Every LimitConstraint with at least one matched key.
+        dependents (dict): Constraints to evaluate again when a key changes.
+        baseline (dict): (violating keys, excess) of every constraint with the
+        values the engine was created with.
+
+    Methods:
+        update(key, value): Changes one value and evaluates the affected constraints.
+        violated(): Returns every constraint currently violated.
+        introduced(): Returns the violations made worse since the baseline.
+        set_baseline(values): Takes the violations of other values as baseline.
+        violations_for(key): Returns the constraints violated that involve a key.
+    """
+
+    def __init__(self, rules, values):
+        """Expands the patterns of every rule, builds the dependency graph and
+        evaluates every constraint once."""
+
+        self.values = dict(values)
+        self.constraints = []
+        self.dependents = {}
+
+        for rule in rules:
+            kind = "sum" if "sum" in rule else "each"
+            patterns = rule[kind]
+            matcher = re.compile("|".join(translate(pattern) for pattern in patterns))
+            bound = rule["max"]
+
+            keys = frozenset(
+                key for key in self.values if key != bound and matcher.match(key)
+            )
+            if not keys:
+                continue
+
+            constraint = LimitConstraint(rule.get("name", bound), kind, keys, bound)
+            self.constraints.append(constraint)
+
+            for key in keys:
+                self.dependents.setdefault(key, []).append(constraint)
+            if isinstance(bound, str):
+                self.dependents.setdefault(bound, []).append(constraint)
+
+            if kind == "sum":
+                constraint.total = sum(self.values[key] for key in keys)
+            self.evaluate(constraint)
+
+        # Violations already there before any change don't block anything
+        self.baseline = {
+            constraint: (frozenset(constraint.violating), self.excess(constraint))
+            for constraint in self.constraints
+        }
+
+    def set_baseline(self, values):
+        """Takes the violations of other values as the baseline, e.g. once
+        someone else wrote the configuration file, so the violations they
+        introduced aren't blamed on the changes of the user. The current
+        values are left as they are.
+
+        Parameters:
+            values (dict): Values of the baseline per limit key, the current
+            value is used for the keys missing.
+
+        Returns:
+            None
+        """
+
+        current_values = self.values
+        current_state = [
+            (constraint.total, constraint.violating) for constraint in self.constraints
+        ]
+
+        self.values = dict(current_values)
+        self.values.update(values)
+        for constraint in self.constraints:
+            if constraint.kind == "sum":
+                constraint.total = sum(self.values[key] for key in constraint.keys)
+            self.evaluate(constraint)
+
+        self.baseline = {
+            constraint: (frozenset(constraint.violating), self.excess(constraint))
+            for constraint in self.constraints
+        }
+
+        self.values = current_values
+        for constraint, (total, violating) in zip(self.constraints, current_state):
+            constraint.total = total
+            constraint.violating = violating
+
+    def evaluate(self, constraint, key=None):
+        """Evaluates one constraint again.
+
+        Parameters:
+            constraint (LimitConstraint): The constraint to evaluate.
+            key (str): The key that changed, only its own check is done for
+            "each" constraints when it isn't the bound.
+
+        Returns:
+            None
+        """
+
+        limit = constraint.bound_value(self.values)
+
+        if constraint.kind == "sum":
+            if constraint.total > limit:
+                constraint.violating = set(constraint.keys)
+            else:
+                constraint.violating = set()
+        elif key is not None and key != constraint.bound:
+            if self.values[key] > limit:
+                constraint.violating.add(key)
+            else:
+                constraint.violating.discard(key)
+        else:
+            constraint.violating = {
+                term for term in constraint.keys if self.values[term] > limit
+            }
+
+    def update(self, key, value):
+        """Changes one value and evaluates only the constraints depending on it.
+
+        Parameters:
+            key (str): Limit key that changed.
+            value (int): New value of the key.
+
+        Returns:
+            list: The constraints that were evaluated again.
+        """
+
+        old_value = self.values.get(key, 0)
+        self.values[key] = value
+        affected = self.dependents.get(key, [])
+
+        for constraint in affected:
+            if constraint.kind == "sum" and key in constraint.keys:
+                constraint.total += value - old_value
+            self.evaluate(constraint, key)
+
+        return affected
+
+    def excess(self, constraint):
+        """Returns how far a constraint is above its bound.
+
+        Parameters:
+            constraint (LimitConstraint): The constraint.
+
+        Returns:
+            int: The sum above the bound for "sum" constraints, the largest
+            value above it for "each" constraints, 0 when not violated.
+        """
+
+        if not constraint.violating:
+            return 0
+
+        limit = constraint.bound_value(self.values)
+        if constraint.kind == "sum":
+            return constraint.total - limit
+        return max(self.values[key] for key in constraint.violating) - limit
+
+    def introduced(self):
+        """Returns the violated constraints that are worse than with the
+        values the engine was created with: newly violated, broken by more
+        keys or further above their bound.
+
+        Returns:
+            list: Violated constraints made worse by the changes.
+        """
+
+        introduced = []
+
+        for constraint in self.violated():
+            violating, excess = self.baseline[constraint]
+            if constraint.violating - violating or self.excess(constraint) > excess:
+                introduced.append(constraint)
+
+        return introduced
+
+    def violated(self):
+        """Returns every constraint currently violated.
+
+        Returns:
+            list: Violated constraints.
+        """
+
+        return [constraint for constraint in self.constraints if constraint.violating]
+
+    def violations_for(self, key):
+        """Returns the violated constraints involving a key, either because it
+        breaks them or because it is their bound.
+
+        Parameters:
+            key (str): Limit key to check.
+
+        Returns:
+            list: Violated constraints involving the key.
+        """
+
+        return [
+            constraint
+            for constraint in self.dependents.get(key, [])
+            if constraint.violating
+            and (key in constraint.violating or key == constraint.bound)
+        ]
+
+
+def constraints_file_path(config_file_path_name):
+    """Returns the path of the constraints file that lives next to the main
+    configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the constraints file.
+    """
+
+    return os.path.join(os.path.dirname(config_file_path_name), CONSTRAINTS_FILE_NAME)
+
+
+def limit_values(contents_dict):
+    """Collects the 'SiteMax' of every limit key of a configuration.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file, or its
+        limits_table.LimitsTable.
+
+    Returns:
+        OrderedDict: Value per limit key.
+    """
+
+    if not isinstance(contents_dict, dict):
+        return contents_dict.limit_values()
+
+    values = OrderedDict()
+
+    for key, limit in contents_dict["Limits"].items():
+        if isinstance(limit, dict) and isinstance(limit.get("SiteMax"), int):
+            values[key] = limit["SiteMax"]
+
+    return values
+
+
+def load_constraint_engine(config_file_path_name, contents_dict):
+    """Creates the constraint engine for a configuration. Without a
+    constraints file no constraint is checked.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        contents_dict (dict): Contents of the configuration file being edited,
+        or its limits_table.LimitsTable.
+
+    Returns:
+        LimitsConstraintEngine: The engine, already evaluated.
+    """
+
+    rules = []
+    rules_path = constraints_file_path(config_file_path_name)
+
+    if os.path.exists(rules_path):
+        with open(rules_path, "r") as i:
+            rules = json.load(i).get("Constraints", [])
+
+    return LimitsConstraintEngine(rules, limit_values(contents_dict))
+
+
+def connect_constraints(engine, change_set, spinboxes_by_key, submit_button):
+    """Flags spin boxes inline while their values violate a constraint.
+
+    Every change recorded by the change set updates the engine, then only the
+    spin boxes of the keys involved in the affected constraints are restyled,
+    keeping any other style they have. The messages of the violations are
+    added to the tool tip a spin box already had, which is restored once they
+    are gone. The Submit button stays disabled while there is nothing to
+    submit or the changes introduce a violation, or make one worse;
+    violations the farm already had are flagged but don't block.
+
+    Parameters:
+        engine (LimitsConstraintEngine): Engine holding the constraints.
+        change_set (LimitsChangeSet): Change set fed by the spin boxes.
+        spinboxes_by_key (dict): Spin box per limit key of the window.
+        submit_button (QPushButton): Button staging the changes.
+
+    Returns:
+        callable: Takes the values loaded in the change set as the baseline of
+        the engine again, to call once someone else's values were rebased into
+        it (see limits_watch.show_remote_changes()).
+    """
+
+    # (tool tip the spin box had, tool tip set here) per flagged key
+    flagged = {}
+
+    def flag(key):
+        spinbox = spinboxes_by_key.get(key)
+        if spinbox is None:
+            return
+
+        tool_tip = spinbox.toolTip()
+        base_tool_tip, flagged_tool_tip = flagged.get(key, (tool_tip, None))
+        if tool_tip != flagged_tool_tip:
+            # Set by someone else since, e.g. a remote change
+            base_tool_tip = tool_tip
+
+        violations = engine.violations_for(key)
+        if violations:
+            if key not in flagged:
+                spinbox.setStyleSheet(
+                    ";".join(
+                        filter(None, (spinbox.styleSheet(), VIOLATION_STYLE_SHEET))
+                    )
+                )
+            flagged_tool_tip = "\n".join(
+                filter(
+                    None,
+                    [base_tool_tip]
+                    + [violation.message(engine.values) for violation in violations],
+                )
+            )
+            spinbox.setToolTip(flagged_tool_tip)
+            flagged[key] = (base_tool_tip, flagged_tool_tip)
+        elif key in flagged:
+            # Only the violation style goes, e.g. remote changes stay yellow
+            spinbox.setStyleSheet(
+                ";".join(
+                    style
+                    for style in spinbox.styleSheet().split(";")
+                    if style and style != VIOLATION_STYLE_SHEET
+                )
+            )
+            spinbox.setToolTip(base_tool_tip)
+            del flagged[key]
+
+    def refresh_submit():
+        introduced = engine.introduced()
+        submit_button.setEnabled(bool(change_set) and not introduced)
+        submit_button.setToolTip(
+            "\n".join(violation.message(engine.values) for violation in introduced)
+        )
+
+    def value_changed(key, value):
+        keys = {key}
+        for constraint in engine.update(key, value):
+            keys.update(constraint.keys)
+            if isinstance(constraint.bound, str):
+                keys.add(constraint.bound)
+
+        for affected_key in keys & spinboxes_by_key.keys():
+            flag(affected_key)
+        refresh_submit()
+
+    def rebased():
+        engine.set_baseline(change_set.current_values)
+        refresh_submit()
+
+    for key in spinboxes_by_key:
+        flag(key)
+
+    change_set.listeners.append(value_changed)
+    refresh_submit()
+
+    return rebased
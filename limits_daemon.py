@@ -0,0 +1,664 @@
+#!/usr/bin/python3
+
+"""
+Optional local daemon of the Farm UI. It keeps the limits of every farm
+parsed and classified in memory, together with what the Tractor engine last
+reported, and serves the windows and the command line over a Unix domain
+socket. The windows get their table already scanned and classified from it
+instead of reading the file, staging and committing go through it one at a
+time per farm, so admins working at the same time never write 'temp.config'
+or '.config' over each other.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+The socket is SOCKET_PATH, or LIMITS_SOCKET when it is set. Without a daemon
+listening the windows do everything themselves, as they always did.
+
+Protocol, one JSON object per line in both directions, as many requests as
+wanted per connection:
+
+    -> {"op": "keys", "farm": "linuxfarm", "show": "pwp"}
+    <- {"ok": true, "result": [["pwp_katana", 40], ["pwp_maya", 30]]}
+    <- {"ok": false, "error": "Unknown farm: 'site_c'"}
+
+A request that isn't a JSON object, or whose fields don't fit its operation,
+is answered with an error too and the connection stays open.
+
+Usage:
+    limits_daemon.py serve [--socket PATH]
+    limits_daemon.py ping
+    limits_daemon.py get [--farm NAME] [--live] KEY [KEY ...]
+    limits_daemon.py keys [--farm NAME] (--applications | --show NAME | --shares)
+    limits_daemon.py stage [--farm NAME] KEY=VALUE [KEY=VALUE ...]
+    limits_daemon.py commit [--farm NAME] [--also NAME ...] [KEY=VALUE ...]
+    limits_daemon.py discard [--farm NAME]
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+
+import limits_config
+import limits_farms
+import limits_merge
+import limits_table
+import limits_tracing
+from limits_tracing import LOGGER, span
+
+SOCKET_PATH = "/tmp/limits_daemon.sock"
+# Admins sharing the group of the daemon can use it
+SOCKET_MODE = 0o660
+
+# Seconds the limits reported by an engine are served before asking again
+ENGINE_CACHE_SECONDS = 5
+
+# Seconds a client waits for an answer, commits wait for every reload
+CLIENT_TIMEOUT = 600
+
+
+class DaemonError(RuntimeError):
+    """Raised by LimitsClient when the daemon answers with an error."""
+
+
+def socket_path():
+    """Returns the path of the socket of the daemon.
+
+    Returns:
+        str: Path of the socket.
+    """
+
+    return os.environ.get("LIMITS_SOCKET") or SOCKET_PATH
+
+
+class LimitsDaemon:
+    """State shared by every connection of the daemon.
+
+    Args:
+        farms (OrderedDict): LimitFarm per name, defaults to
+        limits_farms.load_farms().
+
+    Attributes:
+        farms (OrderedDict): Farms served.
+        locks (dict): Lock per farm name, held while staging or committing.
+        engine_limits (dict): (time, limits) last reported per farm name.
+
+    Methods:
+        handle(request): Answers one request.
+        op_<op>(**fields): Answers the requests of every operation.
+    """
+
+    def __init__(self, farms=None):
+        """Loads the limits of every farm so the first clients don't wait."""
+
+        self.farms = farms if farms is not None else limits_farms.load_farms()
+        self.locks = {name: threading.Lock() for name in self.farms}
+        self.engine_limits = {}
+
+        for farm in self.farms.values():
+            try:
+                limits_table.load_session_table(
+                    farm.config_file_path_name, farm.temp_folder
+                )
+            except (OSError, ValueError) as error:
+                LOGGER.warning("Could not load %s yet: %s", farm.name, error)
+
+    def handle(self, request):
+        """Answers one request.
+
+        Parameters:
+            request (dict): The request, with its operation as 'op'.
+
+        Returns:
+            dict: The answer, see the module documentation.
+        """
+
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "Bad request: not a JSON object"}
+
+        operation = getattr(self, f"op_{request.get('op')}", None)
+        if operation is None:
+            return {"ok": False, "error": f"Unknown operation: {request.get('op')!r}"}
+
+        fields = {key: value for key, value in request.items() if key != "op"}
+
+        try:
+            with span(f"daemon.{request['op']}"):
+                return {"ok": True, "result": operation(**fields)}
+        except KeyError as error:
+            return {"ok": False, "error": f"Unknown key: {error}"}
+        except TypeError as error:
+            # Missing or unexpected fields, or operands of the wrong type
+            LOGGER.debug("'%s' failed", request["op"], exc_info=True)
+            return {"ok": False, "error": f"Bad request: {error}"}
+        except Exception as error:
+            LOGGER.exception("'%s' failed", request["op"])
+            return {"ok": False, "error": str(error)}
+
+    def farm(self, name=None):
+        """Returns a farm by name, the first one without a name."""
+
+        if name is None:
+            return next(iter(self.farms.values()))
+        if name not in self.farms:
+            raise ValueError(f"Unknown farm: {name!r}")
+
+        return self.farms[name]
+
+    def table(self, farm):
+        """Returns the limits of the session of a farm, read again only when
+        its files changed."""
+
+        return limits_table.load_session_table(
+            farm.config_file_path_name, farm.temp_folder
+        )
+
+    def op_table(self, farm=None):
+        """Returns the limits of the session already scanned, see
+        LimitsTable.to_state(), with the path, modification time and size of
+        the file they were read from."""
+
+        farm = self.farm(farm)
+        path = os.path.realpath(
+            limits_table.session_file_path(farm.config_file_path_name, farm.temp_folder)
+        )
+        # Taken before reading, a change made meanwhile is read again
+        status = os.stat(path)
+
+        return {
+            "path": path,
+            "modified_time": status.st_mtime_ns,
+            "size": status.st_size,
+            "state": limits_table.load_table(path).to_state(),
+        }
+
+    def op_ping(self):
+        """Returns the process and the farms of the daemon."""
+
+        return {"pid": os.getpid(), "farms": list(self.farms)}
+
+    def op_get(self, keys, farm=None, live=False):
+        """Returns the value per key, as staged or as live in the engine."""
+
+        farm = self.farm(farm)
+
+        if live:
+            engine_dict = self.op_engine(farm.name)
+            return {
+                key: limits_config.get_limit_value(engine_dict, key) for key in keys
+            }
+
+        table = self.table(farm)
+        return {key: table.value(key) for key in keys}
+
+    def op_keys(self, farm=None, applications=False, show=None, shares=False):
+        """Returns [key, value] of the keys of a window, [show, key, weight]
+        for the Shares, or of every key."""
+
+        table = self.table(self.farm(farm))
+
+        if shares:
+            return [
+                [show, key, table.value(key)]
+                for show, key in table.share_keys().items()
+            ]
+        if show is not None:
+            keys = table.show_keys(show)
+        elif applications:
+            keys = table.application_keys()
+        else:
+            keys = list(table.positions)
+
+        return [[key, table.value(key)] for key in keys]
+
+    def op_shows(self, farm=None):
+        """Returns the names of the shows."""
+
+        return list(self.table(self.farm(farm)).shows)
+
+    def op_engine(self, farm=None):
+        """Returns the limits live in the engine, asked again only after
+        ENGINE_CACHE_SECONDS."""
+
+        farm = self.farm(farm)
+        fetched = self.engine_limits.get(farm.name)
+
+        if fetched is None or time.monotonic() - fetched[0] > ENGINE_CACHE_SECONDS:
+            fetched = (
+                time.monotonic(),
+                limits_config.fetch_engine_limits(farm.engine_url),
+            )
+            self.engine_limits[farm.name] = fetched
+
+        return fetched[1]
+
+    def op_stage(self, values, farm=None):
+        """Stages new values and returns the ones that changed."""
+
+        farm = self.farm(farm)
+
+        with self.locks[farm.name]:
+            # On top of whatever is staged already, so changes staged by other
+            # admins meanwhile are kept
+            table = self.table(farm)
+            changed = limits_config.apply_values(table, values)
+            limits_config.stage_config(table, farm.temp_folder)
+
+        return changed
+
+    def op_discard(self, farm=None):
+        """Discards the staged values."""
+
+        farm = self.farm(farm)
+
+        with self.locks[farm.name]:
+            limits_config.discard_staged(farm.temp_folder)
+
+    def op_commit(self, values, farm=None, also=(), source="ui"):
+        """Writes the staged values (or the given ones when nothing is staged)
+        to the farm and the same values to the other farms, see
+        limits_farms.commit_farms()."""
+
+        farm = self.farm(farm)
+        farms = [farm] + [self.farm(name) for name in also if name != farm.name]
+
+        # Always taken in the same order, so two commits never deadlock
+        with ExitStack() as stack:
+            for name in sorted(other.name for other in farms):
+                stack.enter_context(self.locks[name])
+
+            staged_file_name = f"{farm.temp_folder}{limits_config.TEMP_FILE_NAME}"
+            staged_contents = {}
+            if os.path.exists(staged_file_name):
+                staged = limits_table.load_table(staged_file_name)
+                staged_contents[farm.name] = staged
+
+                # The other farms get the values staged for this one
+                if not values:
+                    base = limits_merge.load_base(farm.temp_folder)
+                    base = base or limits_table.LimitsTable(staged.text)
+                    values = {
+                        key: new
+                        for key, (_, new) in base.changed_values(staged).items()
+                    }
+
+            results = limits_farms.commit_farms(farms, values, staged_contents, source)
+
+            if staged_contents and results[farm.name]["error"] is None:
+                limits_config.discard_staged(farm.temp_folder)
+
+        for name in results:
+            self.engine_limits.pop(name, None)
+
+        return OrderedDict(
+            (name, _result_to_json(result)) for name, result in results.items()
+        )
+
+
+def _result_to_json(result):
+    """Returns the outcome of a farm, see limits_farms.commit_farm(), as it is
+    sent to the clients."""
+
+    return dict(
+        result,
+        conflicts=[str(conflict) for conflict in result["conflicts"]],
+        error=None if result["error"] is None else str(result["error"]),
+    )
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers every request line of one connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                reply = {"ok": False, "error": f"Bad request: {error}"}
+            else:
+                reply = self.server.daemon.handle(request)
+
+            self.wfile.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+            self.wfile.flush()
+
+
+class _DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path=None, daemon=None):
+    """Serves the farms on the socket until interrupted.
+
+    Parameters:
+        path (str): Path of the socket, defaults to socket_path().
+        daemon (LimitsDaemon): State to serve, a new one by default.
+
+    Returns:
+        None
+    """
+
+    path = path or socket_path()
+
+    if os.path.exists(path):
+        if LimitsClient.connect(path) is not None:
+            raise RuntimeError(f"A daemon is already listening on {path}")
+        # Left behind by a daemon that didn't stop cleanly
+        os.remove(path)
+
+    server = _DaemonServer(path, _RequestHandler)
+    os.chmod(path, SOCKET_MODE)
+    server.daemon = daemon or LimitsDaemon()
+    LOGGER.info("Serving %s on %s", ", ".join(server.daemon.farms), path)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+class LimitsClient:
+    """Connection to the daemon.
+
+    Args:
+        connection (socket): Connected Unix socket.
+
+    Methods:
+        connect(path): Connects to the daemon if it is running.
+        request(op, **fields): Sends a request and returns its result.
+        close(): Closes the connection.
+    """
+
+    def __init__(self, connection):
+        """Wraps a connected socket."""
+
+        self.connection = connection
+        self.reader = connection.makefile("rb")
+        self.lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, path=None):
+        """Connects to the daemon.
+
+        Parameters:
+            path (str): Path of the socket, defaults to socket_path().
+
+        Returns:
+            LimitsClient: The client, or None if no daemon is listening.
+        """
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(CLIENT_TIMEOUT)
+
+        try:
+            connection.connect(path or socket_path())
+        except OSError:
+            connection.close()
+            return None
+
+        return cls(connection)
+
+    def request(self, op, **fields):
+        """Sends a request and waits for its answer.
+
+        Parameters:
+            op (str): Operation, see the op_* methods of LimitsDaemon.
+            **fields: Arguments of the operation.
+
+        Returns:
+            object: Result of the operation.
+
+        Raises:
+            DaemonError: If the daemon answered with an error.
+            OSError: If the daemon went away.
+        """
+
+        line = json.dumps(dict(fields, op=op), separators=(",", ":")).encode()
+
+        with self.lock:
+            self.connection.sendall(line + b"\n")
+            reply = self.reader.readline()
+
+        if not reply:
+            raise ConnectionError("The daemon closed the connection")
+
+        reply = json.loads(reply)
+        if not reply["ok"]:
+            raise DaemonError(reply["error"])
+
+        return reply["result"]
+
+    def close(self):
+        """Closes the connection."""
+
+        self.reader.close()
+        self.connection.close()
+
+
+def _daemon_farm(config_file_path_name):
+    """Returns a client and the name of the farm of a configuration file when
+    a daemon is running, (None, None) otherwise."""
+
+    farm = limits_farms.farm_for_config(config_file_path_name)
+    if farm is None:
+        return None, None
+
+    return LimitsClient.connect(), farm.name
+
+
+def load_session_table(config_file_path_name, temp_folder):
+    """Returns the limits of the session, see
+    limits_table.load_session_table(). When the daemon is running and the
+    table isn't loaded in this process yet, the daemon sends the table it
+    keeps in memory instead of this process reading and scanning the file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+
+    Returns:
+        LimitsTable: The table.
+    """
+
+    def from_daemon(path):
+        client, farm_name = _daemon_farm(config_file_path_name)
+        if client is None:
+            return None
+
+        try:
+            loaded = client.request("table", farm=farm_name)
+        except (OSError, DaemonError) as error:
+            LOGGER.warning("Could not get the limits from the daemon: %s", error)
+            return None
+        finally:
+            client.close()
+
+        # Staged or written meanwhile, the file is read here instead
+        if loaded["path"] != path:
+            return None
+
+        return (
+            loaded["modified_time"],
+            loaded["size"],
+            limits_table.LimitsTable.from_state(loaded["state"]),
+        )
+
+    return limits_table.load_session_table(
+        config_file_path_name, temp_folder, from_daemon
+    )
+
+
+def stage(contents_dict, new_values, config_file_path_name, temp_folder):
+    """Stages new values through the daemon when it is running, otherwise
+    stages the contents of the window as they are.
+
+    Parameters:
+        contents_dict (LimitsTable): Limits of the window, already changed.
+        new_values (dict): New value per limit key.
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+
+    Returns:
+        None
+    """
+
+    client, farm_name = _daemon_farm(config_file_path_name)
+
+    if client is not None:
+        try:
+            client.request("stage", farm=farm_name, values=new_values)
+            return
+        except OSError as error:
+            LOGGER.warning("The daemon went away, staging locally: %s", error)
+        finally:
+            client.close()
+
+    limits_config.stage_config(contents_dict, temp_folder)
+
+
+def commit(farms, new_values, staged_contents, temp_folder):
+    """Commits through the daemon when it is running, otherwise with
+    limits_farms.commit_farms() in this process. The staged file of the first
+    farm is discarded once it was written.
+
+    Parameters:
+        farms (list): LimitFarm to write to, the staged one first.
+        new_values (dict): New value per limit key.
+        staged_contents (dict): Staged contents per farm name.
+        temp_folder (str): Path to the temporary folder of the first farm.
+
+    Returns:
+        OrderedDict: Outcome per farm name, see limits_farms.commit_farms().
+    """
+
+    client, farm_name = _daemon_farm(farms[0].config_file_path_name)
+
+    if client is not None:
+        try:
+            return client.request(
+                "commit",
+                farm=farm_name,
+                also=[farm.name for farm in farms[1:]],
+                values=new_values,
+            )
+        except OSError as error:
+            LOGGER.warning("The daemon went away, committing locally: %s", error)
+        finally:
+            client.close()
+
+    results = limits_farms.commit_farms(farms, new_values, staged_contents)
+
+    if results[farms[0].name]["error"] is None:
+        limits_config.discard_staged(temp_folder)
+
+    return results
+
+
+def _parse_values(assignments):
+    """Returns the values of 'KEY=VALUE' arguments."""
+
+    values = OrderedDict()
+    for assignment in assignments:
+        key, _, value = assignment.partition("=")
+        values[key] = int(value)
+
+    return values
+
+
+def main(argv=None):
+    """Parses the command line and serves, or sends one request.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--socket", default=None, help="path of the socket")
+    parser.add_argument(
+        "--farm", default=None, help="farm to use, the first one by default"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("serve", help="start the daemon")
+    commands.add_parser("ping", help="check the daemon is running")
+    get_parser = commands.add_parser("get", help="print values")
+    get_parser.add_argument("keys", nargs="+")
+    get_parser.add_argument("--live", action="store_true", help="ask the engine")
+    keys_parser = commands.add_parser("keys", help="print keys and values")
+    keys_group = keys_parser.add_mutually_exclusive_group()
+    keys_group.add_argument("--applications", action="store_true")
+    keys_group.add_argument("--show", default=None)
+    keys_group.add_argument("--shares", action="store_true")
+    stage_parser = commands.add_parser("stage", help="stage new values")
+    stage_parser.add_argument("values", nargs="+", metavar="KEY=VALUE")
+    commit_parser = commands.add_parser("commit", help="write the staged values")
+    commit_parser.add_argument("values", nargs="*", metavar="KEY=VALUE")
+    commit_parser.add_argument("--also", nargs="*", default=[], help="other farms")
+    commands.add_parser("discard", help="discard the staged values")
+    args = parser.parse_args(argv)
+
+    limits_tracing.configure()
+
+    if args.command == "serve":
+        # Stopped by the service manager the same way as with Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            serve(args.socket)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    client = LimitsClient.connect(args.socket)
+    if client is None:
+        LOGGER.error("No daemon is listening on %s", args.socket or socket_path())
+        return 1
+
+    fields = {"farm": args.farm}
+    if args.command == "get":
+        fields.update(keys=args.keys, live=args.live)
+    elif args.command == "keys":
+        fields.update(
+            applications=args.applications, show=args.show, shares=args.shares
+        )
+    elif args.command == "stage":
+        fields.update(values=_parse_values(args.values))
+    elif args.command == "commit":
+        fields.update(values=_parse_values(args.values), also=args.also, source="cli")
+    elif args.command == "ping":
+        fields = {}
+
+    try:
+        result = client.request(args.command, **fields)
+    except DaemonError as error:
+        LOGGER.error("%s", error)
+        return 1
+    finally:
+        client.close()
+
+    if args.command == "commit":
+        return 0 if limits_farms.log_results(result) else 1
+
+    if isinstance(result, list):
+        for row in result:
+            print("\t".join(map(str, row)))
+    elif result is not None:
+        print(json.dumps(result, indent=4))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
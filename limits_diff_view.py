@@ -0,0 +1,252 @@
+#!/usr/bin/python3
+
+"""
+Side by side diff view of limit changes used by the Changes Confirmation
+window of the Farm UI. Only the modified keys are listed with their old
+value, new value and delta. The rows are built in one pass and displayed
+through a model/view table. Sorting and filtering are done on the plain
+rows of the model instead of through Qt, so thousands of them can be sorted
+and filtered instantly.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+from qtpy import QtCore, QtGui, QtWidgets
+
+# Colors used for the deltas (same as the rest of the UI)
+INCREASE_COLOR = "#A7F432"
+DECREASE_COLOR = "#D21404"
+
+
+def build_diff_rows(old_values, new_values):
+    """Builds the rows of the diff in one pass, skipping unchanged keys.
+
+    Parameters:
+        old_values (dict): Old value per limit key.
+        new_values (dict): New value per limit key.
+
+    Returns:
+        list: (key, old, new, delta) tuples sorted by key.
+    """
+
+    rows = []
+
+    for key, new in new_values.items():
+        old = old_values.get(key)
+        if old == new:
+            continue
+        delta = new - old if old is not None else None
+        rows.append((key, old, new, delta))
+
+    rows.sort()
+    return rows
+
+
+class LimitsDiffModel(QtCore.QAbstractTableModel):
+    """Read-only table model holding the rows of a limits diff.
+
+    Args:
+        rows (list): (key, old, new, delta) tuples as built by build_diff_rows().
+        parent (QObject): Parent of the model.
+
+    Attributes:
+        all_rows (list): Every row of the diff.
+        rows (list): Rows currently displayed, after filtering and sorting.
+        filter_text (str): Case-folded text the keys are filtered with.
+    """
+
+    HEADERS = ("Key", "Before", "After", "Delta")
+
+    def __init__(self, rows, parent=None):
+        """Initializes the model with the rows of the diff."""
+
+        super().__init__(parent)
+
+        self.all_rows = rows
+        self.rows = list(rows)
+        self.filter_text = ""
+        self.sort_column = 0
+        self.sort_order = QtCore.Qt.AscendingOrder
+        self.increase_brush = QtGui.QBrush(QtGui.QColor(INCREASE_COLOR))
+        self.decrease_brush = QtGui.QBrush(QtGui.QColor(DECREASE_COLOR))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """Returns the amount of changed keys."""
+
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        """Returns the amount of columns of the diff."""
+
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        """Returns the titles of the columns."""
+
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """Returns the text, sort value, color or alignment of a cell."""
+
+        if not index.isValid():
+            return None
+
+        row = self.rows[index.row()]
+        column = index.column()
+        value = row[column]
+
+        if role == QtCore.Qt.DisplayRole:
+            if column == 0:
+                return value
+            if value is None:
+                return "-"
+            if column == 3:
+                return f"{value:+d}"
+            return str(value)
+
+        if role == QtCore.Qt.ForegroundRole and column == 3 and value:
+            return self.increase_brush if value > 0 else self.decrease_brush
+
+        if role == QtCore.Qt.TextAlignmentRole and column:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+
+        return None
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        """Sorts the displayed rows by one of the columns."""
+
+        self.sort_column = column
+        self.sort_order = order
+
+        self.layoutAboutToBeChanged.emit()
+        self.rows.sort(
+            key=lambda row: (row[column] is not None, row[column] or 0, row[0])
+            if column
+            else row[0],
+            reverse=order == QtCore.Qt.DescendingOrder,
+        )
+        self.layoutChanged.emit()
+
+    def set_rows(self, rows):
+        """Replaces the rows of the diff, keeping the filter and the sorting.
+
+        Parameters:
+            rows (list): (key, old, new, delta) tuples as built by
+            build_diff_rows().
+
+        Returns:
+            None
+        """
+
+        self.all_rows = rows
+        self.set_filter(self.filter_text)
+
+    def set_filter(self, text):
+        """Only displays the keys containing the given text.
+
+        Parameters:
+            text (str): Text to look for, case insensitive.
+
+        Returns:
+            None
+        """
+
+        self.filter_text = text.casefold()
+
+        self.beginResetModel()
+        if self.filter_text:
+            self.rows = [
+                row for row in self.all_rows if self.filter_text in row[0].casefold()
+            ]
+        else:
+            self.rows = list(self.all_rows)
+        self.endResetModel()
+
+        self.sort(self.sort_column, self.sort_order)
+
+
+class LimitsDiffView(QtWidgets.QWidget):
+    """Widget with a filter field on top of a sortable table showing a
+    limits diff.
+
+    Args:
+        old_values (dict): Old value per limit key.
+        new_values (dict): New value per limit key.
+        font (QFont): Font used by the filter field and the table.
+        parent (QWidget): Parent of the widget.
+
+    Attributes:
+        model (LimitsDiffModel): Model holding the rows of the diff.
+        filter_line_edit (QLineEdit): Text used to filter the keys.
+        table_view (QTableView): Table displaying the rows.
+    """
+
+    def __init__(self, old_values, new_values, font, parent=None):
+        """Builds the rows of the diff and creates the filter field and table."""
+
+        super().__init__(parent)
+
+        self.model = LimitsDiffModel(build_diff_rows(old_values, new_values), self)
+
+        self.filter_line_edit = QtWidgets.QLineEdit(self)
+        self.filter_line_edit.setFont(font)
+        self.filter_line_edit.setPlaceholderText(
+            f"Filter {len(self.model.rows)} changed keys..."
+        )
+        self.filter_line_edit.setClearButtonEnabled(True)
+        self.filter_line_edit.textChanged.connect(self.model.set_filter)
+
+        self.table_view = QtWidgets.QTableView(self)
+        self.table_view.setFont(font)
+        self.table_view.setModel(self.model)
+        # The rows already come sorted by key
+        self.table_view.horizontalHeader().setSortIndicator(
+            0, QtCore.Qt.AscendingOrder
+        )
+        self.table_view.setSortingEnabled(True)
+        self.table_view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table_view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table_view.setAlternatingRowColors(True)
+        self.table_view.setWordWrap(False)
+
+        # Fixed sizes so Qt never has to measure every row
+        vertical_header = self.table_view.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(22)
+
+        horizontal_header = self.table_view.horizontalHeader()
+        horizontal_header.setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        horizontal_header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        for column in range(1, len(LimitsDiffModel.HEADERS)):
+            horizontal_header.resizeSection(column, 70)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.filter_line_edit)
+        layout.addWidget(self.table_view)
+
+    def set_values(self, old_values, new_values):
+        """Displays the diff of other values, e.g. a preview computed again.
+
+        Parameters:
+            old_values (dict): Old value per limit key.
+            new_values (dict): New value per limit key.
+
+        Returns:
+            None
+        """
+
+        self.model.set_rows(build_diff_rows(old_values, new_values))
+        self.filter_line_edit.setPlaceholderText(
+            f"Filter {len(self.model.all_rows)} changed keys..."
+        )
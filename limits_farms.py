@@ -0,0 +1,406 @@
+#!/usr/bin/python3
+
+"""
+Farms managed by the Farm UI. Every farm has its own '.config' file, temp
+and backup folders, Tractor engine and reload script, so one session can edit
+any of them (separate sites, the Windows farm, ...) and push a change to
+several engines at once.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+The farms are read from FARMS_FILE, or LIMITS_FARMS_FILE when it is set. The
+first farm is the one selected when the UI starts. Without the file the UI
+manages the single farm it always did.
+
+Example of a 'limits_farms.config' file:
+
+    {
+        "Farms": {
+            "linuxfarm": {
+                "config": "/sw/tractor/config/limits.config",
+                "temp": "/sw/tractor/config/tmp/",
+                "backup": "/sw/tractor/config/limits_backup/",
+                "engine": "http://tractor-engine/Tractor/queue?q=limits",
+                "reload": "/bin/bash /sw/pipeline/.../reloadconfig_bash.sh"
+            },
+            "site_b": {
+                "config": "/net/site_b/tractor/config/limits.config",
+                "temp": "/net/site_b/tractor/config/tmp/",
+                "backup": "/net/site_b/tractor/config/limits_backup/",
+                "engine": "http://site-b-engine/Tractor/queue?q=limits",
+                "reload": "ssh site-b-engine /sw/.../reloadconfig_bash.sh"
+            }
+        }
+    }
+
+'engine' and 'reload' default to limits_config.ENGINE_LIMITS_URL and
+limits_config.RELOAD_COMMAND.
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+import limits_config
+from limits_tracing import LOGGER, span
+
+FARMS_FILE = "/sw/tractor/config/limits_farms.config"
+
+# Farm managed when there is no farms file
+DEFAULT_FARM_NAME = "linuxfarm"
+DEFAULT_CONFIG_FILE = "/sw/tractor/config/limits.config"
+DEFAULT_TEMP_FOLDER = "/sw/tractor/config/tmp/"
+DEFAULT_BACKUP_FOLDER = "/sw/tractor/config/limits_backup/"
+
+# Farms committed to at the same time
+MAX_PARALLEL_FARMS = 8
+
+# Farm selected in the main window, kept for the whole session
+_session = {"farm": None}
+
+
+class LimitFarm:
+    """A farm with its own configuration file and Tractor engine.
+
+    Args:
+        name (str): Name of the farm shown to the user.
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+        backup_folder (str): Path to the backup folder.
+        engine_url (str): Website containing the live '.config' file info,
+        None for limits_config.ENGINE_LIMITS_URL.
+        reload_command (str): Shell command that reloads the config, None for
+        limits_config.RELOAD_COMMAND.
+    """
+
+    __slots__ = (
+        "name",
+        "config_file_path_name",
+        "temp_folder",
+        "backup_folder",
+        "engine_url",
+        "reload_command",
+    )
+
+    def __init__(
+        self,
+        name,
+        config_file_path_name,
+        temp_folder,
+        backup_folder,
+        engine_url=None,
+        reload_command=None,
+    ):
+        """Stores the settings of the farm."""
+
+        self.name = name
+        self.config_file_path_name = config_file_path_name
+        self.temp_folder = temp_folder
+        self.backup_folder = backup_folder
+        self.engine_url = engine_url
+        self.reload_command = reload_command
+
+    def folders(self):
+        """Returns the paths every window is opened with.
+
+        Returns:
+            tuple: (config_file_path_name, temp_folder, backup_folder)
+        """
+
+        return self.config_file_path_name, self.temp_folder, self.backup_folder
+
+
+def farms_file_path():
+    """Returns the path of the farms file.
+
+    Returns:
+        str: Path to the farms file.
+    """
+
+    return os.environ.get("LIMITS_FARMS_FILE") or FARMS_FILE
+
+
+def load_farms(farms_path=None):
+    """Reads every farm of the farms file.
+
+    Parameters:
+        farms_path (str): Path to the farms file, see farms_file_path().
+
+    Returns:
+        OrderedDict: LimitFarm per name, only the default farm when there is
+        no farms file.
+    """
+
+    farms_path = farms_path or farms_file_path()
+    farms = OrderedDict()
+
+    if not os.path.exists(farms_path):
+        farms[DEFAULT_FARM_NAME] = LimitFarm(
+            DEFAULT_FARM_NAME,
+            DEFAULT_CONFIG_FILE,
+            DEFAULT_TEMP_FOLDER,
+            DEFAULT_BACKUP_FOLDER,
+        )
+        return farms
+
+    with open(farms_path, "r") as i:
+        farms_dict = json.load(i, object_pairs_hook=OrderedDict)
+
+    for name, settings in farms_dict.get("Farms", {}).items():
+        farms[name] = LimitFarm(
+            name,
+            settings["config"],
+            settings["temp"],
+            settings["backup"],
+            settings.get("engine"),
+            settings.get("reload"),
+        )
+
+    return farms
+
+
+def selected_farm(farms=None):
+    """Returns the farm selected for this session, the first one until
+    another one is selected.
+
+    Parameters:
+        farms (OrderedDict): Farms to choose from, defaults to load_farms().
+
+    Returns:
+        LimitFarm: The selected farm.
+
+    Raises:
+        KeyError: If the selected farm isn't one of the farms, e.g. a
+        misspelled --farm or a farm removed from the farms file.
+    """
+
+    farms = farms if farms is not None else load_farms()
+
+    name = _session["farm"]
+    if name is None:
+        return next(iter(farms.values()))
+    if name not in farms:
+        LOGGER.error("Unknown farm: %s", name)
+        raise KeyError(name)
+
+    return farms[name]
+
+
+def select_farm(name):
+    """Selects the farm every window of this session works on.
+
+    Parameters:
+        name (str): Name of the farm.
+
+    Returns:
+        None
+    """
+
+    _session["farm"] = name
+
+
+def farm_for_config(config_file_path_name, farms=None):
+    """Returns the farm a configuration file belongs to.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        farms (OrderedDict): Farms to search, defaults to load_farms().
+
+    Returns:
+        LimitFarm: The farm, or None if no farm uses that file.
+    """
+
+    farms = farms if farms is not None else load_farms()
+    real_path = os.path.realpath(config_file_path_name)
+
+    for farm in farms.values():
+        if os.path.realpath(farm.config_file_path_name) == real_path:
+            return farm
+
+    return None
+
+
+def commit_farm(farm, new_values, contents_dict=None, source="ui"):
+    """Writes new values to one farm, reloads its engine and verifies them.
+
+    Keys the farm doesn't have are skipped. Without contents_dict the values
+    are applied to the current configuration file of the farm and only the
+    ones that differ are written, as a profile would be applied. Staged
+    contents are merged with the current file first (see limits_merge), so
+    whatever changed on disk since the session read it is kept.
+
+    Parameters:
+        farm (LimitFarm): Farm to write to.
+        new_values (dict): New values per limit key.
+        contents_dict (dict): Contents to write as they are, e.g. the staged
+        LimitsTable of the session, instead of the current file.
+        source (str): What made the commit, as recorded in the audit log.
+
+    Returns:
+        dict: Outcome of the farm with 'changed', 'missing', 'conflicts',
+        'mismatches', 'reloads' and 'error'.
+    """
+
+    # Only needed to commit, the first window only needs the farms
+    import limits_merge
+    import limits_store
+    import limits_table
+
+    result = {
+        "changed": OrderedDict(),
+        "missing": [],
+        "conflicts": [],
+        "mismatches": OrderedDict(),
+        "reloads": 0,
+        "error": None,
+    }
+
+    with span("farm.commit", farm=farm.name, keys=len(new_values)) as fields:
+        current = limits_table.LimitsTable.from_file(farm.config_file_path_name)
+        values = OrderedDict()
+        for key, value in new_values.items():
+            if key in current:
+                values[key] = value
+            else:
+                result["missing"].append(key)
+        # Both the merge and apply_values() change current in place
+        old_values = current.values[:]
+
+        if contents_dict is None:
+            contents_dict = current
+            values = limits_config.apply_values(contents_dict, values)
+        elif not isinstance(contents_dict, dict):
+            contents_dict, values, result["conflicts"] = limits_merge.merge_config(
+                limits_merge.load_base(farm.temp_folder), contents_dict, current
+            )
+
+        result["changed"] = values
+        if not values:
+            return result
+
+        mismatches, reloads = limits_config.commit_config(
+            contents_dict,
+            values,
+            farm.config_file_path_name,
+            farm.backup_folder,
+            farm.engine_url,
+            farm.reload_command,
+            source,
+            farm.name,
+            {
+                key: (old_values[current.positions[key]], value)
+                for key, value in values.items()
+            },
+        )
+        result.update(mismatches=mismatches, reloads=reloads)
+        fields["reloads"] = reloads
+
+        limits_store.record_commit(farm.config_file_path_name, source)
+
+    return result
+
+
+def commit_farms(farms, new_values, staged_contents=None, source="ui"):
+    """Commits the same values to several farms at once. The write, reload
+    and verification of every farm run in parallel on a thread pool, so the
+    slowest engine sets the time taken instead of the sum of all of them.
+
+    Parameters:
+        farms (list): LimitFarm to write to.
+        new_values (dict): New values per limit key.
+        staged_contents (dict): Contents to write as they are per farm name,
+        see commit_farm().
+        source (str): What made the commit, as recorded in the audit log.
+
+    Returns:
+        OrderedDict: Outcome per farm name, see commit_farm(). A farm that
+        failed has its exception as 'error'.
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    staged_contents = staged_contents or {}
+    results = OrderedDict()
+
+    with ThreadPoolExecutor(
+        max_workers=max(min(len(farms), MAX_PARALLEL_FARMS), 1),
+        thread_name_prefix="farm",
+    ) as pool:
+        futures = [
+            (
+                farm,
+                pool.submit(
+                    commit_farm,
+                    farm,
+                    new_values,
+                    staged_contents.get(farm.name),
+                    source,
+                ),
+            )
+            for farm in farms
+        ]
+
+        for farm, future in futures:
+            try:
+                results[farm.name] = future.result()
+            except Exception as error:
+                LOGGER.exception("Committing to %s failed", farm.name)
+                results[farm.name] = {
+                    "changed": OrderedDict(),
+                    "missing": [],
+                    "conflicts": [],
+                    "mismatches": OrderedDict(),
+                    "reloads": 0,
+                    "error": error,
+                }
+
+    return results
+
+
+def log_results(results):
+    """Logs the outcome of every farm of a commit.
+
+    Parameters:
+        results (OrderedDict): Outcome per farm name, see commit_farms().
+
+    Returns:
+        bool: True if every farm has all its values live.
+    """
+
+    succeeded = True
+
+    for name, result in results.items():
+        if result["error"] is not None:
+            LOGGER.error("%s: failed, %s", name, result["error"])
+            succeeded = False
+            continue
+
+        if result["missing"]:
+            LOGGER.warning(
+                "%s: skipped keys it doesn't have: %s",
+                name,
+                ", ".join(result["missing"]),
+            )
+
+        for conflict in result["conflicts"]:
+            LOGGER.warning("%s: conflict, %s", name, conflict)
+
+        if not result["changed"]:
+            LOGGER.info("%s: nothing to change", name)
+            continue
+
+        LOGGER.info(
+            "%s: %d keys written, %d extra reloads",
+            name,
+            len(result["changed"]),
+            result["reloads"],
+        )
+        for key, (web_value, limit) in result["mismatches"].items():
+            LOGGER.warning("%s: %s %s %s", name, key, web_value, limit)
+        if result["mismatches"]:
+            succeeded = False
+
+    return succeeded
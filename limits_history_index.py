@@ -0,0 +1,609 @@
+#!/usr/bin/python3
+
+"""
+Columnar history of every limit key, built from the 'D<date>-T<time>.config'
+snapshots of the backup folder. Only new snapshots are scanned every time the
+index is updated and appended to a single memory-mappable file as a segment
+holding two compact arrays per key (int64 timestamps and int32 values, only
+when the value changed), so range queries never have to open any snapshot. A
+key missing from a snapshot gets a REMOVED point until it shows up again.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Layout of the index file:
+
+    b"LHIX" | version (uint32) | end of the last segment (uint64) |
+    segments, each one:
+        b"LHSG" | header length (uint32) | JSON header | padding to 8 bytes |
+        for every key: timestamps (int64 x count) + values (int32 x count),
+        padded to 8 bytes
+
+The JSON header of a segment holds the snapshots it indexed, the length of its
+data section and, for every key, the offset of its arrays inside it and how
+many points they have. Updates take a lock, append one segment and only then
+move the end in the file header, so readers never see a partial segment.
+Once there are MAX_SEGMENTS segments they are merged into one, written to a
+new file that replaces the old one atomically.
+
+Usage:
+    limits_history_index.py [--backup FOLDER] update
+    limits_history_index.py [--backup FOLDER] query KEY [--days N]
+"""
+
+import argparse
+import datetime
+import fcntl
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_right
+
+import limits_config
+import limits_constraints
+import limits_shares
+from limits_tracing import LOGGER, traced
+
+BACKUP_FOLDER = "/sw/tractor/config/limits_backup/"
+INDEX_FILE_NAME = "limits_history.idx"
+MAGIC = b"LHIX"
+VERSION = 2
+FILE_HEADER = struct.Struct("<4sIQ")
+SEGMENT_MAGIC = b"LHSG"
+MAX_SEGMENTS = 64
+# Value of the points where a key disappeared from the snapshots
+REMOVED = -(2**31)
+BACKUP_NAME_PATTERN = re.compile(r"^D(\d{4}-\d{2}-\d{2})-T(\d{6})\.config$")
+SPARK_CHARACTERS = "▁▂▃▄▅▆▇█"
+
+
+def index_file_path(backup_folder):
+    """Returns the path of the index file inside the backup folder.
+
+    Parameters:
+        backup_folder (str): Path to the backup folder.
+
+    Returns:
+        str: Path to the index file.
+    """
+
+    return os.path.join(backup_folder, INDEX_FILE_NAME)
+
+
+def backup_timestamp(file_name):
+    """Returns the time a backup was made from its file name.
+
+    Parameters:
+        file_name (str): Name of a backup file, e.g. 'D2024-05-01-T143000.config'.
+
+    Returns:
+        int: Seconds since the epoch, or None if it is not a backup file.
+    """
+
+    match = BACKUP_NAME_PATTERN.match(file_name)
+    if match is None:
+        return None
+
+    moment = datetime.datetime.strptime(
+        f"{match.group(1)} {match.group(2)}", "%Y-%m-%d %H%M%S"
+    )
+    return int(time.mktime(moment.timetuple()))
+
+
+def snapshot_values(contents_dict):
+    """Collects every value tracked by the history from a configuration.
+
+    Parameters:
+        contents_dict (dict): Contents of a configuration file.
+
+    Returns:
+        dict: Value per limit key, including the Shares weights.
+    """
+
+    values = dict(limits_constraints.limit_values(contents_dict))
+
+    try:
+        share_keys = limits_shares.share_keys(contents_dict)
+    except KeyError:
+        share_keys = {}
+
+    for key in share_keys.values():
+        value = limits_config.get_limit_value(contents_dict, key)
+        if isinstance(value, int):
+            values[key] = value
+
+    return values
+
+
+class LimitsHistoryIndex:
+    """Read access to the index file through a memory map, as it was when it
+    was opened.
+
+    Args:
+        index_path (str): Path to the index file.
+
+    Attributes:
+        files (list): Names of the snapshots already indexed.
+        keys (dict): (position, count) of the arrays of every key in every
+        segment holding points of it.
+        segment_count (int): Segments in the file.
+
+    Methods:
+        arrays(key): Returns every point of a key.
+        last_value(key): Returns the last value indexed for a key.
+        query(key, start, end): Returns the points of a key within a time range.
+        value_at(key, moment): Returns the value a key had at a given time.
+        close(): Releases the memory map.
+    """
+
+    def __init__(self, index_path):
+        """Maps the index file and reads the header of every segment."""
+
+        self.index_file = open(index_path, "rb")
+        self.buffer = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, end = FILE_HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{index_path} is not a limits history index")
+
+        self.files = []
+        self.keys = {}
+        self.segment_count = 0
+
+        position = FILE_HEADER.size
+        while position < end:
+            if self.buffer[position : position + 4] != SEGMENT_MAGIC:
+                self.close()
+                raise ValueError(f"{index_path} has a damaged segment")
+
+            (header_length,) = struct.unpack_from("<I", self.buffer, position + 4)
+            header = json.loads(
+                self.buffer[position + 8 : position + 8 + header_length]
+            )
+            data_offset = position + _padded(8 + header_length)
+
+            self.files.extend(header["files"])
+            for key, (offset, count) in header["keys"].items():
+                self.keys.setdefault(key, []).append((data_offset + offset, count))
+
+            position = data_offset + header["length"]
+            self.segment_count += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def arrays(self, key):
+        """Returns the timestamps and values of a key, without copying them
+        when they are all in one segment.
+
+        Parameters:
+            key (str): Limit key.
+
+        Returns:
+            tuple: (timestamps, values) memoryviews, empty if the key is unknown.
+        """
+
+        parts = self.keys.get(key)
+        if not parts:
+            return memoryview(b"").cast("q"), memoryview(b"").cast("i")
+
+        view = memoryview(self.buffer)
+
+        if len(parts) == 1:
+            ((start, count),) = parts
+            timestamps = view[start : start + 8 * count].cast("q")
+            values = view[start + 8 * count : start + 12 * count].cast("i")
+            return timestamps, values
+
+        timestamps = array("q")
+        values = array("i")
+        for start, count in parts:
+            timestamps.frombytes(view[start : start + 8 * count])
+            values.frombytes(view[start + 8 * count : start + 12 * count])
+        view.release()
+
+        return memoryview(timestamps), memoryview(values)
+
+    def last_value(self, key):
+        """Returns the last value indexed for a key.
+
+        Parameters:
+            key (str): Limit key.
+
+        Returns:
+            int: The value, REMOVED if the key disappeared, None if unknown.
+        """
+
+        parts = self.keys.get(key)
+        if not parts:
+            return None
+
+        start, count = parts[-1]
+        (value,) = struct.unpack_from(
+            "<i", self.buffer, start + 8 * count + 4 * (count - 1)
+        )
+
+        return value
+
+    def query(self, key, start=None, end=None):
+        """Returns the points of a key within a time range. The value a key
+        had when the range starts is included as its first point.
+
+        Parameters:
+            key (str): Limit key.
+            start (int): First second of the range, since the epoch.
+            end (int): Last second of the range, since the epoch.
+
+        Returns:
+            tuple: (timestamps, values) memoryviews, REMOVED where the key
+            disappeared from the snapshots.
+        """
+
+        timestamps, values = self.arrays(key)
+
+        first = 0 if start is None else max(bisect_right(timestamps, start) - 1, 0)
+        last = len(timestamps) if end is None else bisect_right(timestamps, end)
+
+        return timestamps[first:last], values[first:last]
+
+    def value_at(self, key, moment):
+        """Returns the value a key had at a given time.
+
+        Parameters:
+            key (str): Limit key.
+            moment (int): Seconds since the epoch.
+
+        Returns:
+            int: The value, or None if the key had no value at that time.
+        """
+
+        timestamps, values = self.arrays(key)
+        position = bisect_right(timestamps, moment) - 1
+
+        if position < 0 or values[position] == REMOVED:
+            return None
+        return values[position]
+
+    def close(self):
+        """Releases the memory map.
+
+        Returns:
+            None
+        """
+
+        self.buffer.close()
+        self.index_file.close()
+
+
+def _padded(size):
+    """Rounds a size up to a multiple of 8 bytes."""
+
+    return (size + 7) & ~7
+
+
+def read_columns(index_path):
+    """Loads the whole index into growable arrays.
+
+    Parameters:
+        index_path (str): Path to the index file.
+
+    Returns:
+        tuple: (files, columns) where columns holds (timestamps, values) arrays
+        per key. Both are empty if there is no index yet.
+    """
+
+    if not os.path.exists(index_path):
+        return [], {}
+
+    columns = {}
+    with LimitsHistoryIndex(index_path) as index:
+        for key in index.keys:
+            timestamps, values = index.arrays(key)
+            columns[key] = (array("q", timestamps), array("i", values))
+            timestamps.release()
+            values.release()
+        files = list(index.files)
+
+    return files, columns
+
+
+def segment_bytes(files, columns):
+    """Returns one segment of the index file.
+
+    Parameters:
+        files (list): Names of the snapshots indexed by the segment.
+        columns (dict): (timestamps, values) arrays per key.
+
+    Returns:
+        bytes: The segment, its length a multiple of 8 bytes.
+    """
+
+    keys = {}
+    length = 0
+    for key in sorted(columns):
+        count = len(columns[key][0])
+        if count:
+            keys[key] = (length, count)
+            length += _padded(12 * count)
+
+    header = json.dumps({"files": files, "keys": keys, "length": length}).encode(
+        "utf-8"
+    )
+    header_end = 8 + len(header)
+
+    parts = [SEGMENT_MAGIC, struct.pack("<I", len(header)), header]
+    parts.append(b"\0" * (_padded(header_end) - header_end))
+    for key in keys:
+        timestamps, values = columns[key]
+        size = 12 * len(timestamps)
+        parts += [
+            timestamps.tobytes(),
+            values.tobytes(),
+            b"\0" * (_padded(size) - size),
+        ]
+
+    return b"".join(parts)
+
+
+def write_columns(index_path, files, columns):
+    """Writes the whole index as one segment, replacing the previous file
+    atomically so readers that already mapped it are not affected.
+
+    Parameters:
+        index_path (str): Path to the index file.
+        files (list): Names of the snapshots indexed.
+        columns (dict): (timestamps, values) arrays per key.
+
+    Returns:
+        None
+    """
+
+    segment = segment_bytes(files, columns)
+
+    descriptor, tmp_index_path = tempfile.mkstemp(
+        prefix=f"{INDEX_FILE_NAME}.", dir=os.path.dirname(index_path) or "."
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as index_file:
+            index_file.write(
+                FILE_HEADER.pack(MAGIC, VERSION, FILE_HEADER.size + len(segment))
+            )
+            index_file.write(segment)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.chmod(tmp_index_path, 0o644)
+        os.replace(tmp_index_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_index_path):
+            os.unlink(tmp_index_path)
+        raise
+
+
+def append_segment(index_path, files, columns):
+    """Appends one segment to the index, then moves the end in the header of
+    the file so readers only ever see whole segments.
+
+    Parameters:
+        index_path (str): Path to the index file.
+        files (list): Names of the snapshots indexed by the segment.
+        columns (dict): (timestamps, values) arrays per key.
+
+    Returns:
+        None
+    """
+
+    segment = segment_bytes(files, columns)
+
+    with open(index_path, "r+b") as index_file:
+        _, _, end = FILE_HEADER.unpack(index_file.read(FILE_HEADER.size))
+
+        # Anything after the end was left by an update that didn't finish
+        index_file.seek(end)
+        index_file.write(segment)
+        index_file.truncate()
+        index_file.flush()
+        os.fsync(index_file.fileno())
+
+        index_file.seek(0)
+        index_file.write(FILE_HEADER.pack(MAGIC, VERSION, end + len(segment)))
+        index_file.flush()
+        os.fsync(index_file.fileno())
+
+
+def scan_backups(backup_folder, backups, last_values):
+    """Reads snapshots and collects a point for every key whose value changed
+    since the previous one, and a REMOVED point for every key it lacks.
+
+    Parameters:
+        backup_folder (str): Path to the backup folder.
+        backups (list): (timestamp, file name) of the snapshots, oldest first.
+        last_values (dict): Last value indexed per key, updated in place.
+
+    Returns:
+        tuple: (files, columns) of the snapshots that could be read.
+    """
+
+    files = []
+    columns = {}
+
+    def add_point(key, moment, value):
+        timestamps, values = columns.setdefault(key, (array("q"), array("i")))
+        timestamps.append(moment)
+        values.append(value)
+        last_values[key] = value
+
+    for moment, file_name in backups:
+        try:
+            contents_dict = limits_config.read_config(
+                os.path.join(backup_folder, file_name)
+            )
+        except (OSError, ValueError):
+            LOGGER.warning("Skipping unreadable backup: %s", file_name)
+            continue
+
+        snapshot = snapshot_values(contents_dict)
+        for key, value in snapshot.items():
+            if last_values.get(key) != value:
+                add_point(key, moment, value)
+
+        for key, value in list(last_values.items()):
+            if value != REMOVED and key not in snapshot:
+                add_point(key, moment, REMOVED)
+
+        files.append(file_name)
+
+    return files, columns
+
+
+@traced("history.update")
+def update_index(backup_folder):
+    """Scans the snapshots of the backup folder that aren't indexed yet and
+    appends them to the index as one segment.
+
+    If a snapshot older than the last indexed one shows up the whole index is
+    rebuilt, and once there are MAX_SEGMENTS segments they are merged into
+    one; otherwise only the new snapshots are opened and nothing already in
+    the file is written again. Concurrent updates wait for each other.
+
+    Parameters:
+        backup_folder (str): Path to the backup folder.
+
+    Returns:
+        int: Amount of snapshots that were added.
+    """
+
+    index_path = index_file_path(backup_folder)
+
+    with open(f"{index_path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        files, last_values, segment_count = [], {}, 0
+        if os.path.exists(index_path):
+            try:
+                with LimitsHistoryIndex(index_path) as index:
+                    files = list(index.files)
+                    last_values = {key: index.last_value(key) for key in index.keys}
+                    segment_count = index.segment_count
+            except ValueError as error:
+                LOGGER.warning("Rebuilding the history index: %s", error)
+                segment_count = None
+
+        indexed = set(files)
+        new_backups = []
+        for file_name in os.listdir(backup_folder):
+            if file_name in indexed:
+                continue
+            moment = backup_timestamp(file_name)
+            if moment is not None:
+                new_backups.append((moment, file_name))
+
+        if not new_backups and segment_count is not None:
+            return 0
+
+        new_backups.sort()
+        last_indexed = max(
+            (backup_timestamp(file_name) for file_name in files), default=None
+        )
+        if segment_count is None or (
+            last_indexed is not None and new_backups[0][0] < last_indexed
+        ):
+            new_backups = sorted(
+                new_backups + [(backup_timestamp(name), name) for name in files]
+            )
+            new_files, columns = scan_backups(backup_folder, new_backups, {})
+            write_columns(index_path, new_files, columns)
+            return len(new_backups)
+
+        new_files, new_columns = scan_backups(backup_folder, new_backups, last_values)
+
+        if segment_count == 0:
+            write_columns(index_path, new_files, new_columns)
+        elif segment_count + 1 >= MAX_SEGMENTS:
+            files, columns = read_columns(index_path)
+            for key, (timestamps, values) in new_columns.items():
+                column = columns.setdefault(key, (array("q"), array("i")))
+                column[0].extend(timestamps)
+                column[1].extend(values)
+            write_columns(index_path, files + new_files, columns)
+        else:
+            append_segment(index_path, new_files, new_columns)
+
+    return len(new_backups)
+
+
+def sparkline(values):
+    """Draws values as a line of block characters.
+
+    Parameters:
+        values (sequence): Values to draw.
+
+    Returns:
+        str: One character per value.
+    """
+
+    values = [value for value in values if value != REMOVED]
+    if not values:
+        return ""
+
+    low = min(values)
+    spread = (max(values) - low) or 1
+    top = len(SPARK_CHARACTERS) - 1
+
+    return "".join(SPARK_CHARACTERS[(value - low) * top // spread] for value in values)
+
+
+def main(argv=None):
+    """Parses the command line and updates or queries the index.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backup", default=BACKUP_FOLDER)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("update", help="index the new backups")
+    query_parser = subparsers.add_parser("query", help="history of one key")
+    query_parser.add_argument("key")
+    query_parser.add_argument("--days", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    added = update_index(args.backup)
+
+    if args.command == "update":
+        print(f"{added} new backups indexed")
+        return 0
+
+    start = None
+    if args.days is not None:
+        start = int(time.time() - args.days * 86400)
+
+    with LimitsHistoryIndex(index_file_path(args.backup)) as index:
+        timestamps, values = index.query(args.key, start)
+        for moment, value in zip(timestamps, values):
+            value = "removed" if value == REMOVED else value
+            print(f"{datetime.datetime.fromtimestamp(moment):%Y-%m-%d %H:%M}  {value}")
+        print(sparkline(values))
+        timestamps.release()
+        values.release()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
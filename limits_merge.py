@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+
+"""
+Three-way merge of the Farm UI changes with the '.config' file as it is on
+disk when they are written. The windows stage their changes on top of the
+file as it was read when the session started (the base), but by the time the
+Write button is pressed someone else (or other tooling) may have written the
+file again. Writing the staged contents as they are would revert every one of
+those edits, so only what the session changed is applied to the current file.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+For every key:
+
+    - changed only by the session: the value of the session is written
+    - changed only on disk: the value on disk is kept
+    - changed the same way by both: nothing to write
+    - changed differently by both: a conflict, the value on disk is kept and
+      the conflict is reported
+
+The base is copied to 'base.config' in the temp folder by
+limits_config.stage_config() the first time the session stages anything, and
+removed together with 'temp.config'.
+"""
+
+import os
+from collections import OrderedDict
+
+import limits_config
+import limits_table
+from limits_tracing import span
+
+
+class MergeConflict:
+    """A key changed differently by the session and on disk.
+
+    Attributes:
+        key (str): Key of the limit.
+        base (int): Value when the session started.
+        ours (int): Value staged by the session.
+        theirs (int): Value on disk now, None if the key was removed.
+    """
+
+    __slots__ = ("key", "base", "ours", "theirs")
+
+    def __init__(self, key, base, ours, theirs):
+        self.key = key
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+
+    def __repr__(self):
+        return (
+            f"MergeConflict({self.key!r}, base={self.base!r}, "
+            f"ours={self.ours!r}, theirs={self.theirs!r})"
+        )
+
+    def __str__(self):
+        if self.theirs is None:
+            return (
+                f"{self.key} was removed on disk, "
+                f"your value {self.ours} was not written"
+            )
+
+        return (
+            f"{self.key} was changed from {self.base} to {self.theirs} on disk, "
+            f"your value {self.ours} was not written"
+        )
+
+
+def load_base(temp_folder):
+    """Reads the base of the session.
+
+    Parameters:
+        temp_folder (str): Path to the temporary folder.
+
+    Returns:
+        LimitsTable: The base, or None if the session has none.
+    """
+
+    base_file_name = f"{temp_folder}{limits_config.BASE_FILE_NAME}"
+
+    if not os.path.exists(base_file_name):
+        return None
+
+    return limits_table.LimitsTable.from_file(base_file_name)
+
+
+def merge_tables(base, ours, theirs):
+    """Applies the values the session changed to the current file.
+
+    Only the values are compared, one array lookup per key, and theirs keeps
+    its own text, so every other edit made on disk (order, other settings,
+    new keys) is kept as it is.
+
+    Parameters:
+        base (LimitsTable): The file the session started from.
+        ours (LimitsTable): The limits staged by the session.
+        theirs (LimitsTable): The file on disk now, changed in place.
+
+    Returns:
+        tuple: (theirs, applied, conflicts) with the values written into
+        theirs per key and a MergeConflict per key that could not be merged.
+    """
+
+    applied = OrderedDict()
+    conflicts = []
+
+    for key, (base_value, our_value) in base.changed_values(ours).items():
+        if key not in theirs:
+            conflicts.append(MergeConflict(key, base_value, our_value, None))
+            continue
+
+        their_value = theirs.value(key)
+        if their_value == our_value:
+            continue
+
+        if their_value == base_value:
+            theirs.set_value(key, our_value)
+            applied[key] = our_value
+        else:
+            conflicts.append(MergeConflict(key, base_value, our_value, their_value))
+
+    return theirs, applied, conflicts
+
+
+def merge_config(base, ours, theirs):
+    """Merges the contents staged by the session with the current file, see
+    the module documentation.
+
+    Parameters:
+        base (LimitsTable): The file the session started from, None to use
+        the text ours was read from.
+        ours (LimitsTable): The limits staged by the session.
+        theirs (LimitsTable): The file on disk now, changed in place.
+
+    Returns:
+        tuple: (merged, applied, conflicts) with the contents to write, the
+        values of the session written into them per key and a MergeConflict
+        per key that could not be merged.
+    """
+
+    with span("config.merge", keys=len(ours)) as fields:
+        if base is None:
+            base = limits_table.LimitsTable(ours.text)
+        merged, applied, conflicts = merge_tables(base, ours, theirs)
+
+        fields.update(applied=len(applied), conflicts=len(conflicts))
+
+    return merged, applied, conflicts
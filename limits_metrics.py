@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+
+"""
+Prometheus metrics about the health of the write, reload and verify path of
+the Farm UI and the scheduler, exported as a text file for the node-exporter
+textfile collector.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Every window session and every scheduler run is its own process, so the
+counters and histograms are kept per farm in a JSON file next to the '.prom'
+file and updated under a lock at the end of every commit, with the reloads run
+by that commit. Every series is labeled with its farm. The '.prom' file is then
+written again from scratch and moved into place, so the collector never reads
+half a file.
+
+The '.prom' file is METRICS_FILE unless LIMITS_METRICS_FILE is set. Nothing is
+exported when its folder doesn't exist.
+"""
+
+import fcntl
+import json
+import os
+import time
+
+from limits_tracing import LOGGER
+
+METRICS_FILE = "/var/lib/node_exporter/textfile_collector/tractor_limits.prom"
+
+# Upper bounds of the histogram buckets, '+Inf' is added when exporting
+RELOAD_BUCKETS = (1, 2, 3, 4, 5, 6, 7)
+VERIFY_SECONDS_BUCKETS = (5, 10, 15, 30, 60, 120, 300)
+
+
+def metrics_file_path():
+    """Returns the path of the '.prom' file.
+
+    Returns:
+        str: Path to the '.prom' file.
+    """
+
+    return os.environ.get("LIMITS_METRICS_FILE") or METRICS_FILE
+
+
+def state_file_path(metrics_path):
+    """Returns the path of the JSON file holding the running totals.
+
+    Parameters:
+        metrics_path (str): Path to the '.prom' file.
+
+    Returns:
+        str: Path to the state file.
+    """
+
+    return f"{os.path.splitext(metrics_path)[0]}.json"
+
+
+def _observe(histogram, bounds, value):
+    """Adds a value to a histogram kept as plain counts per bucket."""
+
+    if not histogram:
+        histogram.update(counts=[0] * (len(bounds) + 1), sum=0, count=0)
+
+    position = next(
+        (index for index, bound in enumerate(bounds) if value <= bound), len(bounds)
+    )
+    histogram["counts"][position] += 1
+    histogram["sum"] += value
+    histogram["count"] += 1
+
+
+def _histogram_lines(name, histogram, bounds, farm):
+    """Returns the text lines of the histogram of a farm with cumulative
+    buckets."""
+
+    if not histogram:
+        return []
+
+    lines = []
+    cumulative = 0
+    for bound, count in zip(bounds + ("+Inf",), histogram["counts"]):
+        cumulative += count
+        lines.append(f'{name}_bucket{{farm="{farm}",le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{farm="{farm}"}} {histogram["sum"]}')
+    lines.append(f'{name}_count{{farm="{farm}"}} {histogram["count"]}')
+
+    return lines
+
+
+def render(state):
+    """Returns the metrics in the Prometheus text format.
+
+    Parameters:
+        state (dict): Running totals per farm as kept in the state file.
+
+    Returns:
+        str: Contents of the '.prom' file.
+    """
+
+    farms = sorted(state.get("farms", {}).items())
+
+    lines = [
+        "# HELP tractor_limits_commits_total Limit changes written to the config.",
+        "# TYPE tractor_limits_commits_total counter",
+    ]
+    for farm, totals in farms:
+        for source, count in sorted(totals.get("commits", {}).items()):
+            lines.append(
+                f'tractor_limits_commits_total{{farm="{farm}",source="{source}"}} '
+                f"{count}"
+            )
+
+    for name, help_text in (
+        ("reload_attempts_total", "Runs of the reload script."),
+        ("reload_failures_total", "Runs of the reload script that failed."),
+        ("unverified_keys_total", "Keys still not live when verification gave up."),
+    ):
+        lines.append(f"# HELP tractor_limits_{name} {help_text}")
+        lines.append(f"# TYPE tractor_limits_{name} counter")
+        for farm, totals in farms:
+            value = totals.get(name, 0)
+            lines.append(f'tractor_limits_{name}{{farm="{farm}"}} {value}')
+
+    for name, help_text, bounds in (
+        (
+            "reloads_per_commit",
+            "Reloads needed per commit until every key was live, first one "
+            "included.",
+            RELOAD_BUCKETS,
+        ),
+        (
+            "write_to_verified_seconds",
+            "Seconds from writing the config to every key being live.",
+            VERIFY_SECONDS_BUCKETS,
+        ),
+    ):
+        lines.append(f"# HELP tractor_limits_{name} {help_text}")
+        lines.append(f"# TYPE tractor_limits_{name} histogram")
+        for farm, totals in farms:
+            lines += _histogram_lines(
+                f"tractor_limits_{name}", totals.get(name), bounds, farm
+            )
+
+    for name, field, help_text in (
+        ("last_commit_timestamp_seconds", "last_commit", "Time of the last commit."),
+        (
+            "last_commit_unverified_keys",
+            "last_unverified",
+            "Keys not live after the last commit.",
+        ),
+    ):
+        lines.append(f"# HELP tractor_limits_{name} {help_text}")
+        lines.append(f"# TYPE tractor_limits_{name} gauge")
+        for farm, totals in farms:
+            lines.append(
+                f'tractor_limits_{name}{{farm="{farm}"}} {totals.get(field, 0)}'
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+def record_commit(
+    source,
+    reloads,
+    write_seconds,
+    unverified_keys,
+    reload_results=(),
+    farm="",
+    metrics_path=None,
+):
+    """Adds one commit to the running totals of its farm and exports every
+    metric again.
+
+    Parameters:
+        source (str): What made the commit, 'ui' or 'scheduler'.
+        reloads (int): Extra reloads needed while verifying.
+        write_seconds (float): Seconds from writing the config until the
+        verification finished.
+        unverified_keys (int): Keys still not live when verification gave up.
+        reload_results (list): Whether every reload run by the commit
+        succeeded, the first one included.
+        farm (str): Name of the farm the commit was made to.
+        metrics_path (str): Path to the '.prom' file, see metrics_file_path().
+
+    Returns:
+        bool: True if the metrics were exported. They are best-effort, an
+        unwritable folder or state file is logged and never fails the commit.
+    """
+
+    metrics_path = metrics_path or metrics_file_path()
+    if not os.path.isdir(os.path.dirname(metrics_path) or "."):
+        LOGGER.debug("Metrics folder missing, not exporting %s", metrics_path)
+        return False
+
+    try:
+        _export_commit(
+            source,
+            reloads,
+            write_seconds,
+            unverified_keys,
+            reload_results,
+            farm,
+            metrics_path,
+        )
+    except (OSError, ValueError) as error:
+        LOGGER.warning("Could not export the metrics to %s: %s", metrics_path, error)
+        return False
+
+    return True
+
+
+def _export_commit(
+    source,
+    reloads,
+    write_seconds,
+    unverified_keys,
+    reload_results,
+    farm,
+    metrics_path,
+):
+    """Adds one commit to the state file and writes the '.prom' file, see
+    record_commit()."""
+
+    with open(state_file_path(metrics_path), "a+") as state_file:
+        fcntl.flock(state_file, fcntl.LOCK_EX)
+        try:
+            state_file.seek(0)
+            contents = state_file.read()
+            state = json.loads(contents) if contents else {}
+            if "farms" not in state:
+                # Totals kept before they were split per farm
+                state = {"farms": {"": state} if state else {}}
+
+            totals = state["farms"].setdefault(farm, {})
+            commits = totals.setdefault("commits", {})
+            commits[source] = commits.get(source, 0) + 1
+            totals["reload_attempts_total"] = totals.get(
+                "reload_attempts_total", 0
+            ) + len(reload_results)
+            totals["reload_failures_total"] = totals.get(
+                "reload_failures_total", 0
+            ) + list(reload_results).count(False)
+            totals["unverified_keys_total"] = (
+                totals.get("unverified_keys_total", 0) + unverified_keys
+            )
+            _observe(
+                totals.setdefault("reloads_per_commit", {}),
+                RELOAD_BUCKETS,
+                reloads + 1,
+            )
+            if not unverified_keys:
+                _observe(
+                    totals.setdefault("write_to_verified_seconds", {}),
+                    VERIFY_SECONDS_BUCKETS,
+                    write_seconds,
+                )
+            totals["last_commit"] = time.time()
+            totals["last_unverified"] = unverified_keys
+
+            state_file.seek(0)
+            state_file.truncate()
+            json.dump(state, state_file)
+            state_file.flush()
+
+            tmp_metrics_path = f"{metrics_path}.tmp"
+            with open(tmp_metrics_path, "w") as o:
+                o.write(render(state))
+            os.replace(tmp_metrics_path, metrics_path)
+        finally:
+            fcntl.flock(state_file, fcntl.LOCK_UN)
@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+
+"""
+Named limit profiles ("day", "night", ...) stored next to the main '.config'
+file. A profile holds the 'SiteMax' each limit key should have while it is
+active, while the schedule tells the scheduler daemon when to apply each one.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Example of a 'limits_profiles.config' file:
+
+    {
+        "Profiles": {
+            "day": {"katana": 40, "maya": 60},
+            "night": {"katana": 120, "maya": 150}
+        },
+        "Schedule": [
+            {"at": "08:00", "profile": "day"},
+            {"at": "20:00", "profile": "night"}
+        ]
+    }
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+import limits_config
+import limits_store
+
+PROFILES_FILE_NAME = "limits_profiles.config"
+
+
+def profiles_file_path(config_file_path_name):
+    """Returns the path of the profiles file that lives next to the main
+    configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the profiles file.
+    """
+
+    return os.path.join(os.path.dirname(config_file_path_name), PROFILES_FILE_NAME)
+
+
+def read_profiles(profiles_path):
+    """Reads the profiles file.
+
+    Parameters:
+        profiles_path (str): Path to the profiles file.
+
+    Returns:
+        OrderedDict: Contents of the file with both 'Profiles' and 'Schedule'.
+    """
+
+    with open(profiles_path, "r") as i:
+        profiles_dict = json.load(i, object_pairs_hook=OrderedDict)
+
+    profiles_dict.setdefault("Profiles", OrderedDict())
+    profiles_dict.setdefault("Schedule", [])
+
+    return profiles_dict
+
+
+def save_profile(profiles_path, name, values):
+    """Adds or replaces a named profile inside the profiles file.
+
+    Parameters:
+        profiles_path (str): Path to the profiles file.
+        name (str): Name of the profile.
+        values (dict): 'SiteMax' per limit key for this profile.
+
+    Returns:
+        None
+    """
+
+    if os.path.exists(profiles_path):
+        profiles_dict = read_profiles(profiles_path)
+    else:
+        profiles_dict = OrderedDict([("Profiles", OrderedDict()), ("Schedule", [])])
+
+    profiles_dict["Profiles"][name] = OrderedDict(sorted(values.items()))
+
+    with open(profiles_path, mode="w") as created_file:
+        json.dump(profiles_dict, created_file, indent=4)
+
+
+def parse_time_of_day(text):
+    """Converts a 'HH:MM' string into minutes since midnight.
+
+    Parameters:
+        text (str): Time of the day as 'HH:MM'.
+
+    Returns:
+        int: Minutes since midnight.
+    """
+
+    hours, minutes = text.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def active_profile(schedule, now):
+    """Finds the profile that should be active at a given time.
+
+    The latest schedule entry at or before 'now' wins. Before the first entry
+    of the day the last entry of the previous day is still active.
+
+    Parameters:
+        schedule (list): Schedule entries with 'at' and 'profile'.
+        now (datetime.datetime): Time to check.
+
+    Returns:
+        str: Name of the active profile, or None if the schedule is empty.
+    """
+
+    if not schedule:
+        return None
+
+    entries = sorted(schedule, key=lambda entry: parse_time_of_day(entry["at"]))
+    minute_of_day = now.hour * 60 + now.minute
+
+    active = entries[-1]["profile"]
+    for entry in entries:
+        if parse_time_of_day(entry["at"]) <= minute_of_day:
+            active = entry["profile"]
+
+    return active
+
+
+def apply_profile(
+    profile_values,
+    config_file_path_name,
+    backup_folder,
+    engine_url=None,
+    reload_command=None,
+    source="profile",
+):
+    """Applies a profile to the main configuration file.
+
+    Only the keys whose values differ are changed. If nothing differs nothing
+    is written, otherwise the file is written once, Tractor is reloaded once
+    and every changed key is verified in one batch. The changes are recorded
+    in the audit log.
+
+    Parameters:
+        profile_values (dict): 'SiteMax' per limit key for the profile.
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+        engine_url (str): Website containing the live '.config' file info,
+        defaults to limits_config.ENGINE_LIMITS_URL.
+        reload_command (str): Shell command that reloads the config, defaults
+        to limits_config.RELOAD_COMMAND.
+        source (str): What applied the profile, as recorded in the audit log.
+
+    Returns:
+        tuple: (changed, mismatches) with the values that had to be written and
+        the keys that were still not live after verifying.
+    """
+
+    contents_dict = limits_config.read_config(config_file_path_name)
+    old_values = {
+        key: limits_config.get_limit_value(contents_dict, key)
+        for key in profile_values
+    }
+    changed = limits_config.apply_values(contents_dict, profile_values)
+
+    if not changed:
+        return changed, OrderedDict()
+
+    mismatches, reloads = limits_config.commit_config(
+        contents_dict,
+        changed,
+        config_file_path_name,
+        backup_folder,
+        engine_url,
+        reload_command,
+        source,
+        audit_changes={
+            key: (old_values[key], value) for key, value in changed.items()
+        },
+    )
+
+    limits_store.record_commit(config_file_path_name, source)
+
+    return changed, mismatches
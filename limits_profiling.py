@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+"""
+Opt-in profiling of the slow phases of the Farm UI (building every window and
+writing the changes) to find out what is slow on artist workstations. Every
+profiled phase writes its own '.pstats' file and, if asked to, a tracemalloc
+snapshot of the memory allocated so far.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Profiling is enabled with the '--profile-dir' flag of the main window and the
+scheduler, or with these environment variables:
+
+    LIMITS_PROFILE_DIR      Folder where the profiles are written.
+    LIMITS_PROFILE_MEMORY   Set to 1 to also write tracemalloc snapshots.
+
+The files are called '<phase>-<date>-<time>-<pid>-<n>.pstats' (and
+'.tracemalloc') and can be read with:
+
+    python -m pstats ui.main_window-20240501-143000-4242-1.pstats
+    tracemalloc.Snapshot.load("ui.main_window-...-1.tracemalloc")
+"""
+
+import itertools
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+# Frames kept per allocation by tracemalloc
+MEMORY_FRAMES = 10
+
+_settings = {"directory": None, "memory": None}
+_file_counter = itertools.count(1)
+# Held while a phase is profiled, only one profiler can run per process
+_profiling_lock = threading.Lock()
+
+
+def configure(directory=None, memory=None):
+    """Enables profiling from the command line, overriding the environment.
+
+    Parameters:
+        directory (str): Folder where the profiles are written.
+        memory (bool): Whether to write tracemalloc snapshots too.
+
+    Returns:
+        None
+    """
+
+    if directory is not None:
+        _settings["directory"] = directory
+    if memory is not None:
+        _settings["memory"] = memory
+
+
+def profile_directory():
+    """Returns the folder profiles are written to.
+
+    Returns:
+        str: The folder, or None when profiling is disabled.
+    """
+
+    return _settings["directory"] or os.environ.get("LIMITS_PROFILE_DIR")
+
+
+def memory_enabled():
+    """Returns whether tracemalloc snapshots are written.
+
+    Returns:
+        bool: True if enabled.
+    """
+
+    if _settings["memory"] is not None:
+        return _settings["memory"]
+
+    return os.environ.get("LIMITS_PROFILE_MEMORY", "") not in ("", "0")
+
+
+@contextmanager
+def profiled(phase):
+    """Profiles the code run inside the 'with' block when profiling is
+    enabled, doing nothing otherwise. Phases run inside another profiled
+    phase are part of the outer profile, and phases run by other threads while
+    one is profiled (e.g. farms committed in parallel) aren't profiled.
+
+    Parameters:
+        phase (str): Name of the phase, used for the file names.
+
+    Yields:
+        None
+    """
+
+    directory = profile_directory()
+    if directory is None or not _profiling_lock.acquire(blocking=False):
+        yield
+        return
+
+    try:
+        # Only loaded when profiling, so they don't slow down starting the UI
+        import cProfile
+        import datetime
+        import tracemalloc
+
+        os.makedirs(directory, exist_ok=True)
+        memory = memory_enabled()
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(MEMORY_FRAMES)
+            tracemalloc.reset_peak()
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+
+            base_name = os.path.join(
+                directory,
+                f"{phase}-{datetime.datetime.now():%Y%m%d-%H%M%S}"
+                f"-{os.getpid()}-{next(_file_counter)}",
+            )
+            profiler.dump_stats(f"{base_name}.pstats")
+
+            logger = logging.getLogger("limits")
+            if memory:
+                tracemalloc.take_snapshot().dump(f"{base_name}.tracemalloc")
+                current, peak = tracemalloc.get_traced_memory()
+                logger.info(
+                    "Profiled %s into %s.pstats (memory %.1f MB, peak %.1f MB)",
+                    phase,
+                    base_name,
+                    current / 2**20,
+                    peak / 2**20,
+                )
+            else:
+                logger.info("Profiled %s into %s.pstats", phase, base_name)
+    finally:
+        _profiling_lock.release()
@@ -0,0 +1,550 @@
+#!/usr/bin/python3
+
+"""
+Sampler of the limits reported by the Tractor engine. Polls the engine every
+few seconds and appends the slots in use, the 'SiteMax' and the tasks waiting
+of every tag to a fixed-size, memory-mapped ring buffer next to the '.config'
+file, so the disk used never grows, and folds every sample into the hourly
+usage history of limits_usage.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Layout of the ring file:
+
+    header (64 bytes): b"LRNG", version, slots, key capacity, keys in use,
+    interval (uint32) and the sequence of the last sample written (uint64) |
+    key table: the name of every key, KEY_SIZE bytes each |
+    slots: sequence and time of the sample (int64), then in use, 'SiteMax'
+    and waiting (int32) per key of the key table, -1 when it wasn't reported
+
+Sample N goes to slot (N - 1) % slots. Only one sampler writes a ring (it
+holds a lock on the file), readers never lock: the sequence of a slot is
+cleared while it is written and set again once it is complete, so a reader
+copying a slot keeps it only if the sequence is the expected one both before
+and after the copy.
+
+The engine is polled through one keep-alive connection and only the three
+numbers of every tag are kept from the answer.
+
+Usage:
+    limits_sampler.py [--farm NAME] run [--interval S] [--hours H] [--keys N]
+                      [--no-rollup]
+    limits_sampler.py [--farm NAME] tail [--count N] [KEY ...]
+"""
+
+import argparse
+import datetime
+import fcntl
+import http.client
+import json
+import mmap
+import os
+import signal
+import struct
+import sys
+import time
+from array import array
+from urllib.parse import urlsplit
+
+import limits_config
+import limits_farms
+import limits_tracing
+import limits_usage
+from limits_tracing import LOGGER, span
+
+RING_FILE_NAME = "limits_usage.ring"
+MAGIC = b"LRNG"
+VERSION = 2
+
+DEFAULT_INTERVAL = 5
+DEFAULT_HOURS = 6
+DEFAULT_KEY_CAPACITY = 2048
+POLL_TIMEOUT = 10
+
+HEADER = struct.Struct("<4sIIIIIQ")
+HEADER_SIZE = 64
+KEY_COUNT_OFFSET = 16
+HEAD_OFFSET = 24
+KEY_SIZE = 64
+SLOT_HEAD = struct.Struct("<qq")
+
+
+def ring_file_path(config_file_path_name):
+    """Returns the path of the ring file of a configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the ring file.
+    """
+
+    return os.path.join(
+        os.path.dirname(os.path.abspath(config_file_path_name)), RING_FILE_NAME
+    )
+
+
+def _slot_size(key_capacity):
+    """Returns the size of a slot in bytes."""
+
+    return SLOT_HEAD.size + 12 * key_capacity
+
+
+def create_ring(ring_path, slots, key_capacity, interval):
+    """Creates an empty ring file, replacing the previous one atomically. The
+    file is sparse until the slots are written.
+
+    Parameters:
+        ring_path (str): Path to the ring file.
+        slots (int): Samples kept.
+        key_capacity (int): Keys every sample can hold.
+        interval (int): Seconds between samples, for the readers.
+
+    Returns:
+        None
+    """
+
+    tmp_ring_path = f"{ring_path}.tmp"
+    with open(tmp_ring_path, "wb") as ring_file:
+        ring_file.write(
+            HEADER.pack(MAGIC, VERSION, slots, key_capacity, 0, interval, 0)
+        )
+        ring_file.truncate(
+            HEADER_SIZE + KEY_SIZE * key_capacity + slots * _slot_size(key_capacity)
+        )
+
+    os.replace(tmp_ring_path, ring_path)
+
+
+class UsageRing:
+    """Access to a ring file through a memory map, read-only unless it is
+    opened by the sampler.
+
+    Args:
+        ring_path (str): Path to the ring file.
+        writable (bool): Whether samples are appended through it.
+
+    Attributes:
+        slots (int): Samples kept.
+        key_capacity (int): Keys every sample can hold.
+        interval (int): Seconds between samples.
+        keys (list): Name of every key in the key table.
+
+    Methods:
+        head(): Returns the sequence of the last sample written.
+        read_keys(): Reads the keys added since the last call.
+        samples(after): Returns the samples written after a sequence.
+        close(): Releases the memory map.
+    """
+
+    def __init__(self, ring_path, writable=False):
+        """Maps the ring file and reads its header."""
+
+        self.ring_file = open(ring_path, "r+b" if writable else "rb")
+        self.buffer = mmap.mmap(
+            self.ring_file.fileno(),
+            0,
+            access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ,
+        )
+
+        magic, version, self.slots, self.key_capacity, _, self.interval, _ = (
+            HEADER.unpack_from(self.buffer)
+        )
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{ring_path} is not a limits usage ring")
+
+        self.slot_size = _slot_size(self.key_capacity)
+        self.slots_offset = HEADER_SIZE + KEY_SIZE * self.key_capacity
+        self.keys = []
+        self.read_keys()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def head(self):
+        """Returns the sequence of the last sample written.
+
+        Returns:
+            int: The sequence, 0 if nothing was written yet.
+        """
+
+        return struct.unpack_from("<Q", self.buffer, HEAD_OFFSET)[0]
+
+    def read_keys(self):
+        """Reads the keys added to the key table since the last call. Keys
+        are only ever added, so the position of a key never changes.
+
+        Returns:
+            list: Every key.
+        """
+
+        (key_count,) = struct.unpack_from("<I", self.buffer, KEY_COUNT_OFFSET)
+
+        for position in range(len(self.keys), key_count):
+            start = HEADER_SIZE + KEY_SIZE * position
+            name = self.buffer[start : start + KEY_SIZE].rstrip(b"\0")
+            self.keys.append(name.decode("utf-8"))
+
+        return self.keys
+
+    def _slot_offset(self, sequence):
+        """Returns where the slot of a sample starts."""
+
+        return self.slots_offset + (sequence - 1) % self.slots * self.slot_size
+
+    def samples(self, after=0):
+        """Returns the samples written after a sequence that are still in the
+        ring, oldest first. Slots being written or overwritten while they are
+        copied are left out.
+
+        Parameters:
+            after (int): Sequence of the last sample already read.
+
+        Returns:
+            list: (sequence, time, usage) per sample, where usage holds
+            (in_use, site_max, waiting) per reported key.
+        """
+
+        head = self.head()
+        keys = self.read_keys()
+        samples = []
+
+        for sequence in range(max(after, head - self.slots) + 1, head + 1):
+            start = self._slot_offset(sequence)
+            data = self.buffer[start : start + SLOT_HEAD.size + 12 * len(keys)]
+            slot_sequence, moment = SLOT_HEAD.unpack_from(data)
+            if slot_sequence != sequence or (
+                SLOT_HEAD.unpack_from(self.buffer, start)[0] != sequence
+            ):
+                continue
+
+            values = array("i")
+            values.frombytes(data[SLOT_HEAD.size :])
+            samples.append(
+                (
+                    sequence,
+                    moment,
+                    {
+                        key: (in_use, site_max, waiting)
+                        for key, in_use, site_max, waiting in zip(
+                            keys, values[0::3], values[1::3], values[2::3]
+                        )
+                        if site_max >= 0
+                    },
+                )
+            )
+
+        return samples
+
+    def close(self):
+        """Releases the memory map.
+
+        Returns:
+            None
+        """
+
+        self.buffer.close()
+        self.ring_file.close()
+
+
+class RingWriter(UsageRing):
+    """The only writer of a ring file, see the module documentation.
+
+    Args:
+        ring_path (str): Path to the ring file, created if needed.
+        slots (int): Samples kept.
+        key_capacity (int): Keys every sample can hold.
+        interval (int): Seconds between samples.
+
+    Methods:
+        append(moment, usage): Appends a sample.
+    """
+
+    def __init__(self, ring_path, slots, key_capacity, interval):
+        """Locks the ring, then opens it, creating it again when its size
+        doesn't match."""
+
+        # A lock file next to the ring, the ring itself may be replaced
+        self.lock_file = open(f"{ring_path}.lock", "a")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock_file.close()
+            raise RuntimeError(f"Another sampler is writing {ring_path}") from None
+
+        try:
+            with UsageRing(ring_path) as ring:
+                geometry = (ring.slots, ring.key_capacity, ring.interval)
+        except (OSError, ValueError, struct.error):
+            geometry = None
+
+        if geometry != (slots, key_capacity, interval):
+            if geometry is not None:
+                LOGGER.warning("Creating %s again with the new size", ring_path)
+            create_ring(ring_path, slots, key_capacity, interval)
+
+        super().__init__(ring_path, writable=True)
+
+        self.positions = {key: position for position, key in enumerate(self.keys)}
+        self.missing = array("i", [-1]) * (3 * key_capacity)
+        self.dropped_keys = set()
+
+    def add_key(self, key):
+        """Adds a key to the key table.
+
+        Parameters:
+            key (str): Limit key.
+
+        Returns:
+            int: Position of the key, None if the table is full.
+        """
+
+        name = key.encode("utf-8")
+        if len(self.keys) == self.key_capacity or len(name) > KEY_SIZE:
+            if key not in self.dropped_keys:
+                LOGGER.warning("No room for %s in the usage ring", key)
+                self.dropped_keys.add(key)
+            return None
+
+        position = len(self.keys)
+        start = HEADER_SIZE + KEY_SIZE * position
+        self.buffer[start : start + len(name)] = name
+        struct.pack_into("<I", self.buffer, KEY_COUNT_OFFSET, position + 1)
+        self.keys.append(key)
+        self.positions[key] = position
+
+        return position
+
+    def append(self, moment, usage):
+        """Appends a sample, overwriting the oldest one once the ring is full.
+
+        Parameters:
+            moment (int): Time of the sample.
+            usage (dict): (in_use, site_max, waiting) per limit key.
+
+        Returns:
+            int: Sequence of the sample.
+        """
+
+        values = self.missing[:]
+        for key, (in_use, site_max, waiting) in usage.items():
+            position = self.positions.get(key)
+            if position is None:
+                position = self.add_key(key)
+                if position is None:
+                    continue
+            values[3 * position] = in_use
+            values[3 * position + 1] = site_max
+            values[3 * position + 2] = waiting
+
+        sequence = self.head() + 1
+        start = self._slot_offset(sequence)
+
+        SLOT_HEAD.pack_into(self.buffer, start, 0, moment)
+        self.buffer[start + SLOT_HEAD.size : start + self.slot_size] = values.tobytes()
+        struct.pack_into("<q", self.buffer, start, sequence)
+        struct.pack_into("<Q", self.buffer, HEAD_OFFSET, sequence)
+
+        return sequence
+
+    def close(self):
+        """Releases the memory map and the lock.
+
+        Returns:
+            None
+        """
+
+        super().close()
+        self.lock_file.close()
+
+
+class EnginePoller:
+    """Polls the limits of the engine through one keep-alive connection,
+    opened again when the engine closes it.
+
+    Args:
+        engine_url (str): Website containing the live '.config' file info.
+
+    Methods:
+        poll(): Returns the limits reported by the engine.
+        close(): Closes the connection.
+    """
+
+    def __init__(self, engine_url):
+        """Parses the website, the connection is opened on the first poll."""
+
+        self.engine_url = engine_url
+        parts = urlsplit(engine_url)
+        self.connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path += f"?{parts.query}"
+        self.connection = None
+
+    def poll(self):
+        """Returns the limits reported by the engine.
+
+        Returns:
+            dict: Limits as reported by the engine.
+        """
+
+        with span("engine.sample", url=self.engine_url) as fields:
+            for attempt in range(2):
+                if self.connection is None:
+                    self.connection = self.connection_class(
+                        self.netloc, timeout=POLL_TIMEOUT
+                    )
+                try:
+                    self.connection.request("GET", self.path)
+                    response = self.connection.getresponse()
+                    body = response.read()
+                    break
+                except (OSError, http.client.HTTPException):
+                    # Kept-alive connections are closed by the engine now and
+                    # then, the request is sent once more on a new one
+                    self.close()
+                    if attempt:
+                        raise
+
+            fields.update(status=response.status, size=len(body))
+            if response.status != 200:
+                raise OSError(f"The engine answered {response.status}")
+
+            return json.loads(body)
+
+    def close(self):
+        """Closes the connection.
+
+        Returns:
+            None
+        """
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def run(farm, interval, slots, key_capacity, rollup=True):
+    """Samples the engine of a farm until interrupted.
+
+    Parameters:
+        farm (LimitFarm): Farm to sample.
+        interval (int): Seconds between samples.
+        slots (int): Samples kept in the ring.
+        key_capacity (int): Keys every sample can hold.
+        rollup (bool): Whether to fold the samples into the hourly usage.
+
+    Returns:
+        None
+    """
+
+    ring_path = ring_file_path(farm.config_file_path_name)
+    usage_path = limits_usage.usage_file_path(farm.config_file_path_name)
+    writer = RingWriter(ring_path, slots, key_capacity, interval)
+    poller = EnginePoller(farm.engine_url or limits_config.ENGINE_LIMITS_URL)
+    LOGGER.info("Sampling %s every %d seconds into %s", farm.name, interval, ring_path)
+
+    next_poll = time.monotonic()
+    try:
+        while True:
+            moment = int(time.time())
+            try:
+                usage = limits_usage.engine_usage(poller.poll())
+            except (OSError, ValueError, http.client.HTTPException) as error:
+                LOGGER.warning("Could not sample the engine: %s", error)
+            else:
+                writer.append(moment, usage)
+                if rollup:
+                    limits_usage.record_usage(usage_path, usage, moment)
+
+            next_poll += interval
+            delay = next_poll - time.monotonic()
+            if delay < 0:
+                LOGGER.warning("Sampling took longer than %d seconds", interval)
+                next_poll = time.monotonic()
+            else:
+                time.sleep(delay)
+    finally:
+        poller.close()
+        writer.close()
+
+
+def main(argv=None):
+    """Parses the command line and samples or prints the last samples.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--farm", default=None, help="farm to use, the first one by default"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="sample the engine")
+    run_parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL)
+    run_parser.add_argument(
+        "--hours", type=float, default=DEFAULT_HOURS, help="history kept in the ring"
+    )
+    run_parser.add_argument("--keys", type=int, default=DEFAULT_KEY_CAPACITY)
+    run_parser.add_argument(
+        "--no-rollup", action="store_true", help="don't update the hourly usage"
+    )
+    tail_parser = commands.add_parser("tail", help="print the last samples")
+    tail_parser.add_argument("--count", type=int, default=10)
+    tail_parser.add_argument("keys", nargs="*")
+    args = parser.parse_args(argv)
+
+    limits_tracing.configure()
+
+    farms = limits_farms.load_farms()
+    if args.farm is not None and args.farm not in farms:
+        LOGGER.error("Unknown farm: %s", args.farm)
+        return 1
+    farm = farms[args.farm] if args.farm else limits_farms.selected_farm(farms)
+
+    if args.command == "run":
+        slots = max(int(args.hours * 3600 / args.interval), 1)
+        # Stopped by the service manager the same way as with Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            run(farm, args.interval, slots, args.keys, not args.no_rollup)
+        except RuntimeError as error:
+            LOGGER.error("%s", error)
+            return 1
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    with UsageRing(ring_file_path(farm.config_file_path_name)) as ring:
+        samples = ring.samples(max(ring.head() - args.count, 0))
+
+    for _, moment, usage in samples:
+        keys = args.keys or sorted(usage)
+        print(
+            f"{datetime.datetime.fromtimestamp(moment):%Y-%m-%d %H:%M:%S}  "
+            + "  ".join(
+                f"{key} {usage[key][0]}/{usage[key][1]}" for key in keys if key in usage
+            )
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
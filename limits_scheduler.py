@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+
+"""
+Scheduler daemon that applies the named limit profiles found in
+'limits_profiles.config' at the times given by its schedule.
+Every time a profile becomes active, only the changed keys are written, Tractor
+is reloaded once and all the changed keys are verified in one batch.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Usage:
+    limits_scheduler.py [--config PATH] [--backup FOLDER] [--once]
+"""
+
+import argparse
+import datetime
+import sys
+from time import sleep
+
+import limits_config
+import limits_metrics
+import limits_profiles
+import limits_profiling
+import limits_tracing
+from limits_tracing import LOGGER
+
+CONFIG_FILE_PATH_NAME = "/sw/tractor/config/limits.config"
+BACKUP_FOLDER = "/sw/tractor/config/limits_backup/"
+CHECK_INTERVAL = 60
+
+
+def run_once(config_file_path_name, backup_folder, profiles_path, now=None):
+    """Applies whatever profile should be active right now.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+        profiles_path (str): Path to the profiles file.
+        now (datetime.datetime): Time to use instead of the current time.
+
+    Returns:
+        str: Name of the profile that is active, or None if there is none.
+    """
+
+    profiles_dict = limits_profiles.read_profiles(profiles_path)
+    now = now or datetime.datetime.now()
+    profile = limits_profiles.active_profile(profiles_dict["Schedule"], now)
+
+    if profile is None:
+        return None
+
+    if profile not in profiles_dict["Profiles"]:
+        LOGGER.error("The schedule refers to an unknown profile: '%s'", profile)
+        return None
+
+    changed, mismatches = limits_profiles.apply_profile(
+        profiles_dict["Profiles"][profile],
+        config_file_path_name,
+        backup_folder,
+        source=f"profile:{profile}",
+    )
+
+    if changed:
+        LOGGER.info(
+            "%s Profile '%s' applied: %s",
+            f"{now:%Y-%m-%d %H:%M}",
+            profile,
+            dict(changed),
+        )
+    if mismatches:
+        LOGGER.error(
+            "Profile '%s' could not be verified for: %s. "
+            "Attempt to reload manually.",
+            profile,
+            ", ".join(mismatches),
+        )
+
+    return profile
+
+
+def run_daemon(config_file_path_name, backup_folder, profiles_path, interval):
+    """Keeps checking the schedule and applies each profile when it becomes
+    active. The currently active profile is applied when the daemon starts.
+    A check that fails (unreadable profiles, engine down, failed reload, ...)
+    is logged and tried again at the next check instead of stopping the daemon.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+        profiles_path (str): Path to the profiles file.
+        interval (int): Seconds between checks of the schedule.
+
+    Returns:
+        None
+    """
+
+    last_profile = None
+
+    while True:
+        try:
+            profiles_dict = limits_profiles.read_profiles(profiles_path)
+            profile = limits_profiles.active_profile(
+                profiles_dict["Schedule"], datetime.datetime.now()
+            )
+
+            if profile != last_profile:
+                last_profile = run_once(
+                    config_file_path_name, backup_folder, profiles_path
+                )
+        except Exception:
+            # last_profile is left as it was, so the next check tries again
+            LOGGER.exception("Could not apply the schedule, trying again later")
+
+        sleep(interval)
+
+
+def main(argv=None):
+    """Parses the command line and starts the scheduler.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--config", default=CONFIG_FILE_PATH_NAME)
+    parser.add_argument("--backup", default=BACKUP_FOLDER)
+    parser.add_argument("--profiles", default=None)
+    parser.add_argument("--interval", type=int, default=CHECK_INTERVAL)
+    parser.add_argument(
+        "--once", action="store_true", help="apply the active profile and exit"
+    )
+    parser.add_argument("--engine-url", default=None)
+    parser.add_argument("--reload-command", default=None)
+    parser.add_argument("--metrics-file", default=None, help="'.prom' file to export")
+    parser.add_argument("--profile-dir", help="write cProfile stats of every commit")
+    parser.add_argument(
+        "--profile-memory", action="store_true", help="also write tracemalloc snapshots"
+    )
+    args = parser.parse_args(argv)
+
+    limits_tracing.configure()
+    limits_profiling.configure(args.profile_dir, args.profile_memory or None)
+
+    # Lets the daemon be pointed at a different engine
+    if args.engine_url:
+        limits_config.ENGINE_LIMITS_URL = args.engine_url
+    if args.reload_command:
+        limits_config.RELOAD_COMMAND = args.reload_command
+    if args.metrics_file:
+        limits_metrics.METRICS_FILE = args.metrics_file
+    profiles_path = args.profiles or limits_profiles.profiles_file_path(args.config)
+
+    if args.once:
+        run_once(args.config, args.backup, profiles_path)
+    else:
+        run_daemon(args.config, args.backup, profiles_path, args.interval)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
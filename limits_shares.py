@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+"""
+Helpers for the 'linuxfarm' Shares weights of the Farm UI. Every show gets a
+percentage of the farm proportional to its weight, so every change renormalizes
+all of them in a single pass over the weights.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+from array import array
+from collections import OrderedDict
+
+import limits_config
+
+SHARES_PATH = ("linuxfarm", "Shares")
+
+
+def share_keys(contents_dict):
+    """Returns the key pointing to the weight of every show of the Linux farm.
+
+    Shares are either a number or a dictionary holding the weight as 'share'.
+
+    Parameters:
+        contents_dict (dict): Contents of the configuration file, or its
+        limits_table.LimitsTable.
+
+    Returns:
+        OrderedDict: Key (usable with limits_config.get_limit_value) per show.
+    """
+
+    if not isinstance(contents_dict, dict):
+        return contents_dict.share_keys()
+
+    shares = contents_dict["Limits"]["linuxfarm"]["Shares"]
+    keys = OrderedDict()
+
+    for show, share in shares.items():
+        parts = SHARES_PATH + (show,)
+        if isinstance(share, dict):
+            parts += ("share",)
+        keys[show] = limits_config.PATH_SEPARATOR.join(parts)
+
+    return keys
+
+
+def percentages(weights):
+    """Renormalizes every weight into a percentage of the farm.
+
+    Parameters:
+        weights (array): Weight of every show.
+
+    Returns:
+        array: Percentage of the farm of every show, in the same order.
+    """
+
+    total = sum(weights)
+    if not total:
+        return array("d", bytes(8 * len(weights)))
+
+    factor = 100.0 / total
+    return array("d", [weight * factor for weight in weights])
+
+
+def round_keeping_total(values, total):
+    """Rounds values to integers making sure they still add up to 'total', by
+    giving the leftover units to the values with the largest remainders.
+
+    Parameters:
+        values (list): Values to round.
+        total (int): Sum the rounded values must have.
+
+    Returns:
+        array: Rounded values.
+    """
+
+    rounded = array("l", [int(value) for value in values])
+    leftover = int(total) - sum(rounded)
+    by_remainder = sorted(
+        range(len(values)), key=lambda index: values[index] - rounded[index]
+    )
+
+    for index in by_remainder[::-1][: max(leftover, 0)]:
+        rounded[index] += 1
+
+    return rounded
+
+
+def give_share(weights, index, percent):
+    """Gives one show a percentage of the farm and scales every other show
+    proportionally, keeping the sum of all weights the same.
+
+    Parameters:
+        weights (array): Weight of every show.
+        index (int): Position of the show to change.
+        percent (float): Percentage of the farm the show should get.
+
+    Returns:
+        array: New integer weight of every show.
+    """
+
+    total = sum(weights)
+    others = total - weights[index]
+    target = total * min(max(percent, 0.0), 100.0) / 100.0
+
+    if others:
+        factor = (total - target) / others
+        new_weights = [weight * factor for weight in weights]
+    else:
+        new_weights = [0.0] * len(weights)
+    new_weights[index] = target
+
+    return round_keeping_total(new_weights, total)
+
+
+def scale_shares(weights, factor, indexes=None):
+    """Scales the weights of some shows, or of every show.
+
+    Parameters:
+        weights (array): Weight of every show.
+        factor (float): Factor to multiply the weights by.
+        indexes (iterable): Positions of the shows to scale, all if None.
+
+    Returns:
+        array: New integer weight of every show.
+    """
+
+    selected = set(range(len(weights)) if indexes is None else indexes)
+
+    return array(
+        "l",
+        [
+            max(int(round(weight * factor)), 0) if position in selected else weight
+            for position, weight in enumerate(weights)
+        ],
+    )
@@ -0,0 +1,286 @@
+#!/usr/bin/python3
+
+"""
+Fuzzy search of the shows for the Show Selection window of the Farm UI. The
+names of the shows are case folded and indexed by trigram once per list of
+shows, so every keystroke only looks at the shows sharing a trigram with what
+was typed, and the display name of a show maps back to its key in the
+'.config' file with a single dictionary lookup.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+The shows used last and the favourite shows of the user are kept in
+SHOWS_FILE (LIMITS_SHOWS_FILE overrides its path) and listed first.
+"""
+
+import json
+import os
+from collections import Counter
+from functools import lru_cache
+
+from limits_tracing import LOGGER
+
+SHOWS_FILE = "~/.config/tractor_limits/shows.json"
+RECENT_SHOWS = 8
+
+TRIGRAM_SIZE = 3
+SEARCH_RESULTS = 20
+# Shows sharing fewer of the trigrams of the search are left out
+MINIMUM_SCORE = 0.34
+PREFIX_BONUS = 2.0
+SUBSTRING_BONUS = 1.0
+PINNED_BONUS = 0.5
+
+
+def trigrams(text):
+    """Returns the trigrams of a case folded text, padded so the start of a
+    name weighs more than its middle.
+
+    Parameters:
+        text (str): Case folded text.
+
+    Returns:
+        set: The trigrams.
+    """
+
+    padded = f"  {text} "
+
+    return {
+        padded[start : start + TRIGRAM_SIZE]
+        for start in range(len(padded) - TRIGRAM_SIZE + 1)
+    }
+
+
+class ShowIndex:
+    """Trigram index of the shows, see the module documentation.
+
+    Args:
+        shows (tuple): Keys of the shows in the configuration file.
+
+    Attributes:
+        names (list): Display name of every show.
+        keys_by_name (dict): Key of every show per case folded display name.
+
+    Methods:
+        key_for(name): Returns the key of a display name.
+        name_for(key): Returns the display name of a key.
+        search(text, pinned, limit): Returns the names best matching a text.
+    """
+
+    def __init__(self, shows):
+        """Builds the index."""
+
+        self.keys = list(shows)
+        self.names = [show.upper() for show in self.keys]
+        self.folded = [name.casefold() for name in self.names]
+        self.keys_by_name = dict(zip(self.folded, self.keys))
+        self.positions_by_key = {key: position for position, key in enumerate(shows)}
+
+        self.trigram_index = {}
+        for position, folded in enumerate(self.folded):
+            for trigram in trigrams(folded):
+                self.trigram_index.setdefault(trigram, []).append(position)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def key_for(self, name):
+        """Returns the key of a display name, in any case.
+
+        Parameters:
+            name (str): Display name of a show.
+
+        Returns:
+            str: Key of the show, None if there is no show with that name.
+        """
+
+        return self.keys_by_name.get(name.strip().casefold())
+
+    def name_for(self, key):
+        """Returns the display name of a key.
+
+        Parameters:
+            key (str): Key of a show.
+
+        Returns:
+            str: Display name, None if the key isn't indexed.
+        """
+
+        position = self.positions_by_key.get(key)
+
+        return None if position is None else self.names[position]
+
+    def search(self, text, pinned=(), limit=SEARCH_RESULTS):
+        """Returns the display names best matching a text. Shows sharing more
+        trigrams with it come first, then the ones starting with it, or
+        containing it, and the pinned ones. The shows are scanned for the
+        text when it is shorter than a trigram, or shares none with them.
+
+        Parameters:
+            text (str): Text typed by the user.
+            pinned (iterable): Keys of the shows ranked higher.
+            limit (int): Names returned at most.
+
+        Returns:
+            list: The display names, every name if the text is empty.
+        """
+
+        query = text.strip().casefold()
+        if not query:
+            return list(self.names)
+
+        query_trigrams = trigrams(query)
+        counts = Counter()
+        for trigram in query_trigrams:
+            counts.update(self.trigram_index.get(trigram, ()))
+        # Shorter texts have no trigram of their own, and the ones containing
+        # the text may share none with it
+        if len(query) < TRIGRAM_SIZE or not counts:
+            for position, folded in enumerate(self.folded):
+                if query in folded:
+                    counts.setdefault(position, 0)
+
+        pinned_positions = {
+            self.positions_by_key[key] for key in pinned if key in self.positions_by_key
+        }
+        scored = []
+        for position, count in counts.items():
+            score = count / len(query_trigrams)
+            folded = self.folded[position]
+            if folded.startswith(query):
+                score += PREFIX_BONUS
+            elif query in folded:
+                score += SUBSTRING_BONUS
+            elif score < MINIMUM_SCORE:
+                continue
+            if position in pinned_positions:
+                score += PINNED_BONUS
+            scored.append((-score, len(folded), folded, position))
+
+        scored.sort()
+
+        return [self.names[position] for *_, position in scored[:limit]]
+
+
+@lru_cache(maxsize=8)
+def show_index(shows):
+    """Returns the index of a list of shows, built once per list.
+
+    Parameters:
+        shows (tuple): Keys of the shows.
+
+    Returns:
+        ShowIndex: The index.
+    """
+
+    return ShowIndex(shows)
+
+
+def shows_file_path():
+    """Returns the path of the file with the recent and favourite shows.
+
+    Returns:
+        str: Path to the file.
+    """
+
+    return os.path.expanduser(os.environ.get("LIMITS_SHOWS_FILE") or SHOWS_FILE)
+
+
+def load_preferences():
+    """Reads the recent and favourite shows of the user.
+
+    Returns:
+        dict: Lists of keys as 'recent' (last used first) and 'favourites'.
+    """
+
+    preferences = {"recent": [], "favourites": []}
+
+    try:
+        with open(shows_file_path(), "r") as i:
+            preferences.update(json.load(i))
+    except (OSError, ValueError):
+        pass
+
+    return preferences
+
+
+def save_preferences(preferences):
+    """Writes the recent and favourite shows of the user.
+
+    Parameters:
+        preferences (dict): See load_preferences().
+
+    Returns:
+        None
+    """
+
+    shows_path = shows_file_path()
+
+    try:
+        os.makedirs(os.path.dirname(shows_path), exist_ok=True)
+        with open(shows_path, "w") as o:
+            json.dump(preferences, o, indent=4)
+    except OSError as error:
+        LOGGER.warning("Could not save the recent shows: %s", error)
+
+
+def add_recent(preferences, key):
+    """Moves a show to the top of the recent shows.
+
+    Parameters:
+        preferences (dict): See load_preferences().
+        key (str): Key of the show.
+
+    Returns:
+        None
+    """
+
+    recent = [show for show in preferences["recent"] if show != key]
+    preferences["recent"] = [key] + recent[: RECENT_SHOWS - 1]
+
+
+def toggle_favourite(preferences, key):
+    """Adds a show to the favourite shows, or removes it.
+
+    Parameters:
+        preferences (dict): See load_preferences().
+        key (str): Key of the show.
+
+    Returns:
+        bool: Whether the show is a favourite now.
+    """
+
+    if key in preferences["favourites"]:
+        preferences["favourites"].remove(key)
+        return False
+
+    preferences["favourites"].append(key)
+
+    return True
+
+
+def pinned_shows(index, preferences):
+    """Returns the favourite shows, then the recent ones that aren't
+    favourites, leaving out the shows that aren't indexed.
+
+    Parameters:
+        index (ShowIndex): Index of the shows.
+        preferences (dict): See load_preferences().
+
+    Returns:
+        tuple: (favourites, recent) lists of keys.
+    """
+
+    favourites = [
+        key for key in preferences["favourites"] if key in index.positions_by_key
+    ]
+    recent = [
+        key
+        for key in preferences["recent"]
+        if key in index.positions_by_key and key not in favourites
+    ]
+
+    return favourites, recent
@@ -0,0 +1,730 @@
+#!/usr/bin/python3
+
+"""
+Optional SQLite store of the limits of a farm. Tractor only reads the JSON
+'.config' file, but working on that file directly means rewriting all of it
+for every change and no way for two people to edit at the same time. The
+store keeps the limits, the Shares weights, their history and the staging
+sessions in a 'limits.sqlite' database next to the '.config' file, and only
+exports the '.config' file when a session is committed.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+The database runs in WAL mode, so any amount of readers work while one
+session commits. Every multi-key update is one transaction, keys are indexed
+by name and by tag ('application', 'share', 'yeti', 'farm' and 'show:<name>')
+and the history is indexed by key and time.
+
+The text of the '.config' file is kept in the store too. An export only
+replaces the digits of the values in it, so exporting the same values always
+gives the same bytes, and every other setting of the file is left as it was.
+A '.config' file changed by hand is imported again before the next commit,
+and its changes are recorded in the history with the source 'file'.
+
+Once a store exists for a farm (created with 'import'), every commit of the
+UI and the scheduler is recorded in it too.
+
+Usage:
+    limits_store.py [--config PATH] import
+    limits_store.py [--config PATH] get KEY [KEY ...]
+    limits_store.py [--config PATH] keys (--applications | --show NAME | --shares)
+    limits_store.py [--config PATH] stage [--session ID] KEY=VALUE [...]
+    limits_store.py [--config PATH] commit --session ID [--backup FOLDER]
+    limits_store.py [--config PATH] history KEY [--limit N]
+    limits_store.py [--config PATH] export PATH
+"""
+
+import argparse
+import fcntl
+import getpass
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+
+import limits_config
+import limits_table
+import limits_tracing
+from limits_tracing import LOGGER, span
+
+CONFIG_FILE_PATH_NAME = "/sw/tractor/config/limits.config"
+BACKUP_FOLDER = "/sw/tractor/config/limits_backup/"
+STORE_FILE_NAME = "limits.sqlite"
+
+# Seconds a writer waits for another one to finish
+BUSY_TIMEOUT = 30
+# Held by every session commit, next to the store, see commit_session()
+COMMIT_LOCK_SUFFIX = ".commit.lock"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS limits (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    position INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS limit_tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history (
+    time REAL NOT NULL,
+    key TEXT NOT NULL,
+    old INTEGER,
+    new INTEGER NOT NULL,
+    user TEXT,
+    host TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS history_key_time ON history (key, time);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT,
+    host TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS staged (
+    session INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (session, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+
+def store_file_path(config_file_path_name):
+    """Returns the path of the store that lives next to the main
+    configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the store.
+    """
+
+    return os.path.join(os.path.dirname(config_file_path_name), STORE_FILE_NAME)
+
+
+def _digest(text):
+    """Returns the fingerprint of the text of a configuration file."""
+
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _tags(table, index):
+    """Returns the tags of the key at index of a LimitsTable."""
+
+    category = table.records[index].category
+    tags = []
+
+    for flag, tag in (
+        (limits_table.CATEGORY_APPLICATION, "application"),
+        (limits_table.CATEGORY_SHARE, "share"),
+        (limits_table.CATEGORY_YETI, "yeti"),
+        (limits_table.CATEGORY_FARM, "farm"),
+    ):
+        if category & flag:
+            tags.append(tag)
+
+    return tags
+
+
+class LimitsStore:
+    """SQLite store of the limits of one farm, see the module documentation.
+
+    Args:
+        path (str): Path of the database, created if it doesn't exist.
+
+    Attributes:
+        path (str): Path of the database.
+        connection (Connection): Connection to the database.
+
+    Methods:
+        sync(config_file_path_name): Imports the '.config' file if it changed.
+        value(key): Returns the value of a key.
+        values(keys): Returns the value of several keys.
+        tagged(tag): Returns the keys and values of a tag.
+        update(values, source): Changes several values in one transaction.
+        open_session(): Starts a staging session.
+        stage(session, values): Stages values in a session.
+        staged(session): Returns the values staged in a session.
+        discard(session): Discards a session.
+        to_table(values): Returns the limits as a LimitsTable to export.
+        history(key, limit): Returns the last changes of a key.
+    """
+
+    def __init__(self, path):
+        """Opens the database in WAL mode and creates its tables."""
+
+        self.path = path
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the database."""
+
+        self.connection.close()
+
+    def transaction(self):
+        """Returns a context manager running its block as one transaction
+        that other writers wait for."""
+
+        return _Transaction(self.connection)
+
+    def meta(self, name):
+        """Returns a value of the meta table, None if it isn't set."""
+
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE name = ?", (name,)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self.connection.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    def sync(self, config_file_path_name, source="file"):
+        """Imports the '.config' file when it differs from the last one
+        imported or exported, recording every changed value in the history.
+
+        Parameters:
+            config_file_path_name (str): Path to the main configuration file.
+            source (str): What changed the file, as recorded in the history.
+
+        Returns:
+            OrderedDict: (old, new) per key that changed, None for new keys.
+        """
+
+        with open(config_file_path_name, "r") as i:
+            text = i.read()
+
+        if _digest(text) == self.meta("digest"):
+            return OrderedDict()
+
+        with span("store.import", path=config_file_path_name) as fields:
+            table = limits_table.LimitsTable(text)
+
+            with self.transaction():
+                old_values = dict(
+                    self.connection.execute("SELECT key, value FROM limits")
+                )
+                changes = OrderedDict(
+                    (record.key, (old_values.get(record.key), value))
+                    for record, value in zip(table.records, table.values)
+                    if old_values.get(record.key) != value
+                )
+
+                self.connection.execute("DELETE FROM limits")
+                self.connection.executemany(
+                    "INSERT INTO limits (key, value, position) VALUES (?, ?, ?)",
+                    (
+                        (record.key, value, index)
+                        for index, (record, value) in enumerate(
+                            zip(table.records, table.values)
+                        )
+                    ),
+                )
+
+                tags = [
+                    (tag, record.key)
+                    for index, record in enumerate(table.records)
+                    for tag in _tags(table, index)
+                ]
+                tags += [
+                    (f"show:{show}", table.records[index].key)
+                    for show, positions in table.show_positions.items()
+                    for index in positions
+                ]
+                self.connection.execute("DELETE FROM limit_tags")
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO limit_tags (tag, key) VALUES (?, ?)", tags
+                )
+
+                # The values found by the first import aren't changes
+                if self.meta("digest") is not None:
+                    self._record_history(changes, source)
+                self._set_meta("text", text)
+                self._set_meta("digest", _digest(text))
+
+            fields["changed"] = len(changes)
+
+        return changes
+
+    def _record_history(self, changes, source):
+        moment = time.time()
+        user = getpass.getuser()
+        host = socket.gethostname()
+
+        self.connection.executemany(
+            "INSERT INTO history (time, key, old, new, user, host, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (moment, key, old, new, user, host, source)
+                for key, (old, new) in changes.items()
+            ),
+        )
+
+    def value(self, key):
+        """Returns the value of a key.
+
+        Parameters:
+            key (str): Key of the limit, or path of a Shares weight.
+
+        Returns:
+            int: The value.
+
+        Raises:
+            KeyError: If the store doesn't have the key.
+        """
+
+        row = self.connection.execute(
+            "SELECT value FROM limits WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            raise KeyError(key)
+
+        return row[0]
+
+    def values(self, keys=None):
+        """Returns the value of several keys, of every key by default.
+
+        Parameters:
+            keys (list): Keys to return.
+
+        Returns:
+            OrderedDict: Value per key, in the order of the file.
+        """
+
+        if keys is None:
+            return OrderedDict(
+                self.connection.execute(
+                    "SELECT key, value FROM limits ORDER BY position"
+                )
+            )
+
+        return OrderedDict((key, self.value(key)) for key in keys)
+
+    def tagged(self, tag):
+        """Returns the keys of a tag with their values, e.g. the keys of the
+        Application Limits window with 'application' or of a show with
+        'show:pwp'.
+
+        Parameters:
+            tag (str): The tag.
+
+        Returns:
+            OrderedDict: Value per key, in the order of the file.
+        """
+
+        return OrderedDict(
+            self.connection.execute(
+                "SELECT key, value FROM limit_tags JOIN limits USING (key) "
+                "WHERE tag = ? ORDER BY position",
+                (tag,),
+            )
+        )
+
+    def update(self, values, source="store"):
+        """Changes several values in one transaction, all of them or none.
+
+        Parameters:
+            values (dict): New value per key.
+            source (str): What made the change, as recorded in the history.
+
+        Returns:
+            OrderedDict: (old, new) per key that changed.
+
+        Raises:
+            KeyError: If the store doesn't have one of the keys.
+        """
+
+        with self.transaction():
+            return self._apply(values, source)
+
+    def _apply(self, values, source):
+        changes = OrderedDict()
+        for key, value in values.items():
+            old_value = self.value(key)
+            if old_value != value:
+                changes[key] = (old_value, value)
+
+        self.connection.executemany(
+            "UPDATE limits SET value = ? WHERE key = ?",
+            ((new, key) for key, (_, new) in changes.items()),
+        )
+        self._record_history(changes, source)
+
+        return changes
+
+    def open_session(self):
+        """Starts a staging session.
+
+        Returns:
+            int: Id of the session.
+        """
+
+        return self.connection.execute(
+            "INSERT INTO sessions (user, host, created) VALUES (?, ?, ?)",
+            (getpass.getuser(), socket.gethostname(), time.time()),
+        ).lastrowid
+
+    def stage(self, session, values):
+        """Stages values in a session, replacing the ones staged before for
+        the same keys.
+
+        Parameters:
+            session (int): Id of the session.
+            values (dict): New value per key.
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: If the store doesn't have one of the keys.
+        """
+
+        with self.transaction():
+            for key in values:
+                self.value(key)
+
+            self.connection.executemany(
+                "INSERT INTO staged (session, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (session, key) DO UPDATE SET value = excluded.value",
+                ((session, key, value) for key, value in values.items()),
+            )
+
+    def staged(self, session):
+        """Returns the values staged in a session.
+
+        Parameters:
+            session (int): Id of the session.
+
+        Returns:
+            OrderedDict: Value per key.
+
+        Raises:
+            KeyError: If there is no such session, e.g. it was committed.
+        """
+
+        if (
+            self.connection.execute(
+                "SELECT 1 FROM sessions WHERE id = ?", (session,)
+            ).fetchone()
+            is None
+        ):
+            raise KeyError(f"session {session}")
+
+        return OrderedDict(
+            self.connection.execute(
+                "SELECT staged.key, staged.value FROM staged JOIN limits "
+                "USING (key) WHERE session = ? ORDER BY position",
+                (session,),
+            )
+        )
+
+    def discard(self, session):
+        """Discards a session and everything staged in it.
+
+        Parameters:
+            session (int): Id of the session.
+
+        Returns:
+            None
+        """
+
+        self.connection.execute("DELETE FROM sessions WHERE id = ?", (session,))
+
+    def to_table(self, values=None):
+        """Returns the limits of the store as a LimitsTable, whose render()
+        is the '.config' file to export.
+
+        Parameters:
+            values (dict): Values to use instead of the ones of the store.
+
+        Returns:
+            LimitsTable: The limits.
+        """
+
+        table = limits_table.LimitsTable(self.meta("text"))
+
+        for key, value in self.values().items():
+            table.set_value(key, value)
+        for key, value in (values or {}).items():
+            table.set_value(key, value)
+
+        return table
+
+    def history(self, key, limit=20):
+        """Returns the last changes of a key, newest first.
+
+        Parameters:
+            key (str): Key of the limit.
+            limit (int): Changes returned at most.
+
+        Returns:
+            list: (time, old, new, user, host, source) per change.
+        """
+
+        return self.connection.execute(
+            "SELECT time, old, new, user, host, source FROM history "
+            "WHERE key = ? ORDER BY time DESC LIMIT ?",
+            (key, limit),
+        ).fetchall()
+
+
+class _Transaction:
+    """Runs a block as one write transaction, see LimitsStore.transaction()."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+
+
+def open_store(config_file_path_name):
+    """Opens the store of a farm if it has one.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        LimitsStore: The store, or None if the farm has none.
+    """
+
+    path = store_file_path(config_file_path_name)
+
+    if not os.path.exists(path):
+        return None
+
+    return LimitsStore(path)
+
+
+def commit_session(
+    store,
+    session,
+    config_file_path_name,
+    backup_folder,
+    engine_url=None,
+    reload_command=None,
+    source="store",
+):
+    """Applies the values staged in a session and exports the '.config' file,
+    then reloads Tractor and verifies them, see limits_config.commit_config().
+    A '.config' file changed by hand since the last export is imported first.
+
+    Session commits hold a lock file next to the store from that import until
+    the store is updated, so sessions committed at the same time export one
+    after the other, each one from the values the previous one left. The
+    store itself is only locked for the short transactions of the import and
+    the update, never while Tractor reloads, so other writers don't wait for
+    the engine.
+
+    Parameters:
+        store (LimitsStore): The store of the farm.
+        session (int): Id of the session.
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+        engine_url (str): Website containing the live '.config' file info.
+        reload_command (str): Shell command that reloads the config.
+        source (str): What made the commit, as recorded in the history.
+
+    Returns:
+        tuple: (changes, mismatches, reloads) with (old, new) per key that
+        changed, the keys still not live and the extra reloads needed.
+
+    Raises:
+        KeyError: If there is no such session, or one of its keys is gone.
+    """
+
+    lock_path = f"{store.path}{COMMIT_LOCK_SUFFIX}"
+
+    with span("store.commit", session=session) as fields, open(
+        lock_path, "a"
+    ) as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        store.sync(config_file_path_name)
+        staged = store.staged(session)
+        new_values = OrderedDict(
+            (key, value) for key, value in staged.items() if store.value(key) != value
+        )
+        fields["keys"] = len(new_values)
+        digest = store.meta("digest")
+
+        mismatches, reloads = OrderedDict(), 0
+        if new_values:
+            table = store.to_table(new_values)
+            mismatches, reloads = limits_config.commit_config(
+                table,
+                new_values,
+                config_file_path_name,
+                backup_folder,
+                engine_url,
+                reload_command,
+                source,
+            )
+
+        # Only once the file was written, so the store never gets ahead of it
+        with store.transaction():
+            changes = store._apply(new_values, source)
+            store.discard(session)
+            # Unless a commit outside of the store (e.g. the UI) imported a
+            # newer file meanwhile, the next sync then compares against it
+            if new_values and store.meta("digest") == digest:
+                text = table.render()
+                store._set_meta("text", text)
+                store._set_meta("digest", _digest(text))
+
+    return changes, mismatches, reloads
+
+
+def record_commit(config_file_path_name, source="ui"):
+    """Records a commit made to the '.config' file in the store of the farm,
+    if the farm has one.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        source (str): What made the commit, as recorded in the history.
+
+    Returns:
+        None
+    """
+
+    store = open_store(config_file_path_name)
+    if store is None:
+        return
+
+    try:
+        store.sync(config_file_path_name, source)
+    finally:
+        store.close()
+
+
+def _parse_values(assignments):
+    """Returns the values of 'KEY=VALUE' arguments."""
+
+    values = OrderedDict()
+    for assignment in assignments:
+        key, _, value = assignment.partition("=")
+        values[key] = int(value)
+
+    return values
+
+
+def main(argv=None):
+    """Parses the command line and runs one command on the store.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--config", default=CONFIG_FILE_PATH_NAME)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("import", help="create or update the store")
+    get_parser = commands.add_parser("get", help="print values")
+    get_parser.add_argument("keys", nargs="+")
+    keys_parser = commands.add_parser("keys", help="print keys and values")
+    keys_group = keys_parser.add_mutually_exclusive_group(required=True)
+    keys_group.add_argument("--applications", action="store_true")
+    keys_group.add_argument("--show", default=None)
+    keys_group.add_argument("--shares", action="store_true")
+    stage_parser = commands.add_parser("stage", help="stage new values")
+    stage_parser.add_argument("values", nargs="+", metavar="KEY=VALUE")
+    stage_parser.add_argument("--session", type=int, default=None)
+    commit_parser = commands.add_parser("commit", help="commit a session")
+    commit_parser.add_argument("--session", type=int, required=True)
+    commit_parser.add_argument("--backup", default=BACKUP_FOLDER)
+    history_parser = commands.add_parser("history", help="print the changes of a key")
+    history_parser.add_argument("key")
+    history_parser.add_argument("--limit", type=int, default=20)
+    export_parser = commands.add_parser("export", help="write the '.config' file")
+    export_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    limits_tracing.configure()
+
+    path = store_file_path(args.config)
+    if args.command != "import" and not os.path.exists(path):
+        LOGGER.error("There is no store yet, create it with 'import'")
+        return 1
+
+    store = LimitsStore(path)
+    try:
+        if args.command == "import":
+            changes = store.sync(args.config)
+            LOGGER.info("%d values imported into %s", len(changes), path)
+        elif args.command == "get":
+            print(json.dumps(store.values(args.keys), indent=4))
+        elif args.command == "keys":
+            if args.applications:
+                tag = "application"
+            elif args.shares:
+                tag = "share"
+            else:
+                tag = f"show:{args.show.lower()}"
+            for key, value in store.tagged(tag).items():
+                print(f"{key}\t{value}")
+        elif args.command == "stage":
+            session = args.session or store.open_session()
+            store.stage(session, _parse_values(args.values))
+            print(f"Staged in session {session}")
+        elif args.command == "commit":
+            changes, mismatches, reloads = commit_session(
+                store, args.session, args.config, args.backup, source="cli"
+            )
+            LOGGER.info("%d keys written, %d extra reloads", len(changes), reloads)
+            for key, (web_value, limit) in mismatches.items():
+                LOGGER.warning("%s %s %s", key, web_value, limit)
+            return 1 if mismatches else 0
+        elif args.command == "history":
+            for moment, old, new, user, host, source in store.history(
+                args.key, args.limit
+            ):
+                print(f"{time.ctime(moment)}\t{old} -> {new}\t{user}@{host}\t{source}")
+        elif args.command == "export":
+            store.to_table().write(args.path)
+    except KeyError as error:
+        LOGGER.error("Unknown key or session: %s", error)
+        return 1
+    finally:
+        store.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
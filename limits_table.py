@@ -0,0 +1,643 @@
+#!/usr/bin/python3
+
+"""
+Compact in-memory table of the limits of a Tractor '.config' file, shared by
+every window of the Farm UI instead of a full OrderedDict tree per window.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+The table keeps:
+
+    - the original file only as text, so writing it back only replaces the
+      digits of the values that changed and keeps everything else (order,
+      indentation, other settings) exactly as it was
+    - one interned key per limit and per Shares weight of the Linux farm
+    - every value in a single integer array
+    - a slotted record per key with its category and where its value is in
+      the text
+    - precomputed category masks (one bit per key) for the applications and
+      the 'yeti_' tags, and the positions of the tags of every show, so no
+      window has to scan the keys by substring again
+
+Keys are the same ones limits_config.get_limit_value() understands, e.g.
+'pwp_katana' or 'linuxfarm/Shares/pwp/share'.
+"""
+
+import json
+import os
+import re
+import sys
+from array import array
+from collections import OrderedDict
+from json.decoder import scanstring
+
+import limits_config
+from limits_tracing import span
+
+# Categories of the keys, a key can be in more than one
+CATEGORY_FARM = 1  # e.g. 'linuxfarm', 'windowsfarm'
+CATEGORY_SHARE = 2  # Shares weight of a show of the Linux farm
+CATEGORY_SHOW = 4  # Tag of a show, e.g. 'pwp_katana'
+CATEGORY_APPLICATION = 8  # Tag of an application, e.g. 'katana'
+CATEGORY_YETI = 16  # 'yeti_' tags
+
+# Words keeping a key out of the applications, besides the names of the shows
+NOT_APPLICATION_WORDS = ("linux", "windows", "yeti")
+YETI_PREFIX = "yeti_"
+SHARES_PATH = ("linuxfarm", "Shares")
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Tables already loaded, per path: (modification time, size, table)
+_loaded_tables = {}
+
+
+class LimitRecord:
+    """Metadata of one key of the table. Where its value is in the text is
+    kept in LimitsTable.spans instead, next to the other numbers.
+
+    Attributes:
+        key (str): Key of the limit, interned.
+        category (int): CATEGORY_* bits of the key.
+    """
+
+    __slots__ = ("key", "category")
+
+    def __init__(self, key, category):
+        self.key = key
+        self.category = category
+
+    def __repr__(self):
+        return f"LimitRecord({self.key!r}, category={self.category})"
+
+
+class LimitsTable:
+    """Limits of a configuration file, see the module documentation.
+
+    Args:
+        text (str): Contents of the configuration file.
+
+    Attributes:
+        text (str): Contents of the file the table was read from.
+        records (list): LimitRecord of every key, in the order of the file.
+        values (array): Current value of every key, same order as records.
+        spans (array): Start and end of the value of every key in the text,
+        two numbers per key.
+        positions (dict): Index in records per key.
+        shows (tuple): Names of the shows in the Shares of the Linux farm.
+        show_positions (dict): Positions in records of the tags of every
+        show, per lower case name.
+        category_masks (dict): Mask of the keys per CATEGORY_* bit.
+        modified (bool): Whether a value was changed since reading the text.
+
+    Methods:
+        from_file(path): Reads a configuration file.
+        from_state(state): Rebuilds a table sent by to_state().
+        to_state(): Returns the table as JSON-friendly lists, already scanned.
+        value(key): Returns the value of a key.
+        set_value(key, value): Changes the value of a key.
+        keys_in(mask): Returns the keys of a mask.
+        application_keys(): Returns the keys of the applications.
+        show_keys(show): Returns the keys shown for a show.
+        share_keys(): Returns the key of the weight of every show.
+        limit_values(): Returns the 'SiteMax' of every limit.
+        changed_values(other): Returns the values that differ in another table.
+        render(): Returns the text with the current values.
+    """
+
+    def __init__(self, text):
+        """Scans the text, see the module documentation."""
+
+        self.text = text
+        self.records = []
+        self.values = array("l")
+        self.spans = array("l")
+        self.positions = {}
+        self.shows = ()
+        self.show_positions = {}
+        self.category_masks = {}
+        self.modified = False
+
+        _LimitsScanner(self).scan()
+        self._classify()
+
+    @classmethod
+    def from_file(cls, path):
+        """Reads a configuration file into a table.
+
+        Parameters:
+            path (str): Path to the configuration file.
+
+        Returns:
+            LimitsTable: The table.
+        """
+
+        with span("config.read", path=path, table=True):
+            with open(path, "r") as i:
+                return cls(i.read())
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuilds a table from what to_state() returned, e.g. in another
+        process, without scanning or classifying the text again.
+
+        Parameters:
+            state (dict): The table, see to_state().
+
+        Returns:
+            LimitsTable: The table.
+        """
+
+        table = cls.__new__(cls)
+        table.text = state["text"]
+        table.records = [
+            LimitRecord(sys.intern(key), category)
+            for key, category in zip(state["keys"], state["categories"])
+        ]
+        table.values = array("l", state["values"])
+        table.spans = array("l", state["spans"])
+        table.positions = {
+            record.key: index for index, record in enumerate(table.records)
+        }
+        table.shows = tuple(state["shows"])
+        table.show_positions = {
+            show: array("l", positions)
+            for show, positions in state["show_positions"].items()
+        }
+        # In hexadecimal, decimal text of masks this long is slow to convert
+        table.category_masks = {
+            int(flag): int(mask, 16) for flag, mask in state["category_masks"].items()
+        }
+        table.modified = False
+
+        return table
+
+    def to_state(self):
+        """Returns the table as JSON-friendly lists, see from_state().
+
+        Returns:
+            dict: The text, the keys with their category, value and span, and
+            the shows and masks found by the classification.
+        """
+
+        return {
+            "text": self.text,
+            "keys": [record.key for record in self.records],
+            "categories": [record.category for record in self.records],
+            "values": self.values.tolist(),
+            "spans": self.spans.tolist(),
+            "shows": list(self.shows),
+            "show_positions": {
+                show: positions.tolist()
+                for show, positions in self.show_positions.items()
+            },
+            "category_masks": {
+                flag: format(mask, "x") for flag, mask in self.category_masks.items()
+            },
+        }
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def _add(self, key, category, start, end, value):
+        """Adds a key found by the scanner."""
+
+        key = sys.intern(key)
+        self.positions[key] = len(self.records)
+        self.records.append(LimitRecord(key, category))
+        self.values.append(value)
+        self.spans.append(start)
+        self.spans.append(end)
+
+    def _classify(self):
+        """Precomputes the category masks the windows filter keys with.
+
+        A key is a tag of a show when it contains the show name followed by
+        '_', and an application when it contains no show name and none of
+        NOT_APPLICATION_WORDS, the same rules the windows always used.
+        """
+
+        show_names = {show.lower() for show in self.shows if show}
+        longest_name = max(map(len, show_names), default=0)
+        masks = {
+            CATEGORY_FARM: 0,
+            CATEGORY_SHARE: 0,
+            CATEGORY_SHOW: 0,
+            CATEGORY_APPLICATION: 0,
+            CATEGORY_YETI: 0,
+        }
+        show_positions = {name: array("l") for name in show_names}
+
+        for index, record in enumerate(self.records):
+            bit = 1 << index
+            key = record.key
+
+            if record.category & CATEGORY_SHARE:
+                masks[CATEGORY_SHARE] |= bit
+                continue
+
+            category = 0
+            if "linux" in key or "windows" in key:
+                category |= CATEGORY_FARM
+            if YETI_PREFIX in key:
+                category |= CATEGORY_YETI
+
+            # Every show whose name is right before a '_' of the key
+            tagged_shows = set()
+            end = key.find("_")
+            while end != -1:
+                for start in range(max(end - longest_name, 0), end):
+                    if key[start:end] in show_names:
+                        tagged_shows.add(key[start:end])
+                end = key.find("_", end + 1)
+
+            for name in tagged_shows:
+                show_positions[name].append(index)
+                category |= CATEGORY_SHOW
+
+            if (
+                not tagged_shows
+                and all(word not in key for word in NOT_APPLICATION_WORDS)
+                and not _contains_any(key, show_names, longest_name)
+            ):
+                category |= CATEGORY_APPLICATION
+
+            record.category = category
+            for flag in masks:
+                if category & flag:
+                    masks[flag] |= bit
+
+        self.category_masks = masks
+        self.show_positions = show_positions
+
+    def value(self, key):
+        """Returns the current value of a key.
+
+        Parameters:
+            key (str): Key of the limit, or path of a Shares weight.
+
+        Returns:
+            int: The value.
+        """
+
+        return self.values[self.positions[key]]
+
+    def set_value(self, key, value):
+        """Changes the value of a key.
+
+        Parameters:
+            key (str): Key of the limit, or path of a Shares weight.
+            value (int): New value.
+
+        Returns:
+            None
+        """
+
+        index = self.positions[key]
+        if self.values[index] != value:
+            self.values[index] = value
+            self.modified = True
+
+    def keys_in(self, mask):
+        """Returns the keys of a mask, in the order of the file.
+
+        Parameters:
+            mask (int): One bit per index of the records.
+
+        Returns:
+            list: The keys.
+        """
+
+        keys = []
+        while mask:
+            lowest = mask & -mask
+            keys.append(self.records[lowest.bit_length() - 1].key)
+            mask ^= lowest
+
+        return keys
+
+    def application_keys(self):
+        """Returns the keys shown in the Application Limits window.
+
+        Returns:
+            list: The keys.
+        """
+
+        return self.keys_in(self.category_masks[CATEGORY_APPLICATION])
+
+    def show_keys(self, show):
+        """Returns the keys shown in the Show Limits window of a show, its
+        tags followed by the 'yeti_' tags for PWP.
+
+        Parameters:
+            show (str): Name of the show, in any case.
+
+        Returns:
+            list: The keys.
+        """
+
+        show = show.lower()
+        keys = [self.records[index].key for index in self.show_positions.get(show, ())]
+
+        if "pwp" in show:
+            keys += self.keys_in(self.category_masks[CATEGORY_YETI])
+
+        return keys
+
+    def share_keys(self):
+        """Returns the key of the weight of every show of the Linux farm, the
+        same as limits_shares.share_keys().
+
+        Returns:
+            OrderedDict: Key per show.
+        """
+
+        return OrderedDict(
+            (key.split(limits_config.PATH_SEPARATOR)[len(SHARES_PATH)], key)
+            for key in self.keys_in(self.category_masks[CATEGORY_SHARE])
+        )
+
+    def limit_values(self):
+        """Returns the 'SiteMax' of every limit, the same as
+        limits_constraints.limit_values().
+
+        Returns:
+            OrderedDict: Value per limit key.
+        """
+
+        return OrderedDict(
+            (record.key, value)
+            for record, value in zip(self.records, self.values)
+            if not record.category & CATEGORY_SHARE
+        )
+
+    def changed_values(self, other):
+        """Returns the keys whose value differs in another table, e.g. the
+        same file read again after someone else wrote it. Keys only one of the
+        tables has are left out.
+
+        Parameters:
+            other (LimitsTable): Table to compare with.
+
+        Returns:
+            OrderedDict: (value here, value in other) per key that differs.
+        """
+
+        changes = OrderedDict()
+
+        for key, index in other.positions.items():
+            position = self.positions.get(key)
+            if position is not None and self.values[position] != other.values[index]:
+                changes[key] = (self.values[position], other.values[index])
+
+        return changes
+
+    def render(self):
+        """Returns the text of the file with the current values, replacing
+        only the values that changed.
+
+        Returns:
+            str: Contents of the configuration file.
+        """
+
+        pieces = []
+        position = 0
+
+        for index, value in enumerate(self.values):
+            start, end = self.spans[2 * index], self.spans[2 * index + 1]
+            number = str(value)
+            if self.text[start:end] != number:
+                pieces.append(self.text[position:start])
+                pieces.append(number)
+                position = end
+
+        pieces.append(self.text[position:])
+
+        return "".join(pieces)
+
+    def write(self, path):
+        """Writes the current values to a file.
+
+        Parameters:
+            path (str): Path of the file.
+
+        Returns:
+            None
+        """
+
+        with open(path, "w") as o:
+            o.write(self.render())
+
+
+class _LimitsScanner:
+    """Walks the JSON text recording where the values of the table are. Only
+    the objects leading to a value are walked, everything else is skipped with
+    the C decoder of the json module."""
+
+    def __init__(self, table):
+        self.table = table
+        self.text = table.text
+        self.decoder = json.JSONDecoder()
+
+    def skip_whitespace(self, position):
+        return _WHITESPACE.match(self.text, position).end()
+
+    def expect(self, position, character):
+        position = _WHITESPACE.match(self.text, position).end()
+        if self.text[position : position + 1] != character:
+            raise json.JSONDecodeError(f"Expecting '{character}'", self.text, position)
+        return position + 1
+
+    def skip(self, position):
+        """Returns the value at position and the position right after it."""
+
+        return self.decoder.raw_decode(self.text, position)
+
+    def walk(self, position, on_item):
+        """Walks the object starting at position. on_item(key, position) is
+        called for every item and returns the end of its value.
+
+        Returns the position right after the object."""
+
+        text = self.text
+        whitespace = _WHITESPACE.match
+        position = whitespace(text, self.expect(position, "{")).end()
+
+        if text[position : position + 1] == "}":
+            return position + 1
+
+        while True:
+            if text[position : position + 1] != '"':
+                self.expect(position, '"')
+            key, position = scanstring(text, position + 1)
+            position = whitespace(text, position).end()
+            if text[position : position + 1] != ":":
+                self.expect(position, ":")
+            position = on_item(key, whitespace(text, position + 1).end())
+            position = whitespace(text, position).end()
+
+            if text[position : position + 1] != ",":
+                return self.expect(position, "}")
+            position = whitespace(text, position + 1).end()
+
+    def is_object(self, position):
+        return self.text[position : position + 1] == "{"
+
+    def scan(self):
+        table = self.table
+
+        def on_root(key, position):
+            if key == "Limits" and self.is_object(position):
+                return self.walk(position, on_limit)
+            return self.skip(position)[1]
+
+        def on_limit(limit, position):
+            if not self.is_object(position):
+                return self.skip(position)[1]
+
+            def on_setting(setting, position):
+                if setting == "Shares" and limit == SHARES_PATH[0]:
+                    if self.is_object(position):
+                        return self.walk(position, on_share)
+                value, end = self.skip(position)
+                if setting == "SiteMax" and _is_integer(value):
+                    table._add(limit, 0, position, end, value)
+                return end
+
+            return self.walk(position, on_setting)
+
+        shows = []
+
+        def on_share(show, position):
+            shows.append(show)
+            parts = SHARES_PATH + (show,)
+
+            if not self.is_object(position):
+                value, end = self.skip(position)
+                if _is_integer(value):
+                    table._add(
+                        limits_config.PATH_SEPARATOR.join(parts),
+                        CATEGORY_SHARE,
+                        position,
+                        end,
+                        value,
+                    )
+                return end
+
+            def on_weight(setting, position):
+                value, end = self.skip(position)
+                if setting == "share" and _is_integer(value):
+                    table._add(
+                        limits_config.PATH_SEPARATOR.join(parts + (setting,)),
+                        CATEGORY_SHARE,
+                        position,
+                        end,
+                        value,
+                    )
+                return end
+
+            return self.walk(position, on_weight)
+
+        end = self.walk(self.skip_whitespace(0), on_root)
+        if self.skip_whitespace(end) != len(self.text):
+            raise json.JSONDecodeError("Extra data", self.text, end)
+
+        table.shows = tuple(sys.intern(show) for show in shows)
+
+
+def _contains_any(key, names, longest_name):
+    """Returns whether any of the names is part of the key."""
+
+    return any(
+        key[start:end] in names
+        for end in range(1, len(key) + 1)
+        for start in range(max(end - longest_name, 0), end)
+    )
+
+
+def _is_integer(value):
+    """Returns whether a decoded value is a plain integer."""
+
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def load_table(path, loader=None):
+    """Returns the table of a configuration file, shared with every window
+    that loaded the same file as long as it didn't change on disk and nobody
+    changed its values.
+
+    Parameters:
+        path (str): Path to the configuration file.
+        loader (callable): Called with the real path of the file when it has
+        to be loaded, returns (modification time, size, table) as they were
+        when the table was read, or None to read the file here.
+
+    Returns:
+        LimitsTable: The table.
+    """
+
+    real_path = os.path.realpath(path)
+    status = os.stat(real_path)
+    loaded = _loaded_tables.get(real_path)
+
+    if loaded is not None:
+        modified_time, size, table = loaded
+        if (
+            modified_time == status.st_mtime_ns
+            and size == status.st_size
+            and not table.modified
+        ):
+            return table
+
+    loaded = loader(real_path) if loader is not None else None
+    if loaded is None:
+        # The status is taken before reading, a change made meanwhile is read
+        # again next time
+        table = LimitsTable.from_file(real_path)
+        loaded = (status.st_mtime_ns, status.st_size, table)
+    _loaded_tables[real_path] = loaded
+
+    return loaded[2]
+
+
+def session_file_path(config_file_path_name, temp_folder):
+    """Returns the path of the staged 'temp.config' if there is one,
+    otherwise of the main configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+
+    Returns:
+        str: The path.
+    """
+
+    tmp_file_name = f"{temp_folder}{limits_config.TEMP_FILE_NAME}"
+
+    if os.path.exists(tmp_file_name):
+        return tmp_file_name
+
+    return config_file_path_name
+
+
+def load_session_table(config_file_path_name, temp_folder, loader=None):
+    """Returns the table of the staged 'temp.config' if there is one,
+    otherwise of the main configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+        loader (callable): Loads the table when it isn't loaded yet, see
+        load_table().
+
+    Returns:
+        LimitsTable: The table.
+    """
+
+    return load_table(session_file_path(config_file_path_name, temp_folder), loader)
@@ -0,0 +1,206 @@
+#!/usr/bin/python3
+
+"""
+Phase timing for the Farm UI. Every phase of the change workflow (reading the
+config, classifying keys, building widgets, staging, committing, every reload
+and every poll of the engine) runs inside a span, which is logged through the
+'limits' logger with its duration once it finishes.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Environment variables read by configure():
+
+    LIMITS_LOG_FILE     Also write the log as JSON lines to this file.
+    LIMITS_TRACE_FILE   Write every span to this file in the Chrome trace
+                        format when the program exits, to be opened with
+                        chrome://tracing or https://ui.perfetto.dev
+    LIMITS_LOG_LEVEL    Level of the terminal log, INFO by default. Spans are
+                        logged at DEBUG level.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import limits_profiling
+
+LOGGER = logging.getLogger("limits")
+
+# Chrome trace events collected while LIMITS_TRACE_FILE is set
+TRACE_EVENTS = []
+_trace_lock = threading.Lock()
+_trace_path = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats every record as one JSON object, including the fields of the
+    span that produced it."""
+
+    def format(self, record):
+        """Returns the record as a JSON line.
+
+        Parameters:
+            record (LogRecord): The record to format.
+
+        Returns:
+            str: The record as JSON.
+        """
+
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+def configure(log_file=None, trace_file=None, level=None):
+    """Sets up the terminal log, and the JSON log file and trace file if
+    asked to. Calling it again only adds what wasn't set up yet.
+
+    Parameters:
+        log_file (str): Path of the JSON lines log, defaults to LIMITS_LOG_FILE.
+        trace_file (str): Path of the Chrome trace, defaults to LIMITS_TRACE_FILE.
+        level (str): Level of the terminal log, defaults to LIMITS_LOG_LEVEL.
+
+    Returns:
+        None
+    """
+
+    global _trace_path
+
+    log_file = log_file or os.environ.get("LIMITS_LOG_FILE")
+    trace_file = trace_file or os.environ.get("LIMITS_TRACE_FILE")
+    level = level or os.environ.get("LIMITS_LOG_LEVEL", "INFO")
+
+    LOGGER.setLevel(logging.DEBUG)
+
+    if not any(
+        isinstance(handler, logging.StreamHandler)
+        and not isinstance(handler, logging.FileHandler)
+        for handler in LOGGER.handlers
+    ):
+        terminal_handler = logging.StreamHandler()
+        terminal_handler.setLevel(level.upper())
+        terminal_handler.setFormatter(logging.Formatter("%(message)s"))
+        LOGGER.addHandler(terminal_handler)
+
+    if log_file and not any(
+        isinstance(handler, logging.FileHandler)
+        and handler.baseFilename == os.path.abspath(log_file)
+        for handler in LOGGER.handlers
+    ):
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(JsonLinesFormatter())
+        LOGGER.addHandler(file_handler)
+
+    if trace_file and _trace_path is None:
+        _trace_path = trace_file
+        atexit.register(write_trace)
+
+
+@contextmanager
+def span(name, profile=False, **fields):
+    """Times the code run inside the 'with' block.
+
+    The span is logged at DEBUG level with its duration and fields, and is
+    added to the Chrome trace when tracing is enabled. Fields can be added
+    while the span runs through the dictionary it yields.
+
+    Parameters:
+        name (str): Name of the phase, e.g. 'config.read'.
+        profile (bool): Also profile the phase when profiling is enabled, see
+        limits_profiling.
+        **fields: Extra information recorded with the span.
+
+    Yields:
+        dict: The fields of the span.
+    """
+
+    start = time.perf_counter()
+    wall_start = time.time()
+    failed = False
+
+    try:
+        with ExitStack() as stack:
+            if profile:
+                stack.enter_context(limits_profiling.profiled(name))
+            yield fields
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        record_fields = dict(fields, span=name, duration_ms=duration * 1000)
+        if failed:
+            record_fields["failed"] = True
+
+        LOGGER.debug(
+            "%s took %.1f ms", name, duration * 1000, extra={"fields": record_fields}
+        )
+
+        if _trace_path is not None:
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": wall_start * 1e6,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": fields,
+            }
+            with _trace_lock:
+                TRACE_EVENTS.append(event)
+
+
+def traced(name, profile=False):
+    """Decorator running a whole function inside a span.
+
+    Parameters:
+        name (str): Name of the phase.
+        profile (bool): Also profile the phase when profiling is enabled.
+
+    Returns:
+        function: The decorator.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name, profile):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def write_trace():
+    """Writes every span collected so far to the Chrome trace file.
+
+    Returns:
+        None
+    """
+
+    if _trace_path is None:
+        return
+
+    with _trace_lock:
+        events = list(TRACE_EVENTS)
+
+    with open(_trace_path, "w") as o:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, o, default=str)
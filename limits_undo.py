@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+
+"""
+Undo/Redo history of the changes staged during a session of the Farm UI.
+Every time changes are staged a command holding only their deltas is pushed,
+no matter if they came from the Show or the Application windows. Undoing or
+redoing a command is applied straight to the contents already in memory, so
+the config file never has to be read again.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+from collections import OrderedDict
+
+import limits_config
+
+
+class StageCommand:
+    """One staging of changes, stored as (key, old, new) deltas.
+
+    Args:
+        changes (dict): (old, new) per limit key, as returned by
+        LimitsChangeSet.changes().
+
+    Methods:
+        apply(contents_dict): Sets the new values of the command.
+        revert(contents_dict): Sets back the old values of the command.
+        description(): Short text describing the command.
+    """
+
+    __slots__ = ("changes",)
+
+    def __init__(self, changes):
+        """Stores the deltas as a tuple of (key, old, new) tuples."""
+
+        self.changes = tuple((key, old, new) for key, (old, new) in changes.items())
+
+    def apply(self, contents_dict):
+        """Sets the new values of the command.
+
+        Parameters:
+            contents_dict (dict): Contents of the configuration file.
+
+        Returns:
+            None
+        """
+
+        for key, _, new in self.changes:
+            limits_config.set_limit_value(contents_dict, key, new)
+
+    def revert(self, contents_dict):
+        """Sets back the old values of the command.
+
+        Parameters:
+            contents_dict (dict): Contents of the configuration file.
+
+        Returns:
+            None
+        """
+
+        for key, old, _ in self.changes:
+            limits_config.set_limit_value(contents_dict, key, old)
+
+    def description(self):
+        """Returns a short text describing the command.
+
+        Returns:
+            str: Keys changed by the command.
+        """
+
+        keys = [key for key, _, _ in self.changes]
+        if len(keys) > 3:
+            return f"{', '.join(keys[:3])} and {len(keys) - 3} more"
+        return ", ".join(keys)
+
+
+class LimitsUndoStack:
+    """Undo/Redo history shared by every window of a session.
+
+    Attributes:
+        undo_commands (list): Commands that can be undone, oldest first.
+        redo_commands (list): Commands that can be redone, most recent last.
+
+    Methods:
+        push(command): Adds a command that was just applied.
+        undo(contents_dict): Reverts the last applied command.
+        redo(contents_dict): Applies again the last reverted command.
+        net_changes(): Returns the overall (old, new) of the session per key.
+        clear(): Forgets the whole history.
+    """
+
+    def __init__(self):
+        """Initializes an empty history."""
+
+        self.undo_commands = []
+        self.redo_commands = []
+
+    def __bool__(self):
+        return bool(self.undo_commands or self.redo_commands)
+
+    def push(self, command):
+        """Adds a command that was just applied. Anything that could be redone
+        is forgotten.
+
+        Parameters:
+            command (StageCommand): The command that was applied.
+
+        Returns:
+            None
+        """
+
+        self.undo_commands.append(command)
+        self.redo_commands.clear()
+
+    def undo(self, contents_dict):
+        """Reverts the last applied command.
+
+        Parameters:
+            contents_dict (dict): Contents of the configuration file.
+
+        Returns:
+            StageCommand: The reverted command, or None if there was nothing to undo.
+        """
+
+        if not self.undo_commands:
+            return None
+
+        command = self.undo_commands.pop()
+        command.revert(contents_dict)
+        self.redo_commands.append(command)
+
+        return command
+
+    def redo(self, contents_dict):
+        """Applies again the last reverted command.
+
+        Parameters:
+            contents_dict (dict): Contents of the configuration file.
+
+        Returns:
+            StageCommand: The applied command, or None if there was nothing to redo.
+        """
+
+        if not self.redo_commands:
+            return None
+
+        command = self.redo_commands.pop()
+        command.apply(contents_dict)
+        self.undo_commands.append(command)
+
+        return command
+
+    def net_changes(self):
+        """Folds every applied command into the overall change of the session.
+
+        Returns:
+            OrderedDict: (old, new) per limit key that ends up being different.
+        """
+
+        net = OrderedDict()
+
+        for command in self.undo_commands:
+            for key, old, new in command.changes:
+                first_old = net[key][0] if key in net else old
+                net[key] = (first_old, new)
+
+        return OrderedDict(
+            (key, (old, new)) for key, (old, new) in net.items() if old != new
+        )
+
+    def clear(self):
+        """Forgets the whole history.
+
+        Returns:
+            None
+        """
+
+        self.undo_commands.clear()
+        self.redo_commands.clear()
+
+
+# History of the running session, shared by every window
+SESSION_UNDO_STACK = LimitsUndoStack()
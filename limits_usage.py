@@ -0,0 +1,760 @@
+#!/usr/bin/python3
+
+"""
+Usage history of the limits reported by the Tractor engine and 'SiteMax'
+recommendations computed from it. Every poll of the engine is folded into
+hourly buckets (samples, peak in use, total in use, samples at 'SiteMax' and
+idle license seconds per tag) kept in a single memory-mappable file next to
+the '.config' file, so months of history for thousands of tags are read as a
+few strided columns per tag without parsing anything.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Layout of the usage file:
+
+    b"LUSG" | header length (uint32) | JSON header | padding to 8 bytes |
+    one record per hour: hour start, time of its last sample (int64) and for
+    every key of the header: samples, peak, total in use, samples at
+    'SiteMax', idle license seconds (int64)
+
+A new tag reported by the engine rewrites the file once with the new key, every
+other sample only updates the record of the current hour, or appends one.
+
+The recommendations size every limit for the 95th percentile of its hourly
+peaks plus HEADROOM, and grow the limits that sat at 'SiteMax' too often by at
+least SATURATED_GROWTH, since their peaks only show the limit and not the
+demand. They can be loaded into the Application and Show Limits windows as
+proposed values, reviewed there and submitted like any other change.
+
+Usage:
+    limits_usage.py [--farm NAME] sample
+    limits_usage.py [--farm NAME] report [--days N]
+    limits_usage.py [--farm NAME] recommend [--days N] [--open]
+"""
+
+import argparse
+import fcntl
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import compress
+
+import limits_config
+import limits_farms
+import limits_table
+from limits_tracing import LOGGER, span, traced
+
+USAGE_FILE_NAME = "limits_usage.dat"
+MAGIC = b"LUSG"
+
+# Fields of every limit reported by the engine holding the slots in use and
+# the tasks waiting for one
+IN_USE_FIELD = "InUse"
+WAITING_FIELD = "Waiting"
+
+BUCKET_SECONDS = 3600
+# Longer gaps between samples (engine down, sampler stopped) only count this
+# many idle seconds
+MAX_SAMPLE_GAP = 300
+
+# Fields of every key in a record, after the hour and the time of its last sample
+FIELDS = ("samples", "peak", "in_use_total", "saturated", "idle_seconds")
+RECORD_HEAD = 2
+
+# Recommendations
+DEFAULT_DAYS = 90
+HEADROOM = 0.1
+SATURATION_THRESHOLD = 0.02
+SATURATED_GROWTH = 0.2
+MINIMUM_HOURS = 24
+MINIMUM_CHANGE = 0.1
+MINIMUM_SITE_MAX = 1
+
+# Style of the spin boxes holding a proposed value
+PROPOSED_STYLE_SHEET = "color: cyan"
+
+
+def usage_file_path(config_file_path_name):
+    """Returns the path of the usage file of a configuration file.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+
+    Returns:
+        str: Path to the usage file.
+    """
+
+    return os.path.join(
+        os.path.dirname(os.path.abspath(config_file_path_name)), USAGE_FILE_NAME
+    )
+
+
+def engine_usage(engine_dict):
+    """Collects the slots in use, the 'SiteMax' and the tasks waiting of every
+    limit reported by the engine.
+
+    Parameters:
+        engine_dict (dict): Limits as reported by the engine.
+
+    Returns:
+        dict: (in_use, site_max, waiting) per limit key, waiting is -1 when
+        the engine doesn't report it.
+    """
+
+    usage = {}
+
+    for key, limit in engine_dict.get("Limits", {}).items():
+        if not isinstance(limit, dict):
+            continue
+
+        in_use = limit.get(IN_USE_FIELD)
+        site_max = limit.get("SiteMax")
+        waiting = limit.get(WAITING_FIELD)
+        if isinstance(in_use, int) and isinstance(site_max, int):
+            usage[key] = (
+                in_use,
+                site_max,
+                waiting if isinstance(waiting, int) else -1,
+            )
+
+    return usage
+
+
+def _padded(size):
+    """Rounds a size up to a multiple of 8 bytes."""
+
+    return (size + 7) & ~7
+
+
+def _record_size(keys):
+    """Returns the amount of int64 of every record."""
+
+    return RECORD_HEAD + len(FIELDS) * len(keys)
+
+
+def _read_header(buffer):
+    """Returns the keys of a usage file and where its records start."""
+
+    if buffer[:4] != MAGIC:
+        raise ValueError("Not a limits usage file")
+
+    (header_length,) = struct.unpack_from("<I", buffer, 4)
+    header = json.loads(bytes(buffer[8 : 8 + header_length]))
+
+    return header["keys"], _padded(8 + header_length)
+
+
+def _read_file_header(usage_file):
+    """Returns the keys of an open usage file and where its records start."""
+
+    start = usage_file.read(8)
+    if len(start) < 8:
+        raise ValueError("Not a limits usage file")
+    (header_length,) = struct.unpack_from("<I", start, 4)
+
+    return _read_header(start + usage_file.read(header_length))
+
+
+def write_usage(usage_path, keys, records):
+    """Writes a whole usage file, replacing the previous one atomically so
+    readers that already mapped it are not affected.
+
+    Parameters:
+        usage_path (str): Path to the usage file.
+        keys (list): Keys of every record.
+        records (array): Every record, one after the other ('q' array).
+
+    Returns:
+        None
+    """
+
+    header = json.dumps({"keys": keys, "bucket": BUCKET_SECONDS}).encode("utf-8")
+    header_end = 8 + len(header)
+
+    tmp_usage_path = f"{usage_path}.tmp"
+    with open(tmp_usage_path, "wb") as usage_file:
+        usage_file.write(MAGIC)
+        usage_file.write(struct.pack("<I", len(header)))
+        usage_file.write(header)
+        usage_file.write(b"\0" * (_padded(header_end) - header_end))
+        records.tofile(usage_file)
+
+    os.replace(tmp_usage_path, usage_path)
+
+
+def _add_keys(usage_path, keys, new_keys):
+    """Rewrites the usage file with more keys, empty in the existing records.
+
+    Returns:
+        list: Keys of the file now.
+    """
+
+    all_keys = keys + sorted(new_keys)
+    old_size = _record_size(keys)
+    new_size = _record_size(all_keys)
+    records = array("q")
+
+    if os.path.exists(usage_path):
+        with open(usage_path, "rb") as usage_file:
+            buffer = usage_file.read()
+        data_offset = _read_header(buffer)[1]
+        old_records = array("q")
+        count = (len(buffer) - data_offset) // (8 * old_size)
+        old_records.frombytes(buffer[data_offset : data_offset + 8 * old_size * count])
+
+        padding = array("q", bytes(8 * (new_size - old_size)))
+        for start in range(0, len(old_records), old_size):
+            records.extend(old_records[start : start + old_size])
+            records.extend(padding)
+
+    write_usage(usage_path, all_keys, records)
+    LOGGER.info("Usage history now tracks %d new keys", len(new_keys))
+
+    return all_keys
+
+
+def record_sample(usage_path, engine_dict, moment=None):
+    """Folds one poll of the engine into the record of its hour.
+
+    Parameters:
+        usage_path (str): Path to the usage file.
+        engine_dict (dict): Limits as reported by the engine.
+        moment (int): Time of the poll, now by default.
+
+    Returns:
+        int: Amount of keys recorded.
+    """
+
+    return record_usage(usage_path, engine_usage(engine_dict), moment)
+
+
+@traced("usage.sample")
+def record_usage(usage_path, usage, moment=None):
+    """Folds the usage of one poll of the engine into the record of its hour.
+
+    Samples taken before the last one recorded are ignored, so running two
+    samplers at once doesn't count the same time twice.
+
+    Parameters:
+        usage_path (str): Path to the usage file.
+        usage (dict): (in_use, site_max, waiting) per limit key, see
+        engine_usage().
+        moment (int): Time of the poll, now by default.
+
+    Returns:
+        int: Amount of keys recorded.
+    """
+
+    if not usage:
+        return 0
+
+    moment = int(time.time() if moment is None else moment)
+    hour = moment - moment % BUCKET_SECONDS
+
+    with open(f"{usage_path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        keys = []
+        if os.path.exists(usage_path):
+            with open(usage_path, "rb") as usage_file:
+                keys = _read_file_header(usage_file)[0]
+
+        new_keys = usage.keys() - set(keys)
+        if new_keys or not os.path.exists(usage_path):
+            keys = _add_keys(usage_path, keys, new_keys)
+
+        size = _record_size(keys)
+        with open(usage_path, "r+b") as usage_file:
+            data_offset = _read_file_header(usage_file)[1]
+            count = (os.fstat(usage_file.fileno()).st_size - data_offset) // (8 * size)
+
+            record = array("q")
+            if count:
+                usage_file.seek(data_offset + 8 * size * (count - 1))
+                record.fromfile(usage_file, size)
+
+            if count and moment <= record[1]:
+                LOGGER.debug("Skipping a sample older than the last one")
+                return 0
+
+            gap = min(moment - record[1], MAX_SAMPLE_GAP) if count else 0
+            if not count or record[0] != hour:
+                record = array("q", bytes(8 * size))
+                record[0] = hour
+                count += 1
+            record[1] = moment
+
+            for position, key in enumerate(keys):
+                if key not in usage:
+                    continue
+                in_use, site_max = usage[key][:2]
+                field = RECORD_HEAD + len(FIELDS) * position
+                record[field] += 1
+                record[field + 1] = max(record[field + 1], in_use)
+                record[field + 2] += in_use
+                record[field + 3] += 0 < site_max <= in_use
+                record[field + 4] += max(site_max - in_use, 0) * gap
+
+            usage_file.seek(data_offset + 8 * size * (count - 1))
+            record.tofile(usage_file)
+
+    return len(usage)
+
+
+class UsageSummary:
+    """Usage of one limit over a time range.
+
+    Attributes:
+        key (str): Key of the limit.
+        hours (int): Hours with at least one sample.
+        samples (int): Samples taken.
+        p50 (int): Median of the hourly peaks.
+        p95 (int): 95th percentile of the hourly peaks.
+        p99 (int): 99th percentile of the hourly peaks.
+        mean (float): Average slots in use.
+        saturation (float): Fraction of the samples at 'SiteMax'.
+        idle_hours (float): License hours left unused below 'SiteMax'.
+    """
+
+    __slots__ = (
+        "key",
+        "hours",
+        "samples",
+        "p50",
+        "p95",
+        "p99",
+        "mean",
+        "saturation",
+        "idle_hours",
+    )
+
+    def __init__(self, key, hours, samples, peaks, in_use_total, saturated, idle):
+        """Computes the summary from the columns of the key.
+
+        Args:
+            peaks (list): Sorted peak of every hour with samples.
+            in_use_total (int): Sum of the slots in use of every sample.
+            saturated (int): Samples at 'SiteMax'.
+            idle (int): Idle license seconds.
+        """
+
+        self.key = key
+        self.hours = hours
+        self.samples = samples
+        self.p50 = percentile(peaks, 0.5)
+        self.p95 = percentile(peaks, 0.95)
+        self.p99 = percentile(peaks, 0.99)
+        self.mean = in_use_total / samples if samples else 0.0
+        self.saturation = saturated / samples if samples else 0.0
+        self.idle_hours = idle / 3600
+
+    def __repr__(self):
+        return (
+            f"UsageSummary({self.key!r}, hours={self.hours}, p95={self.p95}, "
+            f"saturation={self.saturation:.3f})"
+        )
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of sorted values.
+
+    Parameters:
+        sorted_values (list): Values in ascending order.
+        fraction (float): Percentile between 0 and 1.
+
+    Returns:
+        int: The value, 0 if there are none.
+    """
+
+    if not sorted_values:
+        return 0
+
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+class LimitsUsage:
+    """Read access to the usage file through a memory map.
+
+    Args:
+        usage_path (str): Path to the usage file.
+
+    Attributes:
+        keys (list): Keys of every record.
+        records (memoryview): Every complete record as int64.
+
+    Methods:
+        hours(start, end): Returns the records within a time range.
+        summarize(start, end, keys): Returns a UsageSummary per key.
+        close(): Releases the memory map.
+    """
+
+    def __init__(self, usage_path):
+        """Maps the usage file and reads its header."""
+
+        self.usage_file = open(usage_path, "rb")
+        self.buffer = mmap.mmap(self.usage_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.keys, data_offset = _read_header(self.buffer)
+        except ValueError:
+            self.close()
+            raise ValueError(f"{usage_path} is not a limits usage file") from None
+
+        # A record being appended by the sampler is left out
+        self.record_size = _record_size(self.keys)
+        count = (len(self.buffer) - data_offset) // (8 * self.record_size)
+        self.records = memoryview(self.buffer)[
+            data_offset : data_offset + 8 * self.record_size * count
+        ].cast("q")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def hours(self, start=None, end=None):
+        """Returns the records of the hours within a time range.
+
+        Parameters:
+            start (int): First second of the range, since the epoch.
+            end (int): Last second of the range, since the epoch.
+
+        Returns:
+            memoryview: The records, one after the other.
+        """
+
+        size = self.record_size
+        hours = self.records[::size]
+        first = (
+            0 if start is None else bisect_left(hours, start - start % BUCKET_SECONDS)
+        )
+        last = len(hours) if end is None else bisect_left(hours, end + 1)
+        hours.release()
+
+        return self.records[first * size : last * size]
+
+    @traced("usage.summarize")
+    def summarize(self, start=None, end=None, keys=None):
+        """Summarizes the usage of every key within a time range. Every field
+        of a key is read as one strided column of the records.
+
+        Parameters:
+            start (int): First second of the range, since the epoch.
+            end (int): Last second of the range, since the epoch.
+            keys (iterable): Keys to summarize, all of them by default.
+
+        Returns:
+            OrderedDict: UsageSummary per key with samples in the range.
+        """
+
+        size = self.record_size
+        records = self.hours(start, end)
+        positions = {key: position for position, key in enumerate(self.keys)}
+        summaries = OrderedDict()
+
+        for key in self.keys if keys is None else keys:
+            if key not in positions:
+                continue
+
+            field = RECORD_HEAD + len(FIELDS) * positions[key]
+            columns = [records[field + offset :: size] for offset in range(len(FIELDS))]
+            samples, peaks, in_use_total, saturated, idle = columns
+
+            sample_count = sum(samples)
+            if sample_count:
+                hourly_peaks = sorted(compress(peaks, samples))
+                summaries[key] = UsageSummary(
+                    key,
+                    len(hourly_peaks),
+                    sample_count,
+                    hourly_peaks,
+                    sum(in_use_total),
+                    sum(saturated),
+                    sum(idle),
+                )
+
+            for column in columns:
+                column.release()
+
+        records.release()
+
+        return summaries
+
+    def close(self):
+        """Releases the memory map.
+
+        Returns:
+            None
+        """
+
+        if getattr(self, "records", None) is not None:
+            self.records.release()
+        self.buffer.close()
+        self.usage_file.close()
+
+
+class Recommendation:
+    """A new 'SiteMax' proposed for a limit from its usage.
+
+    Attributes:
+        key (str): Key of the limit.
+        current (int): 'SiteMax' in the configuration file.
+        proposed (int): 'SiteMax' proposed.
+        reason (str): Why, for the user.
+    """
+
+    __slots__ = ("key", "current", "proposed", "reason")
+
+    def __init__(self, key, current, proposed, reason):
+        self.key = key
+        self.current = current
+        self.proposed = proposed
+        self.reason = reason
+
+    def __repr__(self):
+        return (
+            f"Recommendation({self.key!r}, current={self.current!r}, "
+            f"proposed={self.proposed!r})"
+        )
+
+    def __str__(self):
+        return f"{self.key}: {self.current} -> {self.proposed} ({self.reason})"
+
+
+def recommend(summaries, current_values, headroom=HEADROOM):
+    """Proposes a new 'SiteMax' for every limit whose usage doesn't match it,
+    see the module documentation.
+
+    Limits with less than MINIMUM_HOURS of history, or whose proposed value is
+    within MINIMUM_CHANGE of the current one, are left as they are.
+
+    Parameters:
+        summaries (dict): UsageSummary per key.
+        current_values (dict): 'SiteMax' per key in the configuration file.
+        headroom (float): Fraction added on top of the hourly peaks.
+
+    Returns:
+        OrderedDict: Recommendation per key.
+    """
+
+    recommendations = OrderedDict()
+
+    for key, summary in summaries.items():
+        current = current_values.get(key)
+        if current is None or summary.hours < MINIMUM_HOURS:
+            continue
+
+        proposed = max(math.ceil(summary.p95 * (1 + headroom)), MINIMUM_SITE_MAX)
+        if summary.saturation >= SATURATION_THRESHOLD:
+            proposed = max(proposed, math.ceil(current * (1 + SATURATED_GROWTH)))
+            reason = f"at SiteMax {summary.saturation:.1%} of the time"
+        else:
+            reason = (
+                f"95% of the hourly peaks at or below {summary.p95}, "
+                f"{summary.idle_hours:.0f} idle license hours"
+            )
+
+        if abs(proposed - current) < max(current * MINIMUM_CHANGE, 1):
+            continue
+
+        recommendations[key] = Recommendation(key, current, proposed, reason)
+
+    return recommendations
+
+
+def recommend_for_config(config_file_path_name, days=DEFAULT_DAYS, now=None):
+    """Recommends new values for the limits of a configuration file from the
+    usage of the last days. The Shares and farm limits are left out.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        days (float): Days of history to use.
+        now (int): End of the range, now by default.
+
+    Returns:
+        tuple: (table, summaries, recommendations), the table the current
+        values were read from, UsageSummary and Recommendation per key.
+    """
+
+    table = limits_table.LimitsTable.from_file(config_file_path_name)
+    current_values = table.limit_values()
+    for key in table.keys_in(table.category_masks[limits_table.CATEGORY_FARM]):
+        current_values.pop(key, None)
+
+    now = int(time.time() if now is None else now)
+    usage_path = usage_file_path(config_file_path_name)
+    if not os.path.exists(usage_path):
+        return table, OrderedDict(), OrderedDict()
+
+    with span("usage.recommend", days=days) as fields:
+        with LimitsUsage(usage_path) as usage:
+            summaries = usage.summarize(now - int(days * 86400), now, current_values)
+        recommendations = recommend(summaries, current_values)
+        fields.update(keys=len(summaries), recommendations=len(recommendations))
+
+    return table, summaries, recommendations
+
+
+def proposed_values(recommendations):
+    """Returns the values of the recommendations, to open the windows with.
+
+    Parameters:
+        recommendations (dict): Recommendation per key.
+
+    Returns:
+        OrderedDict: Proposed value per key.
+    """
+
+    return OrderedDict(
+        (key, recommendation.proposed)
+        for key, recommendation in recommendations.items()
+    )
+
+
+def show_proposed_values(values, spinboxes_by_key):
+    """Loads proposed values into the spin boxes of a window, so they are
+    recorded in its change set as if the user had typed them. Every changed
+    spin box is highlighted with the loaded value in its tool tip.
+
+    Parameters:
+        values (dict): Proposed value per key.
+        spinboxes_by_key (dict): Spin box per limit key of the window.
+
+    Returns:
+        None
+    """
+
+    for key, value in values.items():
+        spinbox = spinboxes_by_key.get(key)
+        if spinbox is None or spinbox.value() == value:
+            continue
+
+        spinbox.setToolTip(f"Proposed value, the loaded value was {spinbox.value()}")
+        spinbox.setValue(value)
+        spinbox.setStyleSheet(
+            ";".join(filter(None, (spinbox.styleSheet(), PROPOSED_STYLE_SHEET)))
+        )
+
+
+def open_proposal_windows(farm, table, values):
+    """Opens the Application Limits window and the Show Limits window of every
+    show with proposed values.
+
+    Parameters:
+        farm (LimitFarm): Farm of the values.
+        table (LimitsTable): Limits the values were computed from.
+        values (dict): Proposed value per key.
+
+    Returns:
+        list: The windows opened.
+    """
+
+    from application_limits_window import UiApplicationLimitsMainWindow
+    from show_limits_window import UiShowLimitsMainWindow
+
+    windows = []
+
+    application_keys = set(table.application_keys())
+    if application_keys.intersection(values):
+        windows.append(
+            UiApplicationLimitsMainWindow(*farm.folders(), proposed_values=values)
+        )
+
+    for show in table.show_positions:
+        if set(table.show_keys(show)).intersection(values):
+            windows.append(
+                UiShowLimitsMainWindow(
+                    show.upper(), *farm.folders(), proposed_values=values
+                )
+            )
+
+    for window in windows:
+        window.show()
+
+    return windows
+
+
+def main(argv=None):
+    """Parses the command line and samples, reports or recommends.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--farm", default=None, help="farm to use, the first one by default"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sample", help="record the usage reported by the engine")
+    report_parser = commands.add_parser("report", help="usage of every limit")
+    report_parser.add_argument("--days", type=float, default=DEFAULT_DAYS)
+    recommend_parser = commands.add_parser("recommend", help="propose new limits")
+    recommend_parser.add_argument("--days", type=float, default=DEFAULT_DAYS)
+    recommend_parser.add_argument(
+        "--open", action="store_true", help="open the windows with the proposal"
+    )
+    args, qt_args = parser.parse_known_args(argv)
+    if qt_args and not getattr(args, "open", False):
+        parser.error(f"unrecognized arguments: {' '.join(qt_args)}")
+
+    farms = limits_farms.load_farms()
+    if args.farm is not None and args.farm not in farms:
+        LOGGER.error("Unknown farm: %s", args.farm)
+        return 1
+    farm = farms[args.farm] if args.farm else limits_farms.selected_farm(farms)
+    limits_farms.select_farm(farm.name)
+    usage_path = usage_file_path(farm.config_file_path_name)
+
+    if args.command == "sample":
+        engine_dict = limits_config.fetch_engine_limits(farm.engine_url)
+        print(f"{record_sample(usage_path, engine_dict)} limits recorded")
+        return 0
+
+    table, summaries, recommendations = recommend_for_config(
+        farm.config_file_path_name, args.days
+    )
+
+    if args.command == "report":
+        print("key\thours\tp50\tp95\tp99\tmean\tat max\tidle hours")
+        for summary in summaries.values():
+            print(
+                f"{summary.key}\t{summary.hours}\t{summary.p50}\t{summary.p95}\t"
+                f"{summary.p99}\t{summary.mean:.1f}\t{summary.saturation:.1%}\t"
+                f"{summary.idle_hours:.0f}"
+            )
+        return 0
+
+    for recommendation in recommendations.values():
+        print(recommendation)
+
+    if not recommendations:
+        print("Every limit matches its usage")
+        return 0
+
+    if args.open:
+        from qtpy import QtWidgets
+
+        app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+        windows = open_proposal_windows(farm, table, proposed_values(recommendations))
+        return app.exec_() if windows else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+
+"""
+Live refresh of the open limit windows of the Farm UI. A window left open
+keeps the values it was opened with, so if a colleague writes the '.config'
+file (or stages a 'temp.config') meanwhile, the next Submit would stage stale
+values over their change. The watcher notices the change, reads the file
+again and tells the window which keys changed, so only those spin boxes are
+updated and highlighted, without building the window again.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+import os
+
+from qtpy import QtCore
+
+import limits_config
+import limits_table
+from limits_tracing import LOGGER, span
+
+# Changes arriving within this many milliseconds are read at once, a write is
+# usually several events (truncate, write, rename, ...)
+DEBOUNCE_MS = 300
+
+# Style of the spin boxes whose value was changed by someone else
+REMOTE_CHANGE_STYLE_SHEET = "color: yellow"
+
+
+class LimitsFileWatcher(QtCore.QObject):
+    """Watches the '.config' file of a farm and its staged 'temp.config'.
+
+    The folders are watched too, since files written by moving a new file
+    into place (or created for the first time) drop out of the watcher.
+
+    Args:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+        table (LimitsTable): Limits the window was opened with.
+        parent (QObject): Window owning the watcher.
+
+    Attributes:
+        table (LimitsTable): Limits the window is showing.
+        limits_changed (Signal): Emitted with the new table and the changed
+        values, (old, new) per key, every time the values changed.
+    """
+
+    limits_changed = QtCore.Signal(object, object)
+
+    def __init__(self, config_file_path_name, temp_folder, table, parent=None):
+        """Starts watching the files and their folders."""
+
+        super().__init__(parent)
+
+        self.config_file_path_name = config_file_path_name
+        self.temp_folder = temp_folder
+        self.table = table
+
+        self.paths = [
+            config_file_path_name,
+            f"{temp_folder}{limits_config.TEMP_FILE_NAME}",
+            os.path.dirname(os.path.abspath(config_file_path_name)),
+            os.path.abspath(temp_folder),
+        ]
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_MS)
+        self.timer.timeout.connect(self.refresh)
+
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.timer.start)
+        self.watcher.directoryChanged.connect(self.timer.start)
+        self.watch_paths()
+
+    def watch_paths(self):
+        """Watches every path that exists and isn't watched yet.
+
+        Returns:
+            None
+        """
+
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        missing = [
+            path for path in self.paths if path not in watched and os.path.exists(path)
+        ]
+
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def refresh(self):
+        """Reads the files again and emits limits_changed when any value
+        changed. Nothing is read when the files didn't change on disk, or
+        once the window was closed.
+
+        Returns:
+            None
+        """
+
+        if self.parent() is not None and not self.parent().isVisible():
+            return
+
+        self.watch_paths()
+
+        try:
+            table = limits_table.load_session_table(
+                self.config_file_path_name, self.temp_folder
+            )
+        except (OSError, ValueError):
+            # Caught in the middle of a write, the end of it triggers again
+            LOGGER.debug("Could not read the limits yet, waiting for the next change")
+            return
+
+        if table is self.table:
+            return
+
+        with span("ui.live_refresh", path=self.config_file_path_name) as fields:
+            changes = self.table.changed_values(table)
+            fields["keys"] = len(changes)
+            self.table = table
+
+        if changes:
+            LOGGER.info(
+                "Limits changed by someone else: %s",
+                ", ".join(
+                    f"{key} {old} -> {new}" for key, (old, new) in changes.items()
+                ),
+            )
+            self.limits_changed.emit(table, changes)
+
+
+def show_remote_changes(changes, change_set, spinboxes_by_key):
+    """Updates the spin boxes of the keys changed by someone else.
+
+    Keys the user didn't touch show the new value. Keys the user modified keep
+    the value of the user, but the value they will replace is the new one.
+    Every changed spin box is highlighted with both values in its tool tip.
+
+    Parameters:
+        changes (dict): (old, new) value per key that changed.
+        change_set (LimitsChangeSet): Change set fed by the spin boxes.
+        spinboxes_by_key (dict): Spin box per limit key of the window.
+
+    Returns:
+        None
+    """
+
+    for key, (old_value, new_value) in changes.items():
+        spinbox = spinboxes_by_key.get(key)
+
+        # Before rebasing, so the listeners (e.g. the constraints) add to the
+        # tool tip instead of it replacing theirs
+        if spinbox is not None:
+            tool_tip = f"Changed by someone else from {old_value} to {new_value}"
+            user_value = change_set.new_values.get(key, new_value)
+            if user_value != new_value:
+                tool_tip += f", your value {user_value} is kept"
+            else:
+                spinbox.blockSignals(True)
+                spinbox.setValue(new_value)
+                spinbox.blockSignals(False)
+
+            if REMOTE_CHANGE_STYLE_SHEET not in spinbox.styleSheet():
+                spinbox.setStyleSheet(
+                    ";".join(
+                        filter(None, (spinbox.styleSheet(), REMOTE_CHANGE_STYLE_SHEET))
+                    )
+                )
+            spinbox.setToolTip(tool_tip)
+
+        change_set.rebase(key, new_value)
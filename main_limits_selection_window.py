@@ -13,6 +13,14 @@ Written in Python3.
 from functools import partial
 from qtpy import QtWidgets, QtGui, QtCore
 
+import limits_farms
+import limits_tracing
+from limits_tracing import LOGGER, traced
+from limits_undo import SESSION_UNDO_STACK
+
+# Style of the spin box of the limit a window was opened for, see open_key_window()
+OPENED_KEY_STYLE_SHEET = "color: orange"
+
 
 class UiLimitsMainWindow(QtWidgets.QMainWindow):
     """Main window class for the Limit Selection Farm UI.
@@ -35,6 +43,13 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         button_creation(): Creates and configures the "Confirm My Selection" button.
         open_show_selection_window(): Opens the Show Selection Limits window.
         open_application_limits_window(): Opens the Application Limits window.
+        open_shares_editor_window(): Opens the Farm Shares window.
+        open_bulk_operations_window(): Opens the Bulk Operations window.
+        open_limit_history_window(): Opens the Limit History window.
+        open_key_window(key): Opens the window holding a limit key.
+        farm_changed(name): Switches every window to another farm.
+        paintEvent(event): Reads the limits once the window was painted.
+        preload_limits(): Reads the limits of the farm ahead of the next window.
     """
 
     def __init__(self):
@@ -42,21 +57,30 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         Initializes an instance of the class.
 
         This constructor sets up the initial state and user interface components
-        for the application. It defines the paths for the configuration, temporary,
-        and backup folders, and initializes the necessary UI components and fonts.
+        for the application. It loads every farm of the farms file, takes the
+        paths for the configuration, temporary, and backup folders from the
+        selected one, and initializes the necessary UI components and fonts.
 
         Attributes:
+            farms (OrderedDict): Every farm that can be managed, per name.
+            farm (LimitFarm): Farm the windows are opened on.
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder.
             backup_folder (str): Path to the backup folder.
             show_select_window_ui (object): UI object for the show selection window.
             app_selection_limits_ui (object): UI object for the application selection limits.
+            shares_editor_ui (object): UI object for the farm shares editor.
+            bulk_operations_ui (object): UI object for the bulk operations.
+            limit_history_ui (object): UI object for the limit history.
+            show_limits_ui (object): UI object for the show limits opened
+            directly for a key.
 
         UI Components:
             centralwidget (QWidget): Central widget for the main window.
             limits_select_groupbox (QGroupBox): Group box for limit selection UI components.
             limits_select_push_button (QPushButton): Push button for limit selection.
             limits_select_combo_box (QComboBox): Combo box for limit selection.
+            farm_combo_box (QComboBox): Combo box for farm selection.
 
         Fonts:
             l_font (QFont): Large, bold, italic font with underline for headings.
@@ -69,22 +93,35 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         super().__init__()
 
         # These are the location of both the main Config file and where
-        # the temp file and backup files will be created
+        # the temp file and backup files will be created, per farm (see
+        # limits_farms for the farms file)
+        self.farms = limits_farms.load_farms()
+        self.farm = limits_farms.selected_farm(self.farms)
 
         # All Folders
-        self.config_file_path_name = "/sw/tractor/config/limits.config"
-        self.temp_folder = "/sw/tractor/config/tmp/"
-        self.backup_folder = "/sw/tractor/config/limits_backup/"
+        (
+            self.config_file_path_name,
+            self.temp_folder,
+            self.backup_folder,
+        ) = self.farm.folders()
 
         # Sections of the window
         self.centralwidget = ""
         self.limits_select_groupbox = None
         self.limits_select_push_button = None
         self.limits_select_combo_box = None
+        self.farm_combo_box = None
 
         # Windows
         self.show_select_window_ui = None
         self.app_selection_limits_ui = None
+        self.shares_editor_ui = None
+        self.bulk_operations_ui = None
+        self.limit_history_ui = None
+        self.show_limits_ui = None
+
+        # Whether the limits of the farm were read ahead of the next window
+        self.limits_preloaded = False
 
         # Fonts
         self.l_font = QtGui.QFont(
@@ -95,6 +132,7 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
 
         self.setup_ui()
 
+    @traced("ui.main_window", profile=True)
     def setup_ui(self):
         """Sets up the user interface components for the application.
 
@@ -131,7 +169,7 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         # Title of the Main Window can be changed here.
         self.setWindowTitle("Main Limits Selection Window")
         # Window Size can be adjusted here
-        self.setFixedSize(463, 182)
+        self.setFixedSize(463, 212)
         # Using this style sheet the theme can be changed
         self.setStyleSheet(
             """background-color: rgb(46, 52, 54);color: rgb(238, 238, 236);"""
@@ -173,13 +211,14 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         )
 
         self.limits_select_groupbox.setFont(self.l_font)
-        self.limits_select_groupbox.setGeometry(10, 10, 441, 161)
+        self.limits_select_groupbox.setGeometry(10, 10, 441, 191)
 
     def combo_box_creation(self):
-        """Creates and configures the combo box for limit selection.
+        """Creates and configures the combo boxes for farm and limit selection.
 
-        This method initializes the combo box within the 'Limits Selection' group box,
-        sets its geometry, font, and style, and populates it with predefined items.
+        This method initializes the combo boxes within the 'Limits Selection' group
+        box, sets their geometry, font, and style, and populates them with the farms
+        and the predefined items.
 
         Parameters:
             self (object): The object instance.
@@ -188,11 +227,26 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
             None
         """
 
+        farm_label = QtWidgets.QLabel("Farm:", self.limits_select_groupbox)
+        farm_label.setGeometry(10, 120, 51, 22)
+        farm_label.setFont(self.s_font)
+
+        self.farm_combo_box = QtWidgets.QComboBox(self.limits_select_groupbox)
+        self.farm_combo_box.setGeometry(60, 120, 151, 22)
+        self.farm_combo_box.setFont(self.s_font)
+        self.farm_combo_box.addItems(list(self.farms))
+        self.farm_combo_box.setCurrentText(self.farm.name)
+        self.farm_combo_box.setStyleSheet("color : #A7F432")
+        self.farm_combo_box.currentTextChanged.connect(self.farm_changed)
+
         self.limits_select_combo_box = QtWidgets.QComboBox(self.limits_select_groupbox)
-        self.limits_select_combo_box.setGeometry(10, 120, 201, 22)
+        self.limits_select_combo_box.setGeometry(10, 155, 201, 22)
         self.limits_select_combo_box.setFont(self.s_font)
         self.limits_select_combo_box.addItem("Show Defined Limits")
         self.limits_select_combo_box.addItem("License/Application Limits")
+        self.limits_select_combo_box.addItem("Farm Shares")
+        self.limits_select_combo_box.addItem("Bulk Operations")
+        self.limits_select_combo_box.addItem("Limit History")
         self.limits_select_combo_box.setStyleSheet("color : #A7F432")
 
     def label_creation(self):
@@ -232,6 +286,9 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         to determine which window to open:
         - If "Show Defined Limits" is selected, it opens the show selection window.
         - If "License/Application Limits" is selected, it opens the application limits window.
+        - If "Farm Shares" is selected, it opens the farm shares editor window.
+        - If "Bulk Operations" is selected, it opens the bulk operations window.
+        - If "Limit History" is selected, it opens the limit history window.
 
         Parameters:
             self (object): The object instance.
@@ -243,7 +300,7 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         self.limits_select_push_button = QtWidgets.QPushButton(
             "Confirm My Selection", self.limits_select_groupbox
         )
-        self.limits_select_push_button.setGeometry(250, 120, 171, 22)
+        self.limits_select_push_button.setGeometry(250, 155, 171, 22)
         self.limits_select_push_button.setFont(self.s_font)
 
         # Opening the other windows according to the selection of the Combo Box
@@ -255,6 +312,12 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
                 self.open_show_selection_window()
             elif selected == "License/Application Limits":
                 self.open_application_limits_window()
+            elif selected == "Farm Shares":
+                self.open_shares_editor_window()
+            elif selected == "Bulk Operations":
+                self.open_bulk_operations_window()
+            elif selected == "Limit History":
+                self.open_limit_history_window()
 
         # IMPORTANT: This is what happens when the button is pressed to
         # confirm selection
@@ -262,6 +325,79 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
             partial(limits_select_button_clicked)
         )
 
+    def farm_changed(self, name):
+        """Switches every window of the session to another farm.
+
+        Changes staged for the previous farm stay in its temp folder, but the
+        Undo/Redo history of the session is cleared since it belongs to it.
+
+        Parameters:
+            self (object): The object instance.
+            name (str): Name of the farm.
+
+        Returns:
+            None
+        """
+
+        self.farm = self.farms[name]
+        limits_farms.select_farm(name)
+        (
+            self.config_file_path_name,
+            self.temp_folder,
+            self.backup_folder,
+        ) = self.farm.folders()
+
+        if SESSION_UNDO_STACK:
+            LOGGER.warning(
+                "Switched to %s, the Undo/Redo history of the previous farm "
+                "was cleared",
+                name,
+            )
+            SESSION_UNDO_STACK.clear()
+
+        self.preload_limits()
+
+    def paintEvent(self, event):
+        """Paints the window, then reads the limits of the farm the first time
+        the window is painted, so it shows up before the '.config' file is
+        read instead of after.
+
+        Parameters:
+            self (object): The object instance.
+            event (QPaintEvent): The paint event.
+
+        Returns:
+            None
+        """
+
+        super().paintEvent(event)
+
+        if not self.limits_preloaded:
+            self.limits_preloaded = True
+            QtCore.QTimer.singleShot(0, self.preload_limits)
+
+    def preload_limits(self):
+        """Reads the limits of the farm (or its staged changes) into the limits
+        table every window shares, so the next window opens without reading
+        them. With the daemon running they are its table, already scanned.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        import limits_daemon
+
+        try:
+            limits_daemon.load_session_table(
+                self.config_file_path_name, self.temp_folder
+            )
+        except (OSError, ValueError) as error:
+            # The window opened next reports it
+            LOGGER.debug("Could not read the limits ahead: %s", error)
+
     def open_show_selection_window(self):
         """Opens the Show Selection Limits window.
 
@@ -309,12 +445,163 @@ class UiLimitsMainWindow(QtWidgets.QMainWindow):
         self.app_selection_limits_ui.show()
         self.close()
 
+    def open_shares_editor_window(self):
+        """Opens the Farm Shares window.
+
+        This method imports the `UiSharesEditorMainWindow` class from the
+        `shares_editor_window` module, creates an instance of it with the
+        necessary configuration, temporary, and backup folder paths, and displays
+        it to the user. After opening the new window, the current window is closed.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from shares_editor_window import UiSharesEditorMainWindow
+
+        self.shares_editor_ui = UiSharesEditorMainWindow(
+            self.config_file_path_name, self.temp_folder, self.backup_folder
+        )
+        self.shares_editor_ui.show()
+        self.close()
+
+    def open_bulk_operations_window(self):
+        """Opens the Bulk Operations window.
+
+        This method imports the `UiBulkOperationsMainWindow` class from the
+        `bulk_operations_window` module, creates an instance of it with the
+        necessary configuration, temporary, and backup folder paths, and displays
+        it to the user. After opening the new window, the current window is closed.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from bulk_operations_window import UiBulkOperationsMainWindow
+
+        self.bulk_operations_ui = UiBulkOperationsMainWindow(
+            self.config_file_path_name, self.temp_folder, self.backup_folder
+        )
+        self.bulk_operations_ui.show()
+        self.close()
+
+    def open_limit_history_window(self):
+        """Opens the Limit History window.
+
+        This method imports the `UiLimitHistoryMainWindow` class from the
+        `limit_history_window` module, creates an instance of it with the
+        necessary configuration, temporary, and backup folder paths, and displays
+        it to the user. After opening the new window, the current window is closed.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from limit_history_window import UiLimitHistoryMainWindow
+
+        self.limit_history_ui = UiLimitHistoryMainWindow(
+            self.config_file_path_name, self.temp_folder, self.backup_folder
+        )
+        self.limit_history_ui.show()
+        self.close()
+
+    def open_key_window(self, key):
+        """Opens the Application Limits window or the Show Limits window of
+        the show holding a limit key, with the spin box of the key focused and
+        highlighted, e.g. from the link of an alert (see limits_alerts).
+
+        Parameters:
+            self (object): The object instance.
+            key (str): Limit key.
+
+        Returns:
+            QMainWindow: The window opened, None if no window holds the key,
+            in which case this window is shown instead.
+        """
+
+        import limits_daemon
+
+        table = limits_daemon.load_session_table(
+            self.config_file_path_name, self.temp_folder
+        )
+
+        window = None
+        if key in table.application_keys():
+            from application_limits_window import UiApplicationLimitsMainWindow
+
+            self.app_selection_limits_ui = UiApplicationLimitsMainWindow(
+                self.config_file_path_name, self.temp_folder, self.backup_folder
+            )
+            window = self.app_selection_limits_ui
+        else:
+            for show in table.show_positions:
+                if key in table.show_keys(show):
+                    from show_limits_window import UiShowLimitsMainWindow
+
+                    self.show_limits_ui = UiShowLimitsMainWindow(
+                        show.upper(),
+                        self.config_file_path_name,
+                        self.temp_folder,
+                        self.backup_folder,
+                    )
+                    window = self.show_limits_ui
+                    break
+
+        if window is None:
+            LOGGER.warning("No window holds %s on %s", key, self.farm.name)
+            self.show()
+            return None
+
+        spinbox = window.spinboxes_by_key[key]
+        spinbox.setStyleSheet(
+            ";".join(filter(None, (spinbox.styleSheet(), OPENED_KEY_STYLE_SHEET)))
+        )
+        window.show()
+        spinbox.setFocus()
+        spinbox.selectAll()
+        self.close()
+
+        return window
+
 
 if __name__ == "__main__":
 
+    import argparse
     import sys
 
-    app = QtWidgets.QApplication(sys.argv)
+    import limits_profiling
+
+    parser = argparse.ArgumentParser(description="Farm UI for Show & License Limits")
+    parser.add_argument("--profile-dir", help="write cProfile stats of every phase")
+    parser.add_argument(
+        "--profile-memory", action="store_true", help="also write tracemalloc snapshots"
+    )
+    parser.add_argument("--farm", help="farm to open, the first one by default")
+    parser.add_argument("--open-key", help="open the window holding a limit key")
+    args, qt_args = parser.parse_known_args()
+
+    limits_tracing.configure()
+    limits_profiling.configure(args.profile_dir, args.profile_memory or None)
+
+    if args.farm:
+        if args.farm not in limits_farms.load_farms():
+            LOGGER.error("Unknown farm: %s", args.farm)
+            sys.exit(1)
+        limits_farms.select_farm(args.farm)
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
     main_window_ui = UiLimitsMainWindow()
-    main_window_ui.show()
+    if args.open_key:
+        main_window_ui.open_key_window(args.open_key)
+    else:
+        main_window_ui.show()
     sys.exit(app.exec_())
@@ -0,0 +1,408 @@
+#!/usr/bin/python3
+
+"""
+This window opens up when "Farm Shares" is selected through the Main Limits
+Selection Window of the Farm UI. Shows the 'linuxfarm' Shares weight of every
+show together with the effective percentage of the farm it gets.
+Created using QtPy.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+"""
+
+from array import array
+from qtpy import QtCore, QtGui, QtWidgets
+
+import limits_shares
+import limits_table
+from limits_change_set import LimitsChangeSet
+from limits_tracing import traced
+
+
+class UiSharesEditorMainWindow(QtWidgets.QMainWindow):
+    """
+    The main window class for editing the 'linuxfarm' Shares weights.
+
+    Every time a weight changes the effective percentage of every show is
+    renormalized in one pass. Bulk operations allow giving a show a percentage
+    of the farm (scaling the others proportionally) or scaling every weight.
+    The changes go through the usual Confirmation, Stage and Write windows.
+
+    Args:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder.
+        backup_folder (str): Path to the backup folder.
+
+    Methods:
+        setup_ui(): Sets up the user interface components.
+        shares_editor_window_setup(): Sets up the shares editor window.
+        groupbox_creation(): Creates the group box of the window.
+        table_creation(): Creates the table with the weight of every show.
+        refresh_percentages(): Renormalizes the percentage of every show.
+        bulk_creation(): Creates the bulk operation widgets.
+        set_weights(new_weights): Applies new weights to every show at once.
+        button_creation(): Creates the 'submit' and 'cancel' buttons.
+        submit_button_clicked(): Opens the Confirmation Window with the changes.
+        cancel_button_clicked(): Opens the main window of the UI again.
+    """
+
+    def __init__(self, config_file_path_name, temp_folder, backup_folder):
+        """
+        Initializes an instance of the class.
+
+        Args:
+            config_file_path_name (str): Path to the main configuration file.
+            temp_folder (str): Path to the temporary folder.
+            backup_folder (str): Path to the backup folder.
+
+        Attributes:
+            limits_table (LimitsTable): Limits of the configuration file being
+            edited, shared with the other windows.
+            shows (list): Name of every show of the Linux farm.
+            share_keys (list): Key of the weight of every show.
+            weights (array): Current weight of every show.
+            spin_boxes_list (list): Spin box of every show.
+            change_set (LimitsChangeSet): Only the weights modified by the user.
+
+        UI Components:
+            centralwidget (QWidget): Central widget for the main window.
+            shares_groupbox (QGroupBox): Group box for the shares editor.
+            shares_table (QTableWidget): Table with the weight of every show.
+
+        Calls:
+            setup_ui(): Sets up the user interface components.
+        """
+
+        super().__init__()
+
+        # All Folders
+        self.config_file_path_name = config_file_path_name
+        self.temp_folder = temp_folder
+        self.backup_folder = backup_folder
+
+        self.limits_table = limits_table.load_session_table(
+            config_file_path_name, temp_folder
+        )
+
+        # Variables
+        keys = self.limits_table.share_keys()
+        self.shows = list(keys)
+        self.share_keys = list(keys.values())
+        self.weights = array(
+            "l", [self.limits_table.value(key) for key in self.share_keys]
+        )
+        self.spin_boxes_list = []
+        self.change_set = LimitsChangeSet()
+
+        # Sections of the window
+        self.centralwidget = ""
+        self.shares_groupbox = None
+        self.shares_table = None
+
+        # Fonts
+        self.l_font = QtGui.QFont(
+            "Cantarell", 14, QtGui.QFont.Bold, QtGui.QFont.StyleItalic
+        )
+        self.l_font.setUnderline(True)
+        self.s_font = QtGui.QFont("Cantarell", 12)
+
+        self.setup_ui()
+
+    @traced("ui.shares_editor_window", profile=True)
+    def setup_ui(self):
+        """Sets up the user interface for the Shares Editor.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.shares_editor_window_setup()
+        self.groupbox_creation()
+        self.table_creation()
+        self.bulk_creation()
+        self.button_creation()
+        self.refresh_percentages()
+
+    def shares_editor_window_setup(self):
+        """Sets up the shares editor window, including the window's size,
+        style, and title, and centers it on the screen.
+
+        Parameters:
+            self (object): The object instance
+
+        Returns:
+            None
+        """
+
+        # Title of the Main Window can be changed here.
+        self.setWindowTitle("Farm Shares Window")
+        # Window Size can be adjusted here
+        self.setFixedSize(600, 560)
+        # Using this style sheet the theme can be changed
+        self.setStyleSheet(
+            """background-color: rgb(46, 52, 54);color: rgb(238, 238, 236);"""
+        )
+
+        self.centralwidget = QtWidgets.QWidget(self)
+        self.setCentralWidget(self.centralwidget)
+
+        def center_window(window):
+
+            frame = window.frameGeometry()
+            screen = QtGui.QGuiApplication.screenAt(QtGui.QCursor().pos())
+
+            if screen is None:
+                screen = QtGui.QGuiApplication.primaryScreen()
+
+            frame.moveCenter(screen.geometry().center())
+            window.move(frame.topLeft())
+
+        center_window(self)
+
+    def groupbox_creation(self):
+        """Creates the group box of the window.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        # Title of the Group Box
+        self.shares_groupbox = QtWidgets.QGroupBox("Farm Shares", self.centralwidget)
+        self.shares_groupbox.setFont(self.l_font)
+        self.shares_groupbox.setGeometry(10, 10, 580, 540)
+
+        def_label = QtWidgets.QLabel(
+            "Below you will see the Shares weight of every show together with "
+            "the percentage of the farm it gets:",
+            self.shares_groupbox,
+        )
+        def_label.setGeometry(10, 35, 560, 41)
+        def_label.setFont(self.s_font)
+        def_label.setWordWrap(True)
+
+    def table_creation(self):
+        """Creates the table with the weight and percentage of every show.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.shares_table = QtWidgets.QTableWidget(
+            len(self.shows), 3, self.shares_groupbox
+        )
+        self.shares_table.setGeometry(10, 80, 560, 330)
+        self.shares_table.setFont(self.s_font)
+        self.shares_table.setHorizontalHeaderLabels(["Show", "Weight", "Farm %"])
+        self.shares_table.verticalHeader().setVisible(False)
+        self.shares_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+
+        header = self.shares_table.horizontalHeader()
+        header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        header.resizeSection(1, 110)
+        header.resizeSection(2, 110)
+
+        def weight_changed(row, value):
+            self.weights[row] = value
+            self.refresh_percentages()
+
+        for row, show in enumerate(self.shows):
+            self.shares_table.setItem(row, 0, QtWidgets.QTableWidgetItem(show.upper()))
+
+            spinbox = QtWidgets.QSpinBox()
+            spinbox.setMaximum(1000000)
+            spinbox.setValue(self.weights[row])
+            spinbox.setFont(self.s_font)
+            spinbox.valueChanged.connect(
+                lambda value, row=row: weight_changed(row, value)
+            )
+            self.change_set.connect_spinbox(self.share_keys[row], spinbox)
+            self.shares_table.setCellWidget(row, 1, spinbox)
+            self.spin_boxes_list.append(spinbox)
+
+            percent_item = QtWidgets.QTableWidgetItem()
+            percent_item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+            self.shares_table.setItem(row, 2, percent_item)
+
+    def refresh_percentages(self):
+        """Renormalizes the percentage of the farm of every show in one pass.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        for row, percent in enumerate(limits_shares.percentages(self.weights)):
+            self.shares_table.item(row, 2).setText(f"{percent:.2f} %")
+
+    def bulk_creation(self):
+        """Creates the bulk operation widgets: giving a show a percentage of
+        the farm while scaling the others proportionally, and scaling every
+        weight by a factor.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        give_label = QtWidgets.QLabel("Give", self.shares_groupbox)
+        give_label.setGeometry(10, 425, 41, 22)
+        give_label.setFont(self.s_font)
+
+        show_combo_box = QtWidgets.QComboBox(self.shares_groupbox)
+        show_combo_box.setGeometry(55, 425, 181, 22)
+        show_combo_box.setFont(self.s_font)
+        show_combo_box.setStyleSheet("color : #A7F432")
+        show_combo_box.addItems([show.upper() for show in self.shows])
+
+        percent_spinbox = QtWidgets.QDoubleSpinBox(self.shares_groupbox)
+        percent_spinbox.setGeometry(245, 425, 91, 22)
+        percent_spinbox.setFont(self.s_font)
+        percent_spinbox.setRange(0.0, 100.0)
+        percent_spinbox.setSuffix(" %")
+
+        give_push_button = QtWidgets.QPushButton("Scale Others", self.shares_groupbox)
+        give_push_button.setGeometry(345, 425, 131, 22)
+        give_push_button.setFont(self.s_font)
+        give_push_button.clicked.connect(
+            lambda: self.set_weights(
+                limits_shares.give_share(
+                    self.weights,
+                    show_combo_box.currentIndex(),
+                    percent_spinbox.value(),
+                )
+            )
+        )
+
+        scale_label = QtWidgets.QLabel("Scale all by", self.shares_groupbox)
+        scale_label.setGeometry(10, 460, 101, 22)
+        scale_label.setFont(self.s_font)
+
+        factor_spinbox = QtWidgets.QDoubleSpinBox(self.shares_groupbox)
+        factor_spinbox.setGeometry(115, 460, 91, 22)
+        factor_spinbox.setFont(self.s_font)
+        factor_spinbox.setRange(0.0, 100.0)
+        factor_spinbox.setSingleStep(0.1)
+        factor_spinbox.setValue(1.0)
+
+        scale_push_button = QtWidgets.QPushButton("Scale", self.shares_groupbox)
+        scale_push_button.setGeometry(215, 460, 91, 22)
+        scale_push_button.setFont(self.s_font)
+        scale_push_button.clicked.connect(
+            lambda: self.set_weights(
+                limits_shares.scale_shares(self.weights, factor_spinbox.value())
+            )
+        )
+
+    def set_weights(self, new_weights):
+        """Applies new weights to every show at once. The spin boxes don't
+        signal every single change, the change set is updated directly and the
+        percentages are renormalized only once.
+
+        Parameters:
+            self (object): The object instance.
+            new_weights (array): New weight of every show.
+
+        Returns:
+            None
+        """
+
+        for row, weight in enumerate(new_weights):
+            if weight == self.weights[row]:
+                continue
+
+            spinbox = self.spin_boxes_list[row]
+            spinbox.blockSignals(True)
+            spinbox.setValue(weight)
+            spinbox.blockSignals(False)
+
+            self.weights[row] = weight
+            self.change_set.record(self.share_keys[row], weight)
+
+        self.refresh_percentages()
+
+    def button_creation(self):
+        """Creates 'submit' and 'cancel' buttons within the shares group box.
+        'submit' stays disabled until something has been modified.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        # Name can be changed here
+        submit_push_button = QtWidgets.QPushButton("Submit", self.shares_groupbox)
+        submit_push_button.setGeometry(380, 505, 91, 22)
+        submit_push_button.setFont(self.s_font)
+        submit_push_button.setEnabled(False)
+
+        self.change_set.listeners.append(
+            lambda key, value: submit_push_button.setEnabled(bool(self.change_set))
+        )
+
+        submit_push_button.clicked.connect(self.submit_button_clicked)
+        submit_push_button.clicked.connect(self.close)
+
+        # Name can be changed here
+        cancel_push_button = QtWidgets.QPushButton("Cancel", self.shares_groupbox)
+        cancel_push_button.setGeometry(480, 505, 91, 22)
+        cancel_push_button.setFont(self.s_font)
+
+        cancel_push_button.clicked.connect(self.cancel_button_clicked)
+        cancel_push_button.clicked.connect(self.close)
+
+    def submit_button_clicked(self):
+        """Calls upon the Confirmation Window with the weights modified in this
+        window, which then goes through the usual Stage and Write windows.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+
+        changes_confirmation_window = UiConfirmFarmChangesMainWindow(
+            self.change_set.old_values(),
+            dict(self.change_set.new_values),
+            self.limits_table,
+            self.config_file_path_name,
+            self.temp_folder,
+            self.backup_folder,
+        )
+
+        changes_confirmation_window.show()
+
+    def cancel_button_clicked(self):
+        """Calls upon the main window of the UI if the user decides to cancel
+        the process.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        from main_limits_selection_window import UiLimitsMainWindow
+
+        farm_selection_windows = UiLimitsMainWindow()
+        farm_selection_windows.show()
@@ -9,12 +9,13 @@ Please only adjust values if totally sure of what you are doing!
 Created by Guillermo Aguero - Render TD
 """
 
-import json
-import os
-from collections import OrderedDict
 from qtpy import QtCore, QtGui, QtWidgets
 
-from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+import limits_constraints
+import limits_daemon
+import limits_watch
+from limits_change_set import LimitsChangeSet
+from limits_tracing import traced
 
 
 class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
@@ -35,15 +36,25 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
         groupbox_creation(): Creates and sets up the group box for the Show Limits window.
         groupbox_info_creation(): Creates and configures the labels and spin boxes
         within the show limits group box.
-        update_current_values(limit, spinbox, capital_limit): Applies the current values
-        from the configuration to the spin boxes and updates the dictionary of current values.
+        update_current_values(limit, spinbox): Applies the current values from the
+        configuration to the spin boxes and starts tracking them in the change set.
         info_label_creation(): Creates informational labels within the show limits group box.
         button_creation(): Creates and configures the Submit and Cancel buttons within
         the show limits group box.
         cancel_button_clicked(): Handles the click event of the Cancel button.
+        watcher_creation(): Keeps the window up to date while it is open.
+        limits_changed(table, changes): Shows the values changed by someone else.
+        proposal_creation(): Loads the proposed values into the spin boxes.
     """
 
-    def __init__(self, show, config_file_path_name, temp_folder, backup_folder):
+    def __init__(
+        self,
+        show,
+        config_file_path_name,
+        temp_folder,
+        backup_folder,
+        proposed_values=None,
+    ):
         """Initializes the instance of the UiShowLimitsMainWindow class.
 
         This constructor sets up the initial state and user interface components for
@@ -55,16 +66,21 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder.
             backup_folder (str): Path to the backup folder.
+            proposed_values (dict): Values loaded into the spin boxes as
+            changes, e.g. from limits_usage, None for none.
 
         UI Components:
             centralwidget (QWidget): Central widget for the main window.
-            show_limit_sections (list): List to hold sections related to show limits.
+            show_limit_sections (list): Keys of the limits of the show.
             show_limits_groupbox (QGroupBox): Group box containing UI elements
             related to show limits.
-            spinboxes_list (list): List to hold QSpinBox widgets for adjusting
-            show limits.
-            current_values_full_dict (dict): Dictionary to store the current
-            full values for the show limits.
+            spinboxes_by_key (dict): QSpinBox adjusting every show limit.
+            proposed_values (dict): Proposed value per key.
+            change_set (LimitsChangeSet): Only the show limits modified by the user.
+            constraint_engine (LimitsConstraintEngine): Cross-limit constraints
+            checked while the spin boxes change.
+            constraints_rebased (callable): Takes the values loaded as the
+            baseline of the constraints again, after a remote change.
 
         Fonts:
             l_font (QFont): Large, bold, italic font with underline for headings.
@@ -87,8 +103,12 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
         self.centralwidget = ""
         self.show_limit_sections = []
         self.show_limits_groupbox = None
-        self.spinboxes_list = []
-        self.current_values_full_dict = dict()
+        self.spinboxes_by_key = {}
+        self.proposed_values = proposed_values or {}
+        self.change_set = LimitsChangeSet()
+        self.constraint_engine = None
+        self.constraints_rebased = None
+        self.limits_watcher = None
 
         # Fonts
         self.l_font = QtGui.QFont(
@@ -105,6 +125,7 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
 
         self.setup_ui()
 
+    @traced("ui.show_limits_window", profile=True)
     def setup_ui(self):
         """Sets up the user interface for the Show Limits application.
 
@@ -118,14 +139,11 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        if os.path.exists(self.temp_folder + "temp.config"):
-            # Opening config file
-            with open(self.temp_folder + "temp.config", "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
-        else:
-            # Opening config file
-            with open(self.config_file_path_name, "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
+        # Opening the staged config file if there is one, shared with the
+        # other windows and served by the daemon when it is running
+        self.limits_table = limits_daemon.load_session_table(
+            self.config_file_path_name, self.temp_folder
+        )
 
         self.create_show_limit_sections()
         self.show_limits_window_setup()
@@ -133,12 +151,16 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
         self.groupbox_info_creation()
         self.info_label_creation()
         self.button_creation()
+        self.watcher_creation()
+        self.proposal_creation()
 
+    @traced("keys.classify")
     def create_show_limit_sections(self):
         """Creates a list of show limit sections based on the provided show name.
 
         This method populates the `show_limit_sections` attribute with sections
-        that match the given show name.
+        that match the given show name, any extra Yeti settings included for
+        PWP, as already classified by the limits table.
 
         Parameters:
             self (object): The object instance.
@@ -146,20 +168,8 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
         Returns:
             None
         """
-        low_cap_show = self.show_name.lower()
-        show_search = f"{low_cap_show}_"
-        extras_pwp = "yeti_"
-
-        # This generates a list of all shows with limits available for change
-        for key in self.contents_dict["Limits"].keys():
-            if show_search in key:
-                self.show_limit_sections.append(key)
 
-        # Adds any extra settings PWP has regarding Yeti
-        if "pwp" in show_search:
-            for key in self.contents_dict["Limits"].keys():
-                if extras_pwp in key:
-                    self.show_limit_sections.append(key)
+        self.show_limit_sections = self.limits_table.show_keys(self.show_name)
 
     def show_limits_window_setup(self):
         """Sets up the main window for the Show Limits application.
@@ -299,8 +309,8 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
             )
             labels_list.append(label)
             spin_box = spin_box_creation(limit, box_y_axis_value, x_axis_value)
-            self.spinboxes_list.append(spin_box)
-            self.update_current_values(limit, spin_box, capital_limit)
+            self.spinboxes_by_key[limit] = spin_box
+            self.update_current_values(limit, spin_box)
 
             label_y_axis_value += 65
             box_y_axis_value += 65
@@ -318,29 +328,27 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
                 box_y_axis_value = box_y_axis_original
                 x_axis_value = 765
 
-    def update_current_values(self, limit, spinbox, capital_limit):
+    def update_current_values(self, limit, spinbox):
         """
-        Applies the current values from the configuration to the spin boxes and updates
-        the dictionary of current values.
+        Applies the current values from the configuration to the spin boxes and starts
+        tracking them in the change set.
 
         This method retrieves the current site maximum value for a given limit from the
         configuration dictionary, sets this value to the corresponding spin box, and
-        updates the internal dictionary with the capitalized limit name and its value.
+        connects the spin box to the change set so only modified values are submitted.
 
         Parameters:
             self (object): The object instance.
             limit (str): The key representing the limit in the configuration dictionary.
             spinbox (QSpinBox): The spin box widget to set the value for.
-            capital_limit (str): The capitalized limit name used as a key in
-            the internal dictionary.
 
         Returns:
             None
         """
 
-        current_value = self.contents_dict["Limits"][limit]["SiteMax"]
+        current_value = self.limits_table.value(limit)
         spinbox.setValue(current_value)
-        self.current_values_full_dict.update({capital_limit: current_value})
+        self.change_set.connect_spinbox(limit, spinbox)
 
     def info_label_creation(self):
         """Creates informational labels within the show limits group box.
@@ -385,9 +393,10 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
         """Creates and configures the Submit and Cancel buttons within the show
         limits group box.
 
-        The Submit button collects the new values from the spin boxes and
-        passes them to the confirmation window for further action. The Cancel
-        button discards the changes and closes the window.
+        The Submit button passes the values modified in the spin boxes to the
+        confirmation window for further action and stays disabled until
+        something has been modified or while a value breaks a constraint. The
+        Cancel button discards the changes and closes the window.
 
         Parameters:
             self (object): The object instance.
@@ -401,14 +410,25 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
         submit_pushbutton.setGeometry(495, 375, 91, 22)
         submit_pushbutton.setFont(self.s_font)
 
+        # Flags values breaking a constraint and keeps Submit disabled while
+        # there is nothing to submit or something is flagged
+        self.constraint_engine = limits_constraints.load_constraint_engine(
+            self.config_file_path_name, self.limits_table
+        )
+        self.constraints_rebased = limits_constraints.connect_constraints(
+            self.constraint_engine,
+            self.change_set,
+            self.spinboxes_by_key,
+            submit_pushbutton,
+        )
+
         # Runs when submit button is clicked
         # config_file_path_name, temp_folder, backup_folder
         def submit_button_clicked():
             """Handles the click event of the Submit button.
 
-            This method collects the new values from the spin boxes and
-            creates a dictionary with the updated values. It then opens the
-            confirmation window to review the changes.
+            This method opens the confirmation window to review only the
+            values that were modified through the spin boxes.
 
             Parameters:
                 None
@@ -417,19 +437,12 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
                 None
             """
 
-            new_values_list = []
-            capital_key_list = []
-            for limit in self.show_limit_sections:
-                capital_key_list.append(limit.capitalize())
-            for box in self.spinboxes_list:
-                new_value = box.value()
-                new_values_list.append(new_value)
+            from changes_confirmation_window import UiConfirmFarmChangesMainWindow
 
-            new_values_full_dict = dict(zip(capital_key_list, new_values_list))
             changes_confirmation_window = UiConfirmFarmChangesMainWindow(
-                self.current_values_full_dict,
-                new_values_full_dict,
-                self.contents_dict,
+                self.change_set.old_values(),
+                dict(self.change_set.new_values),
+                self.limits_table,
                 self.config_file_path_name,
                 self.temp_folder,
                 self.backup_folder,
@@ -448,6 +461,62 @@ class UiShowLimitsMainWindow(QtWidgets.QMainWindow):
         cancel_pushbutton.clicked.connect(self.cancel_button_clicked)
         cancel_pushbutton.clicked.connect(self.close)
 
+    def watcher_creation(self):
+        """Keeps the window up to date while it is open.
+
+        When the configuration file or the staged 'temp.config' change
+        underneath the window (for example a colleague wrote new limits),
+        only the spin boxes of the keys that changed are updated and
+        highlighted, and Submit stages on top of the new values.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.limits_watcher = limits_watch.LimitsFileWatcher(
+            self.config_file_path_name, self.temp_folder, self.limits_table, self
+        )
+        self.limits_watcher.limits_changed.connect(self.limits_changed)
+
+    def limits_changed(self, table, changes):
+        """Shows the values changed by someone else.
+
+        Parameters:
+            self (object): The object instance.
+            table (LimitsTable): Limits as they are now.
+            changes (dict): (old, new) value per key that changed.
+
+        Returns:
+            None
+        """
+
+        self.limits_table = table
+        limits_watch.show_remote_changes(
+            changes, self.change_set, self.spinboxes_by_key
+        )
+        # What someone else wrote doesn't count as introduced by the user
+        if self.constraints_rebased is not None:
+            self.constraints_rebased()
+
+    def proposal_creation(self):
+        """Loads the proposed values into the spin boxes, so they are
+        reviewed and submitted like any other change.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        if self.proposed_values:
+            from limits_usage import show_proposed_values
+
+            show_proposed_values(self.proposed_values, self.spinboxes_by_key)
+
     def cancel_button_clicked(self):
         """Handles the click event of the Cancel button.
 
@@ -10,10 +10,15 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-from collections import OrderedDict
-import json
 from qtpy import QtGui, QtWidgets, QtCore
 
+import limits_show_search
+import limits_table
+from limits_tracing import traced
+
+FAVOURITE_TEXT = "★"
+NOT_FAVOURITE_TEXT = "☆"
+
 
 class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
     """
@@ -35,6 +40,10 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
         show_select_limits_window_setup(): Sets up the show selection window.
         groupbox_creation(): Creates a group box for show limits selection.
         combo_box_creation(): Creates a combo box for selecting shows.
+        fill_combo_box(): Lists the favourite, recent and other shows.
+        search_shows(text): Offers the shows best matching the text typed.
+        favourite_button_creation(): Creates a button marking favourite shows.
+        update_favourite_button(text): Shows whether a show is a favourite.
         label_creation(): Creates the main label for show limits selection.
         button_creation(): Creates a button for confirming show limits selection.
     """
@@ -55,7 +64,7 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder.
             backup_folder (str): Path to the backup folder.
-            contents_dict (dict): Contents of the configuration file as an ordered dictionary.
+            limits_table (LimitsTable): Limits of the configuration file, shared with the other windows.
             show_select_window_ui (object): UI object for the show selection window.
             app_selection_limits_ui (object): UI object for the application selection limits.
 
@@ -63,10 +72,16 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
             centralwidget (QWidget): Central widget for the main window.
             show_select_limits_groupbox (QGroupBox): Group box for show limits
             selection UI components.
-            show_limits_select_combobox (QComboBox): Combo box for show limits selection.
+            show_limits_select_combobox (QComboBox): Combo box for show limits
+            selection, searched as the user types.
+            show_completer (QCompleter): Shows matching the text typed.
+            favourite_push_button (QPushButton): Marks the selected show as a
+            favourite.
             show_limits_confirm_push_button (QPushButton): Push button to confirm show
             limits selection.
             shows (list): List of shows loaded from the configuration file.
+            show_index (ShowIndex): Search index of the shows offered.
+            show_preferences (dict): Recent and favourite shows of the user.
 
         Fonts:
             l_font (QFont): Large, bold, italic font with underline for headings.
@@ -87,12 +102,15 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
         self.show_select_limits_groupbox = None
         self.show_limits_select_combobox = None
         self.show_limits_confirm_push_button = None
+        self.show_completer = None
+        self.favourite_push_button = None
         self.shows = None
+        self.show_index = None
+        self.show_preferences = limits_show_search.load_preferences()
         self.config_file_path_name = config_file_path_name
 
         # Opening config file
-        with open(config_file_path_name, "r") as i:
-            self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
+        self.limits_table = limits_table.load_table(config_file_path_name)
 
         # Fonts
         self.l_font = QtGui.QFont(
@@ -108,6 +126,7 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
 
         self.setup_ui()
 
+    @traced("ui.show_selection_window", profile=True)
     def setup_ui(self):
         """Sets up the user interface for the show select limits window.
 
@@ -128,14 +147,17 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
         self.groupbox_creation()
         self.label_creation()
         self.combo_box_creation()
+        self.favourite_button_creation()
         self.button_creation()
 
+    @traced("keys.classify")
     def create_shows_list(self):
         """Creates a list of shows based on the contents of the configuration
         file.
 
         This method reads the configuration file and generates a list of shows,
-        excluding certain predefined shows.
+        excluding certain predefined shows, and the search index of the ones
+        offered in the combo box.
 
         Parameters:
             self (object): The object instance.
@@ -146,10 +168,14 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
 
         self.shows = []
         avoid = ["X", "default"] # Changed for this example
-        for key in self.contents_dict["Limits"]["linuxfarm"]["Shares"].keys():
+        for key in self.limits_table.shows:
             if all(word not in key for word in avoid):
                 self.shows.append(key)
 
+        self.show_index = limits_show_search.show_index(
+            tuple(show for show in self.shows if "ACG" not in show)
+        )
+
     def show_select_limits_window_setup(self):
         """Sets up the show selection window with the specified properties.
 
@@ -217,6 +243,8 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
 
         This method initializes the combo box within the 'Show Limits Selection' group box,
         sets its geometry, font, and style, and populates it with a list of shows.
+        The combo box can be typed in: the shows best matching the text are
+        offered as it changes, see limits_show_search.
 
         Parameters:
             self (object): The object instance.
@@ -231,13 +259,137 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
         self.show_limits_select_combobox.setGeometry(10, 120, 201, 22)
         self.show_limits_select_combobox.setFont(self.s_font)
         self.show_limits_select_combobox.setStyleSheet("color : #A7F432")
+        self.show_limits_select_combobox.setEditable(True)
+        self.show_limits_select_combobox.setInsertPolicy(
+            QtWidgets.QComboBox.NoInsert
+        )
 
-        for show in self.shows:
-            if "ACG" in show:
+        # The index does the matching, the completer only shows its results
+        self.show_completer = QtWidgets.QCompleter(
+            QtCore.QStringListModel(self), self.show_limits_select_combobox
+        )
+        self.show_completer.setCompletionMode(
+            QtWidgets.QCompleter.UnfilteredPopupCompletion
+        )
+        self.show_completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.show_limits_select_combobox.setCompleter(self.show_completer)
+        self.show_limits_select_combobox.lineEdit().textEdited.connect(
+            self.search_shows
+        )
+
+        self.fill_combo_box()
+
+    def fill_combo_box(self):
+        """Lists the favourite shows, then the recent ones, then every other
+        show, with a separator between the groups.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        favourites, recent = limits_show_search.pinned_shows(
+            self.show_index, self.show_preferences
+        )
+        pinned = set(favourites + recent)
+        groups = (
+            favourites,
+            recent,
+            [show for show in self.show_index.keys if show not in pinned],
+        )
+
+        combobox = self.show_limits_select_combobox
+        combobox.blockSignals(True)
+        combobox.clear()
+        for group in groups:
+            if not group:
                 continue
+            if combobox.count():
+                combobox.insertSeparator(combobox.count())
+            for show in group:
+                combobox.addItem(self.show_index.name_for(show))
+        combobox.blockSignals(False)
+
+    def search_shows(self, text):
+        """Offers the shows best matching the text typed.
+
+        Parameters:
+            self (object): The object instance.
+            text (str): Text typed in the combo box.
+
+        Returns:
+            None
+        """
 
-            capital_show = show.upper()
-            self.show_limits_select_combobox.addItem(f"{capital_show}")
+        favourites, recent = limits_show_search.pinned_shows(
+            self.show_index, self.show_preferences
+        )
+        self.show_completer.model().setStringList(
+            self.show_index.search(text, favourites + recent)
+        )
+        if text.strip():
+            self.show_completer.complete()
+
+    def favourite_button_creation(self):
+        """Creates a button marking the selected show as a favourite, listed
+        first from then on.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        self.favourite_push_button = QtWidgets.QPushButton(
+            NOT_FAVOURITE_TEXT, self.show_select_limits_groupbox
+        )
+        self.favourite_push_button.setGeometry(215, 120, 28, 22)
+        self.favourite_push_button.setToolTip("Favourite show")
+
+        def favourite_button_clicked():
+            """Adds the selected show to the favourite shows, or removes it."""
+
+            show = self.show_index.key_for(
+                self.show_limits_select_combobox.currentText()
+            )
+            if show is None:
+                return
+
+            limits_show_search.toggle_favourite(self.show_preferences, show)
+            limits_show_search.save_preferences(self.show_preferences)
+            self.fill_combo_box()
+            self.show_limits_select_combobox.setCurrentText(
+                self.show_index.name_for(show)
+            )
+            self.update_favourite_button(self.show_index.name_for(show))
+
+        self.favourite_push_button.clicked.connect(favourite_button_clicked)
+        self.show_limits_select_combobox.currentTextChanged.connect(
+            self.update_favourite_button
+        )
+        self.update_favourite_button(self.show_limits_select_combobox.currentText())
+
+    def update_favourite_button(self, text):
+        """Shows whether the selected show is a favourite.
+
+        Parameters:
+            self (object): The object instance.
+            text (str): Text of the combo box.
+
+        Returns:
+            None
+        """
+
+        show = self.show_index.key_for(text)
+        self.favourite_push_button.setEnabled(show is not None)
+        self.favourite_push_button.setText(
+            FAVOURITE_TEXT
+            if show in self.show_preferences["favourites"]
+            else NOT_FAVOURITE_TEXT
+        )
 
     def label_creation(self):
         """Creates and configures the main label for show limits selection.
@@ -311,9 +463,11 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
             """Checks the selected show from the combo box and opens the
             corresponding show limits window.
 
-            This method retrieves the current text from the combo box, matches it
-            with the list of shows, and opens the corresponding window for the
-            selected show. After opening the new window, the current window is closed.
+            This method retrieves the current text from the combo box, looks up
+            its show in the index (or takes the match highlighted in the list
+            of a partial name), and opens the corresponding window for the
+            selected show. After opening the new window, the current window is
+            closed.
 
             Parameters:
                 None
@@ -321,9 +475,20 @@ class UiShowSelectionLimitsMainWindow(QtWidgets.QMainWindow):
             Returns:
                 None
             """
-            for show in self.shows:
-                if self.show_limits_select_combobox.currentText() == show.upper():
-                    open_show_limits_window(show)
+            text = self.show_limits_select_combobox.currentText()
+            show = self.show_index.key_for(text)
+            if show is None:
+                # Only the match the user highlighted, never a guess
+                highlighted = self.show_completer.popup().currentIndex()
+                if not highlighted.isValid():
+                    return
+                show = self.show_index.key_for(highlighted.data())
+                if show is None:
+                    return
+
+            limits_show_search.add_recent(self.show_preferences, show)
+            limits_show_search.save_preferences(self.show_preferences)
+            open_show_limits_window(show)
 
             self.close()
 
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+
+"""
+Generator of synthetic Tractor 'limits.config' files at any scale, used by the
+benchmarks and to try the Farm UI without access to the real farm.
+Please only adjust values if totally sure of what you are doing!
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+Every file has the 'linuxfarm' Shares of N shows, M tags per show (like
+'pwp_katana'), K application tags and the 'yeti_' tags of some shows. A few
+names are always included on purpose because the windows classify keys by
+substring:
+
+    - shows whose name is part of an application tag ('ar' / 'arnold')
+    - shows whose name is the start of another show ('pw' / 'pwp')
+    - application tags containing 'linux', 'windows' or 'yeti'
+
+Usage:
+    synthetic_config.py OUTPUT [--shows N] [--tags M] [--applications K]
+                        [--seed S]
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+from collections import OrderedDict
+
+# Application tags found on every farm, the rest are generated
+COMMON_APPLICATIONS = (
+    "katana",
+    "maya",
+    "arnold",
+    "nuke",
+    "houdini",
+    "renderman",
+    "mantra",
+    "vray",
+)
+TRICKY_SHOWS = ("ar", "pw", "pwp")
+TRICKY_APPLICATIONS = ("houdini_linux", "windows_nuke", "yetix", "mayapy")
+
+
+def random_name(generator, length):
+    """Returns a random lower case name.
+
+    Parameters:
+        generator (Random): Random number generator.
+        length (int): Length of the name.
+
+    Returns:
+        str: The name.
+    """
+
+    return "".join(generator.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_config(shows=20, tags_per_show=4, applications=30, seed=0):
+    """Builds the contents of a synthetic configuration file.
+
+    Parameters:
+        shows (int): Shows in the 'linuxfarm' Shares.
+        tags_per_show (int): Tags of every show, e.g. 'pwp_katana'.
+        applications (int): Application tags.
+        seed (int): Seed of the random number generator, the same seed always
+        gives the same file.
+
+    Returns:
+        OrderedDict: Contents of the configuration file.
+    """
+
+    generator = random.Random(seed)
+
+    application_names = list(COMMON_APPLICATIONS + TRICKY_APPLICATIONS)
+    while len(application_names) < applications:
+        name = random_name(generator, generator.randint(4, 9))
+        if name not in application_names:
+            application_names.append(name)
+    application_names = application_names[: max(applications, 0)]
+
+    show_names = list(TRICKY_SHOWS[: max(shows, 0)])
+    while len(show_names) < shows:
+        name = random_name(generator, generator.randint(3, 5))
+        if name not in show_names and name not in application_names:
+            show_names.append(name)
+
+    limits = OrderedDict()
+
+    shares = OrderedDict()
+    for show in show_names:
+        shares[show] = OrderedDict(
+            share=generator.randint(1, 100), cap=generator.randint(50, 500)
+        )
+    shares["default"] = OrderedDict(share=1, cap=10)
+    limits["linuxfarm"] = OrderedDict(Shares=shares, SiteMax=50 * max(shows, 1))
+    limits["windowsfarm"] = OrderedDict(SiteMax=generator.randint(20, 200))
+
+    for application in application_names:
+        limits[application] = OrderedDict(
+            SiteMax=generator.randint(10, 500),
+            Description=f"{application.capitalize()} licenses",
+        )
+
+    for show in show_names:
+        tags = generator.sample(
+            application_names, min(tags_per_show, len(application_names))
+        )
+        for application in tags:
+            limits[f"{show}_{application}"] = OrderedDict(
+                SiteMax=generator.randint(5, 100)
+            )
+        if generator.random() < 0.25:
+            limits[f"yeti_{show}"] = OrderedDict(SiteMax=generator.randint(1, 20))
+
+    return OrderedDict(Limits=limits)
+
+
+def main(argv=None):
+    """Parses the command line and writes a synthetic configuration file.
+
+    Parameters:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: Exit code.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("output", help="path of the '.config' file to write")
+    parser.add_argument("--shows", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=4, help="tags per show")
+    parser.add_argument("--applications", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    contents_dict = generate_config(args.shows, args.tags, args.applications, args.seed)
+
+    with open(args.output, "w") as o:
+        json.dump(contents_dict, o, indent=4)
+
+    print(
+        f"{args.output}: {len(contents_dict['Limits'])} limit keys, "
+        f"{args.shows} shows"
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
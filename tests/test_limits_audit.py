@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+"""
+Checks the audit log and its append-only index: queries by key and time,
+updates that only append to the index file, and the recovery from an index
+left half written, in an older format, or older than the log.
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+From the folder of the Farm UI:
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_FOLDER)
+
+import limits_audit  # noqa: E402
+
+
+def record(audit_path, changes, moment):
+    """Records a verified commit made at a given time."""
+
+    return limits_audit.record_commit(audit_path, changes, 0, {}, "test", moment)
+
+
+def read_bytes(path):
+    with open(path, "rb") as i:
+        return i.read()
+
+
+def keys_and_times(records):
+    return [(entry["key"], entry["time"]) for entry in records]
+
+
+def test_query_by_key_and_time(tmp_path):
+    audit_path = str(tmp_path / limits_audit.AUDIT_FILE_NAME)
+    record(audit_path, {"katana": (100, 120), "pwp_maya": (30, 35)}, 1000.0)
+    record(audit_path, {"katana": (120, 90)}, 2000.0)
+    record(audit_path, {"pwp_katana": (40, 45)}, 3000.0)
+
+    assert keys_and_times(limits_audit.query_audit(audit_path, ["katana"])) == [
+        ("katana", 1000.0),
+        ("katana", 2000.0),
+    ]
+    assert keys_and_times(
+        limits_audit.query_audit(audit_path, limits_audit.show_patterns("PWP"))
+    ) == [("pwp_maya", 1000.0), ("pwp_katana", 3000.0)]
+    assert keys_and_times(
+        limits_audit.query_audit(audit_path, since=1500.0, until=2500.0)
+    ) == [("katana", 2000.0)]
+    assert limits_audit.query_audit(audit_path, ["houdini"]) == []
+
+
+def test_index_file_is_only_appended_to(tmp_path):
+    audit_path = str(tmp_path / limits_audit.AUDIT_FILE_NAME)
+    index_path = limits_audit.index_file_path(audit_path)
+
+    record(audit_path, {"katana": (100, 120)}, 1000.0)
+    limits_audit.update_audit_index(audit_path)
+    first = read_bytes(index_path)
+
+    record(audit_path, {"maya": (80, 90), "nuke": (60, 70)}, 2000.0)
+    limits_audit.update_audit_index(audit_path)
+    second = read_bytes(index_path)
+
+    assert second.startswith(first)
+    assert second.count(b"\n") == 3
+
+
+def test_other_process_reads_the_index_file(tmp_path):
+    audit_path = str(tmp_path / limits_audit.AUDIT_FILE_NAME)
+    record(audit_path, {"katana": (100, 120)}, 1000.0)
+    record(audit_path, {"katana": (120, 90)}, 2000.0)
+    expected = limits_audit.query_audit(audit_path, ["katana"])
+
+    # As a new process would, with nothing in memory
+    limits_audit._indexes.clear()
+
+    assert limits_audit.query_audit(audit_path, ["katana"]) == expected
+
+
+def test_half_written_index_line_is_dropped(tmp_path):
+    audit_path = str(tmp_path / limits_audit.AUDIT_FILE_NAME)
+    index_path = limits_audit.index_file_path(audit_path)
+    record(audit_path, {"katana": (100, 120)}, 1000.0)
+    limits_audit.update_audit_index(audit_path)
+    complete = read_bytes(index_path)
+
+    with open(index_path, "ab") as o:
+        o.write(b"[2000.0, 99")
+    limits_audit._indexes.clear()
+    record(audit_path, {"maya": (80, 90)}, 2000.0)
+
+    assert keys_and_times(limits_audit.query_audit(audit_path)) == [
+        ("katana", 1000.0),
+        ("maya", 2000.0),
+    ]
+    assert read_bytes(index_path).startswith(complete)
+    assert b"99\n" not in read_bytes(index_path)
+
+
+def test_index_in_older_format_is_built_again(tmp_path):
+    audit_path = str(tmp_path / limits_audit.AUDIT_FILE_NAME)
+    index_path = limits_audit.index_file_path(audit_path)
+    record(audit_path, {"katana": (100, 120), "maya": (80, 90)}, 1000.0)
+
+    with open(index_path, "w") as o:
+        o.write('{"size": 0, "keys": {}}\n')
+
+    assert keys_and_times(limits_audit.query_audit(audit_path)) == [
+        ("katana", 1000.0),
+        ("maya", 1000.0),
+    ]
+
+
+def test_truncated_log_is_indexed_again(tmp_path):
+    audit_path = str(tmp_path / limits_audit.AUDIT_FILE_NAME)
+    record(audit_path, {"katana": (100, 120), "maya": (80, 90)}, 1000.0)
+    limits_audit.update_audit_index(audit_path)
+
+    os.remove(audit_path)
+    record(audit_path, {"nuke": (60, 70)}, 2000.0)
+
+    assert keys_and_times(limits_audit.query_audit(audit_path)) == [("nuke", 2000.0)]
+
+
+def test_record_still_being_written_is_left_for_later(tmp_path):
+    audit_path = str(tmp_path / limits_audit.AUDIT_FILE_NAME)
+    record(audit_path, {"katana": (100, 120)}, 1000.0)
+    with open(audit_path, "a") as o:
+        o.write('{"time": 2000.0, "key": "maya"')
+
+    index = limits_audit.update_audit_index(audit_path)
+
+    assert list(index["keys"]) == ["katana"]
+    assert index["size"] < os.path.getsize(audit_path)
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+
+"""
+Checks the columnar history index of the backup snapshots: the points of
+every key, segments appended without rewriting the file, keys removed from a
+snapshot, and the rebuilds and merges of the segments.
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+From the folder of the Farm UI:
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_FOLDER)
+
+import limits_history_index  # noqa: E402
+from limits_history_index import REMOVED, LimitsHistoryIndex  # noqa: E402
+
+
+def snapshot(backup_folder, day, values):
+    """Writes a backup of the limits as it would be made on a day of May 2024
+    at noon, and returns its timestamp."""
+
+    file_name = f"D2024-05-{day:02d}-T120000.config"
+    contents_dict = {
+        "Limits": {key: {"SiteMax": value} for key, value in values.items()}
+    }
+    with open(os.path.join(backup_folder, file_name), "w") as o:
+        json.dump(contents_dict, o)
+
+    return limits_history_index.backup_timestamp(file_name)
+
+
+def points(backup_folder, key):
+    index_path = limits_history_index.index_file_path(str(backup_folder))
+    with LimitsHistoryIndex(index_path) as index:
+        timestamps, values = index.arrays(key)
+        key_points = list(zip(timestamps.tolist(), values.tolist()))
+        # The memory map can't be closed while they point into it
+        timestamps.release()
+        values.release()
+
+    return key_points
+
+
+def read_bytes(path):
+    with open(path, "rb") as i:
+        return i.read()
+
+
+def test_points_only_where_the_value_changed(tmp_path):
+    first = snapshot(tmp_path, 1, {"katana": 100, "maya": 80})
+    second = snapshot(tmp_path, 2, {"katana": 100, "maya": 90})
+    third = snapshot(tmp_path, 3, {"katana": 120, "maya": 90})
+
+    assert limits_history_index.update_index(str(tmp_path)) == 3
+
+    assert points(tmp_path, "katana") == [(first, 100), (third, 120)]
+    assert points(tmp_path, "maya") == [(first, 80), (second, 90)]
+
+    index_path = limits_history_index.index_file_path(str(tmp_path))
+    with LimitsHistoryIndex(index_path) as index:
+        assert index.value_at("katana", second) == 100
+        assert index.value_at("katana", first - 1) is None
+        assert index.last_value("maya") == 90
+        timestamps, values = index.query("katana", start=second, end=third)
+        assert values.tolist() == [100, 120]
+        timestamps.release()
+        values.release()
+
+
+def test_new_snapshots_are_appended_as_a_segment(tmp_path):
+    first = snapshot(tmp_path, 1, {"katana": 100})
+    limits_history_index.update_index(str(tmp_path))
+    index_path = limits_history_index.index_file_path(str(tmp_path))
+    before = read_bytes(index_path)
+
+    second = snapshot(tmp_path, 2, {"katana": 120})
+    assert limits_history_index.update_index(str(tmp_path)) == 1
+    after = read_bytes(index_path)
+
+    # Only the end of the last segment in the file header changes
+    header_size = limits_history_index.FILE_HEADER.size
+    assert after[header_size : len(before)] == before[header_size:]
+    with LimitsHistoryIndex(index_path) as index:
+        assert index.segment_count == 2
+    assert points(tmp_path, "katana") == [(first, 100), (second, 120)]
+
+
+def test_nothing_new_changes_nothing(tmp_path):
+    snapshot(tmp_path, 1, {"katana": 100})
+    limits_history_index.update_index(str(tmp_path))
+    index_path = limits_history_index.index_file_path(str(tmp_path))
+    before = read_bytes(index_path)
+
+    assert limits_history_index.update_index(str(tmp_path)) == 0
+    assert read_bytes(index_path) == before
+
+
+def test_removed_keys_are_marked(tmp_path):
+    first = snapshot(tmp_path, 1, {"katana": 100, "nuke": 60})
+    limits_history_index.update_index(str(tmp_path))
+    second = snapshot(tmp_path, 2, {"katana": 100})
+    limits_history_index.update_index(str(tmp_path))
+    third = snapshot(tmp_path, 3, {"katana": 100, "nuke": 70})
+    limits_history_index.update_index(str(tmp_path))
+
+    assert points(tmp_path, "nuke") == [(first, 60), (second, REMOVED), (third, 70)]
+
+    index_path = limits_history_index.index_file_path(str(tmp_path))
+    with LimitsHistoryIndex(index_path) as index:
+        assert index.value_at("nuke", second) is None
+        assert index.value_at("nuke", third) == 70
+
+
+def test_older_snapshot_rebuilds_the_index(tmp_path):
+    second = snapshot(tmp_path, 2, {"katana": 120})
+    limits_history_index.update_index(str(tmp_path))
+    third = snapshot(tmp_path, 3, {"katana": 130})
+    limits_history_index.update_index(str(tmp_path))
+
+    first = snapshot(tmp_path, 1, {"katana": 100})
+    assert limits_history_index.update_index(str(tmp_path)) == 3
+
+    index_path = limits_history_index.index_file_path(str(tmp_path))
+    with LimitsHistoryIndex(index_path) as index:
+        assert index.segment_count == 1
+    assert points(tmp_path, "katana") == [
+        (first, 100),
+        (second, 120),
+        (third, 130),
+    ]
+
+
+def test_segments_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(limits_history_index, "MAX_SEGMENTS", 3)
+    moments = []
+    for day in range(1, 6):
+        moments.append(snapshot(tmp_path, day, {"katana": 100 + day}))
+        limits_history_index.update_index(str(tmp_path))
+
+    index_path = limits_history_index.index_file_path(str(tmp_path))
+    with LimitsHistoryIndex(index_path) as index:
+        assert index.segment_count < 3
+        assert len(index.files) == 5
+    assert points(tmp_path, "katana") == [
+        (moment, 100 + day) for day, moment in enumerate(moments, 1)
+    ]
+
+
+def test_damaged_index_is_rebuilt(tmp_path):
+    first = snapshot(tmp_path, 1, {"katana": 100})
+    index_path = limits_history_index.index_file_path(str(tmp_path))
+    with open(index_path, "wb") as o:
+        o.write(b"not an index at all")
+
+    assert limits_history_index.update_index(str(tmp_path)) == 1
+    assert points(tmp_path, "katana") == [(first, 100)]
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+"""
+Checks the three-way merge of the changes staged by a session with the
+'.config' file as it is on disk when they are written.
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+From the folder of the Farm UI:
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_FOLDER)
+
+import limits_config  # noqa: E402
+import limits_merge  # noqa: E402
+from limits_table import LimitsTable  # noqa: E402
+
+BASE_TEXT = """{
+    "Limits": {
+        "katana": {"SiteMax": 100},
+        "maya": {"SiteMax": 80},
+        "nuke": {"SiteMax": 60},
+        "pwp_katana": {"SiteMax": 40}
+    }
+}
+"""
+
+
+def tables(ours=None, theirs=None, theirs_text=BASE_TEXT):
+    """Returns the base, the session and the file on disk, with some values
+    changed in the last two."""
+
+    base = LimitsTable(BASE_TEXT)
+    our_table = LimitsTable(BASE_TEXT)
+    their_table = LimitsTable(theirs_text)
+
+    for key, value in (ours or {}).items():
+        our_table.set_value(key, value)
+    for key, value in (theirs or {}).items():
+        their_table.set_value(key, value)
+
+    return base, our_table, their_table
+
+
+def test_session_change_is_applied():
+    base, ours, theirs = tables(ours={"katana": 120})
+
+    merged, applied, conflicts = limits_merge.merge_tables(base, ours, theirs)
+
+    assert applied == {"katana": 120}
+    assert conflicts == []
+    assert merged.value("katana") == 120
+
+
+def test_disk_only_change_survives():
+    base, ours, theirs = tables(ours={"katana": 120}, theirs={"maya": 90})
+
+    merged, applied, conflicts = limits_merge.merge_tables(base, ours, theirs)
+
+    assert applied == {"katana": 120}
+    assert conflicts == []
+    assert merged.value("maya") == 90
+    assert LimitsTable(merged.render()).value("maya") == 90
+
+
+def test_same_change_on_both_sides_writes_nothing():
+    base, ours, theirs = tables(ours={"nuke": 70}, theirs={"nuke": 70})
+
+    merged, applied, conflicts = limits_merge.merge_tables(base, ours, theirs)
+
+    assert applied == {}
+    assert conflicts == []
+    assert merged.value("nuke") == 70
+
+
+def test_same_key_conflict_is_reported_and_disk_value_kept():
+    base, ours, theirs = tables(ours={"katana": 120}, theirs={"katana": 90})
+
+    merged, applied, conflicts = limits_merge.merge_tables(base, ours, theirs)
+
+    assert applied == {}
+    assert [(c.key, c.base, c.ours, c.theirs) for c in conflicts] == [
+        ("katana", 100, 120, 90)
+    ]
+    assert merged.value("katana") == 90
+    assert "changed from 100 to 90 on disk" in str(conflicts[0])
+
+
+def test_key_removed_on_disk_is_a_conflict():
+    theirs_text = BASE_TEXT.replace('        "nuke": {"SiteMax": 60},\n', "")
+    base, ours, theirs = tables(ours={"nuke": 70}, theirs_text=theirs_text)
+
+    merged, applied, conflicts = limits_merge.merge_tables(base, ours, theirs)
+
+    assert applied == {}
+    assert [(c.key, c.theirs) for c in conflicts] == [("nuke", None)]
+    assert "nuke" not in merged
+    assert "removed on disk" in str(conflicts[0])
+
+
+def test_key_added_on_disk_is_kept_with_its_text():
+    theirs_text = BASE_TEXT.replace(
+        '"katana": {"SiteMax": 100},',
+        '"katana": {"SiteMax": 100},\n        "houdini": {"SiteMax": 25},',
+    )
+    base, ours, theirs = tables(ours={"maya": 85}, theirs_text=theirs_text)
+
+    merged, applied, conflicts = limits_merge.merge_tables(base, ours, theirs)
+
+    assert applied == {"maya": 85}
+    assert merged.render() == theirs_text.replace(
+        '"maya": {"SiteMax": 80}', '"maya": {"SiteMax": 85}'
+    )
+
+
+def test_missing_base_falls_back_to_the_text_of_the_session():
+    _, ours, theirs = tables(ours={"katana": 120}, theirs={"maya": 90})
+
+    merged, applied, conflicts = limits_merge.merge_config(None, ours, theirs)
+
+    assert applied == {"katana": 120}
+    assert conflicts == []
+    assert merged.value("maya") == 90
+
+
+def test_load_base(tmp_path):
+    temp_folder = f"{tmp_path}{os.sep}"
+
+    assert limits_merge.load_base(temp_folder) is None
+
+    with open(f"{temp_folder}{limits_config.BASE_FILE_NAME}", "w") as o:
+        o.write(BASE_TEXT)
+
+    assert limits_merge.load_base(temp_folder).render() == BASE_TEXT
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+"""
+Checks the search of the shows of the Show Selection window: names sharing
+trigrams with the text, names starting with it or containing it, texts
+shorter than a trigram, and the pinned shows.
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+From the folder of the Farm UI:
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_FOLDER)
+
+from limits_show_search import ShowIndex  # noqa: E402
+
+SHOWS = ("toy_story", "cars", "up", "elemental", "story_time")
+
+
+def test_key_and_name_in_any_case():
+    index = ShowIndex(SHOWS)
+
+    assert index.key_for(" Toy_Story ") == "toy_story"
+    assert index.key_for("toy") is None
+    assert index.name_for("cars") == "CARS"
+
+
+def test_prefix_comes_before_substring():
+    index = ShowIndex(SHOWS)
+
+    assert index.search("story") == ["STORY_TIME", "TOY_STORY"]
+
+
+def test_short_text_is_found_inside_names():
+    index = ShowIndex(SHOWS)
+
+    assert index.search("st") == ["STORY_TIME", "TOY_STORY"]
+    assert index.search("o") == ["TOY_STORY", "STORY_TIME"]
+    assert index.search("up") == ["UP"]
+
+
+def test_text_found_nowhere_matches_nothing():
+    index = ShowIndex(SHOWS)
+
+    assert index.search("zzz") == []
+    assert index.search("q") == []
+
+
+def test_pinned_shows_come_first():
+    index = ShowIndex(SHOWS)
+
+    assert index.search("o", pinned=["story_time"]) == ["STORY_TIME", "TOY_STORY"]
+
+
+def test_empty_text_lists_every_show():
+    index = ShowIndex(SHOWS)
+
+    assert index.search("  ") == [name.upper() for name in SHOWS]
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+
+"""
+Checks that the limits table renders the '.config' file exactly as it was
+read, that changing a value only touches the digits of that value, and that
+the keys are classified the way the windows show them.
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+From the folder of the Farm UI:
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_FOLDER)
+
+import limits_table  # noqa: E402
+import synthetic_config  # noqa: E402
+
+# Uneven indentation, settings that aren't limits and text after the values,
+# everything render() must keep as it is
+CONFIG_TEXT = """{
+  "Limits":{
+    "linuxfarm" : {
+        "Shares": {
+            "pwp": {"share": 40, "cap": 100},
+            "abc": {"share":30,"cap":100}
+        },
+        "SiteMax":   2000,
+        "Description": "Linux farm, don't touch \\"SiteMax\\" by hand"
+    },
+    "katana": {"SiteMax": 100, "Tags": ["license", "katana"]},
+    "maya":{"SiteMax":80},
+    "pwp_katana": {"SiteMax": 40},
+    "abc_maya": { "SiteMax" : 50 },
+    "yeti_pwp": {"SiteMax": 10},
+    "windowsfarm": {"SiteMax": 50}
+  },
+  "Settings": {"SiteMax": 1, "Retries": 3}
+}
+"""
+
+
+def test_render_untouched_is_byte_for_byte():
+    table = limits_table.LimitsTable(CONFIG_TEXT)
+
+    assert table.render() == CONFIG_TEXT
+    assert not table.modified
+
+
+def test_render_untouched_synthetic_config_is_byte_for_byte():
+    text = json.dumps(synthetic_config.generate_config(shows=30), indent=4)
+
+    assert limits_table.LimitsTable(text).render() == text
+
+
+def test_edit_only_touches_its_value():
+    table = limits_table.LimitsTable(CONFIG_TEXT)
+    index = table.positions["abc_maya"]
+    start, end = table.spans[2 * index], table.spans[2 * index + 1]
+
+    table.set_value("abc_maya", 1250)
+    rendered = table.render()
+
+    assert table.modified
+    assert CONFIG_TEXT[start:end] == "50"
+    assert rendered == CONFIG_TEXT[:start] + "1250" + CONFIG_TEXT[end:]
+    assert limits_table.LimitsTable(rendered).value("abc_maya") == 1250
+
+
+def test_edit_to_the_same_value_changes_nothing():
+    table = limits_table.LimitsTable(CONFIG_TEXT)
+
+    table.set_value("katana", 100)
+
+    assert not table.modified
+    assert table.render() == CONFIG_TEXT
+
+
+def test_keys_and_values():
+    table = limits_table.LimitsTable(CONFIG_TEXT)
+
+    assert list(table.positions) == [
+        "linuxfarm/Shares/pwp/share",
+        "linuxfarm/Shares/abc/share",
+        "linuxfarm",
+        "katana",
+        "maya",
+        "pwp_katana",
+        "abc_maya",
+        "yeti_pwp",
+        "windowsfarm",
+    ]
+    assert table.value("linuxfarm") == 2000
+    assert table.value("linuxfarm/Shares/abc/share") == 30
+    assert "Settings" not in table
+
+
+def test_classification():
+    table = limits_table.LimitsTable(CONFIG_TEXT)
+
+    assert table.shows == ("pwp", "abc")
+    assert table.application_keys() == ["katana", "maya"]
+    assert table.show_keys("PWP") == ["pwp_katana", "yeti_pwp"]
+    assert table.show_keys("abc") == ["abc_maya"]
+    assert dict(table.share_keys()) == {
+        "pwp": "linuxfarm/Shares/pwp/share",
+        "abc": "linuxfarm/Shares/abc/share",
+    }
+    assert "linuxfarm/Shares/pwp/share" not in table.limit_values()
+
+
+def test_changed_values():
+    table = limits_table.LimitsTable(CONFIG_TEXT)
+    other = limits_table.LimitsTable(CONFIG_TEXT)
+    other.set_value("maya", 90)
+
+    assert table.changed_values(other) == {"maya": (80, 90)}
+
+
+def test_state_round_trip():
+    table = limits_table.LimitsTable(CONFIG_TEXT)
+
+    copy = limits_table.LimitsTable.from_state(table.to_state())
+
+    assert copy.render() == CONFIG_TEXT
+    assert copy.category_masks == table.category_masks
+    assert copy.show_positions == table.show_positions
+    assert copy.application_keys() == table.application_keys()
+    assert copy.share_keys() == table.share_keys()
+
+
+def test_load_table_reads_again_once_changed(tmp_path):
+    path = str(tmp_path / "limits.config")
+    with open(path, "w") as o:
+        o.write(CONFIG_TEXT)
+
+    table = limits_table.load_table(path)
+    assert limits_table.load_table(path) is table
+
+    table.set_value("maya", 90)
+    reread = limits_table.load_table(path)
+    assert reread is not table
+    assert reread.value("maya") == 80
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+
+"""
+Checks that the first window of the Farm UI stays quick to import: it only
+loads the modules of the Farm UI it needs to show up, none of the modules
+meant to be loaded on first use, and its import stays within the budget
+over several interpreters.
+
+Created by Guillermo Aguero - Render TD
+
+Written in Python3.
+
+From the folder of the Farm UI:
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_FOLDER)
+
+import limits_benchmark  # noqa: E402
+
+# Modules of the Farm UI the first window may import
+ALLOWED_MODULES = {
+    "limits_config",
+    "limits_farms",
+    "limits_metrics",
+    "limits_profiling",
+    "limits_tracing",
+    "limits_undo",
+    limits_benchmark.STARTUP_MODULE,
+}
+
+# Margin over the budget the median may take on a busy machine
+IMPORT_MARGIN = 1.25
+
+
+def test_first_window_imports_allowed_modules_only():
+    startup = limits_benchmark.measure_import_time(repeat=1)
+    imported = set(startup["package_imported"])
+
+    assert imported <= ALLOWED_MODULES, sorted(imported - ALLOWED_MODULES)
+
+
+def test_first_window_defers_modules():
+    startup = limits_benchmark.measure_import_time(repeat=1)
+
+    assert startup["deferred_imported"] == []
+
+
+def test_first_window_import_budget():
+    startup = limits_benchmark.measure_import_time()
+
+    budget = limits_benchmark.IMPORT_BUDGET_MS * IMPORT_MARGIN
+    assert startup["import_ms"] <= budget, startup["import_ms"]